@@ -6,7 +6,9 @@ Flask-based REST API for hospitality data processing and analysis.
 """
 
 import os
-from flask import Flask
+import tempfile
+import time
+from flask import Flask, g, request
 from flask_cors import CORS
 
 from routers.upload import upload_bp
@@ -14,6 +16,12 @@ from routers.process import process_bp
 from routers.results import results_bp
 from routers.download import download_bp
 from routers.health import health_bp
+from routers.batch import batch_bp
+from routers.metrics import metrics_bp
+from services.cancellation import RunRegistry
+from services.dataset_store import PersistentStorage
+from services.load_control import LoadController
+from services.metrics import REQUEST_LATENCY
 
 
 def create_app(config=None):
@@ -21,13 +29,48 @@ def create_app(config=None):
     app = Flask(__name__)
     
     # Default configuration
-    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max request size (single uploads and chunks)
+    app.config['MAX_CHUNKED_UPLOAD_SIZE'] = 1024 * 1024 * 1024  # 1GB max file size via chunked uploads
+    app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # Suggested chunk size for clients
+    app.config['UPLOAD_TMP_DIR'] = os.environ.get(
+        'UPLOAD_TMP_DIR', os.path.join(tempfile.gettempdir(), 'talkguest-uploads')
+    )
     app.config['DATA_STORAGE'] = {}  # In-memory storage for uploaded files and results
+    app.config['DATA_DIR'] = os.environ.get('DATA_DIR')  # Persist DATA_STORAGE here when set
+    app.config['ETL_MAX_WORKERS'] = int(os.environ.get('ETL_MAX_WORKERS', 0))  # 0 = serial per-property reports
+    app.config['BATCH_MAX_WORKERS'] = int(os.environ.get('BATCH_MAX_WORKERS', 2))  # Concurrent datasets per batch
+    app.config['UPLOAD_PARSE_WORKERS'] = int(os.environ.get('UPLOAD_PARSE_WORKERS', 4))  # Processes for multi-file uploads
+    app.config['EXCEL_ENGINE'] = os.environ.get('EXCEL_ENGINE', 'auto')  # auto, calamine, openpyxl or xlrd
+    app.config['BATCH_MAX_UNCOMPRESSED_SIZE'] = 500 * 1024 * 1024  # 500MB extracted archive limit
+    app.config['UPLOAD_MAX_UNCOMPRESSED_SIZE'] = 200 * 1024 * 1024  # 200MB extracted limit for zips sent to /upload
+    app.config['WORKER_THREADS'] = int(os.environ.get('WORKER_THREADS', 4))  # Must match gunicorn --threads
+    app.config['MAX_HEAVY_REQUESTS'] = int(os.environ.get('MAX_HEAVY_REQUESTS', 0))  # 0 = one less than WORKER_THREADS
+    app.config['MAX_PENDING_PARSES'] = int(os.environ.get('MAX_PENDING_PARSES', 8))  # Parse queue depth before not ready
+    app.config['MEMORY_LIMIT_BYTES'] = int(os.environ.get('MEMORY_LIMIT_BYTES', 0))  # 0 = detect from cgroups
+    app.config['RETRY_AFTER_SECONDS'] = 10  # Retry-After sent with 503 responses
+    app.config['PIPELINE_TIME_LIMIT'] = float(os.environ.get('PIPELINE_TIME_LIMIT', 300))  # Wall seconds per run, 0 = none
+    app.config['PIPELINE_CPU_TIME_LIMIT'] = float(os.environ.get('PIPELINE_CPU_TIME_LIMIT', 0))  # CPU seconds per run, 0 = none
     
     # Apply custom config if provided
     if config:
         app.config.update(config)
     
+    # Swap in the persistent store so uploads and results survive restarts
+    if app.config['DATA_DIR'] and not isinstance(app.config['DATA_STORAGE'], PersistentStorage):
+        os.makedirs(app.config['DATA_DIR'], exist_ok=True)
+        app.config['DATA_STORAGE'] = PersistentStorage(os.path.join(app.config['DATA_DIR'], 'talkguest.db'))
+    
+    # Keep one thread free for health checks when heavy work saturates the rest
+    threads = app.config['WORKER_THREADS']
+    app.extensions['load_controller'] = LoadController(
+        threads=threads,
+        max_heavy=app.config['MAX_HEAVY_REQUESTS'] or max(threads - 1, 1),
+        max_pending_parses=app.config['MAX_PENDING_PARSES'],
+        memory_limit_bytes=app.config['MEMORY_LIMIT_BYTES'] or None
+    )
+    # Pipeline runs in progress, so DELETE /api/process can stop them
+    app.extensions['pipeline_runs'] = RunRegistry()
+    
     # Enable CORS for frontend communication
     CORS(app, resources={
         r"/api/*": {
@@ -39,8 +82,8 @@ def create_app(config=None):
                 "https://talkguest-webapp-frontend-production.up.railway.app",
                 "https://*.railway.app"
             ],
-            "methods": ["GET", "POST", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type"]
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "X-Chunk-SHA256"]
         }
     })
     
@@ -50,10 +93,29 @@ def create_app(config=None):
     app.register_blueprint(process_bp, url_prefix='/api')
     app.register_blueprint(results_bp, url_prefix='/api')
     app.register_blueprint(download_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        app.extensions['load_controller'].request_started()
+    
+    @app.teardown_request
+    def finish_request(_exc):
+        if 'request_start' in g:
+            app.extensions['load_controller'].request_finished()
     
     # Disable caching for all responses
     @app.after_request
     def add_header(response):
+        if 'request_start' in g:
+            # Label by route pattern, not the concrete URL, to bound cardinality
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - g.request_start,
+                method=request.method, route=route, status=response.status_code
+            )
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '-1'
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+TalkGuest ASGI Entry Point
+==========================
+Serves the Flask app from an asyncio event loop (``uvicorn asgi:app``).
+
+Under gunicorn each request holds one of a few threads for its whole
+lifetime, including the time spent receiving an upload from a slow client
+or sending a workbook back to it. Here the event loop receives the request
+body and sends the response, and a worker thread only runs the Flask view
+once the body has fully arrived. Blueprints, URLs and JSON responses are
+unchanged.
+"""
+
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+from werkzeug.wsgi import FileWrapper
+
+from app import app as flask_app
+
+
+# Request bodies above this size are spooled to disk while they arrive
+SPOOL_MAX_SIZE = 1024 * 1024
+# Block size used when sending files (send_file) back to the client
+FILE_BLOCK_SIZE = 1024 * 1024
+
+
+def _file_wrapper(file, buffer_size: int = 8192) -> FileWrapper:
+    """``wsgi.file_wrapper`` reading large blocks, so a download takes few thread hops."""
+    return FileWrapper(file, max(buffer_size, FILE_BLOCK_SIZE))
+
+
+class AsyncWSGIBridge:
+    """
+    ASGI application running a WSGI app on a thread pool.
+    
+    The request body is read on the event loop before the WSGI app is
+    called, and response chunks are produced on the pool but sent from the
+    event loop, so slow clients never hold a thread.
+    """
+    
+    def __init__(self, wsgi_app, threads: int, max_body_size: Optional[int] = None):
+        """
+        Args:
+            wsgi_app: WSGI application to serve
+            threads: Worker threads running views (parsing and ETL work)
+            max_body_size: Largest request body accepted; 413 above it
+        """
+        self.wsgi_app = wsgi_app
+        self.max_body_size = max_body_size
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return
+        if body is False:
+            await send({
+                'type': 'http.response.start',
+                'status': 413,
+                'headers': [(b'content-type', b'application/json')]
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': b'{"success": false, "error": "Request body too large"}'
+            })
+            return
+        
+        # One context per request so stream_with_context generators see the
+        # same request context whichever pool thread resumes them
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        
+        def run(fn, *args):
+            return loop.run_in_executor(self.executor, context.run, fn, *args)
+        
+        environ = self._environ(scope, body)
+        started: Dict = {}
+        
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+        
+        iterable = None
+        try:
+            iterable = await run(self.wsgi_app, environ, start_response)
+            chunks = iter(iterable)
+            chunk, done = await run(_next_chunk, chunks)
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            while not done:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk, done = await run(_next_chunk, chunks)
+            await send({'type': 'http.response.body', 'body': chunk})
+        finally:
+            body.close()
+            if hasattr(iterable, 'close'):
+                await run(iterable.close)
+    
+    async def _read_body(self, receive):
+        """
+        Receive the whole request body on the event loop.
+        
+        Returns:
+            Spooled file positioned at the start, False if the body exceeds
+            ``max_body_size``, or None if the client disconnected
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body_size is not None and size > self.max_body_size:
+                body.close()
+                return False
+            body.write(chunk)
+            more_body = message.get('more_body', False)
+        body.seek(0)
+        return body
+    
+    def _environ(self, scope, body) -> Dict:
+        """WSGI environ for an ASGI HTTP scope (PEP 3333)."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.file_wrapper': _file_wrapper
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+def _next_chunk(chunks: Iterator[bytes]) -> Tuple[bytes, bool]:
+    """Next response chunk and whether the response is finished (on a pool thread)."""
+    for chunk in chunks:
+        if chunk:
+            return chunk, False
+    return b'', True
+
+
+app = AsyncWSGIBridge(
+    flask_app,
+    threads=flask_app.config['WORKER_THREADS'],
+    max_body_size=flask_app.config['MAX_CONTENT_LENGTH']
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Load Test
+=========
+Concurrent-session load test against a locally started gunicorn.
+
+Each simulated session repeatedly runs the full user flow: upload the
+guests, reservations and invoices workbooks, process, read the overview
+results and download the combined report. Workbooks come from
+``MockDataGenerator`` at configurable sizes and are generated once up front.
+
+The report lists, per step, p50/p95/p99 latency, errors and requests
+rejected by admission control (503), plus overall throughput and the
+resident memory of the gunicorn master and workers sampled over time.
+
+The backend keeps one dataset per deployment, so concurrent sessions
+overwrite each other's uploads; the flow still exercises the same parsing,
+pipeline and rendering work a real user causes.
+
+Usage:
+    python benchmarks/load_test.py --sessions 8 --iterations 3 --reservations 2000
+    python benchmarks/load_test.py --url http://localhost:5000 --sessions 4
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILE_TYPES = ('guests', 'reservations', 'invoices')
+STEPS = ('upload_guests', 'upload_reservations', 'upload_invoices', 'process', 'results', 'download')
+
+
+def build_workbooks(guests: int, reservations: int, invoices: int, seed: int) -> Dict[str, bytes]:
+    """Mock workbooks for one dataset, as xlsx bytes."""
+    sys.path.insert(0, BACKEND_DIR)
+    from tests.generate_mock_data import MockDataGenerator
+    
+    data = MockDataGenerator(seed=seed).generate_all_data(guests, reservations, invoices)
+    workbooks = {}
+    for file_type in FILE_TYPES:
+        output = io.BytesIO()
+        data[file_type].to_excel(output, index=False, engine='openpyxl')
+        workbooks[file_type] = output.getvalue()
+    return workbooks
+
+
+def _multipart(filename: str, content: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def _request(method: str, url: str, body: Optional[bytes] = None, content_type: Optional[str] = None,
+             timeout: float = 300) -> Tuple[int, float]:
+    """Send one request and return (status, seconds); status 0 on connection errors."""
+    headers = {'Content-Type': content_type} if content_type else {}
+    request = urllib.request.Request(url, data=body, method=method, headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except OSError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+class Recorder:
+    """Thread-safe collection of (step, status, latency) samples."""
+    
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self._lock = threading.Lock()
+    
+    def add(self, step: str, status: int, seconds: float):
+        with self._lock:
+            self.samples[step].append((status, seconds))
+
+
+def run_session(base_url: str, workbooks: Dict[str, bytes], iterations: int, recorder: Recorder):
+    """One simulated user running the full flow ``iterations`` times."""
+    for _ in range(iterations):
+        for file_type in FILE_TYPES:
+            body, content_type = _multipart(f'{file_type}.xlsx', workbooks[file_type])
+            recorder.add(f'upload_{file_type}', *_request('POST', f'{base_url}/api/upload/{file_type}', body, content_type))
+        recorder.add('process', *_request('POST', f'{base_url}/api/process', b'{}', 'application/json'))
+        recorder.add('results', *_request('GET', f'{base_url}/api/results?sections=summary,occupancy.general_stats'))
+        recorder.add('download', *_request('GET', f'{base_url}/api/download/all'))
+
+
+def _children(pid: int) -> List[int]:
+    """Direct child processes of ``pid`` (Linux /proc)."""
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return children
+
+
+def _rss(pid: int) -> int:
+    """Resident set size of ``pid`` in bytes, 0 if it has exited."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def sample_memory(master_pid: int, interval: float, stop: threading.Event, samples: List[Dict]):
+    """Record master and per-worker RSS every ``interval`` seconds until ``stop`` is set."""
+    start = time.perf_counter()
+    while not stop.is_set():
+        workers = {pid: _rss(pid) for pid in _children(master_pid)}
+        samples.append({
+            'elapsed': round(time.perf_counter() - start, 2),
+            'master': _rss(master_pid),
+            'workers': workers
+        })
+        stop.wait(interval)
+
+
+def start_server(port: int, workers: int, threads: int, timeout: float = 60) -> subprocess.Popen:
+    """Start gunicorn with gunicorn.conf.py and wait for the liveness check."""
+    env = {**os.environ, 'PORT': str(port), 'WEB_WORKERS': str(workers), 'WORKER_THREADS': str(threads)}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if _request('GET', f'http://127.0.0.1:{port}/api/health/live', timeout=1)[0] == 200:
+            return server
+        time.sleep(0.1)
+    server.terminate()
+    raise TimeoutError('gunicorn did not become healthy')
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(recorder: Recorder, elapsed: float, memory: List[Dict]) -> Dict:
+    """Latency percentiles, error rates, throughput and memory figures."""
+    steps = {}
+    total = 0
+    for step in STEPS:
+        samples = recorder.samples.get(step, [])
+        if not samples:
+            continue
+        total += len(samples)
+        ok = [seconds for status, seconds in samples if 200 <= status < 300]
+        rejected = sum(1 for status, _ in samples if status == 503)
+        steps[step] = {
+            'requests': len(samples),
+            'errors': len(samples) - len(ok) - rejected,
+            'rejected': rejected,
+            'error_rate': round((len(samples) - len(ok)) / len(samples), 4),
+            'p50': round(_percentile(ok, 50), 4) if ok else None,
+            'p95': round(_percentile(ok, 95), 4) if ok else None,
+            'p99': round(_percentile(ok, 99), 4) if ok else None
+        }
+    
+    peak_total = max((sample['master'] + sum(sample['workers'].values()) for sample in memory), default=0)
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'flows_per_minute': round(len(recorder.samples.get('download', [])) / elapsed * 60, 2) if elapsed else 0.0,
+        'steps': steps,
+        'peak_rss_bytes': peak_total,
+        'memory': memory
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n{report['requests']} requests in {report['elapsed_seconds']}s "
+          f"({report['throughput_rps']} req/s, {report['flows_per_minute']} full flows/min)\n")
+    print(f"{'step':<22}{'requests':>9}{'errors':>8}{'503':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, stats in report['steps'].items():
+        latencies = [f"{stats[p] * 1000:10.1f}" if stats[p] is not None else f"{'-':>10}" for p in ('p50', 'p95', 'p99')]
+        print(f"{step:<22}{stats['requests']:>9}{stats['errors']:>8}{stats['rejected']:>6}{''.join(latencies)}")
+    
+    if report['memory']:
+        print('\nRSS over time (MB):')
+        every = max(1, len(report['memory']) // 10)
+        for sample in report['memory'][::every]:
+            workers = ', '.join(f'{rss / 2 ** 20:.0f}' for rss in sample['workers'].values())
+            print(f"  t={sample['elapsed']:>7.1f}s  master {sample['master'] / 2 ** 20:6.0f}  workers [{workers}]")
+        print(f"  peak total {report['peak_rss_bytes'] / 2 ** 20:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent-session load test for the TalkGuest API')
+    parser.add_argument('--sessions', type=int, default=4, help='Concurrent simulated users')
+    parser.add_argument('--iterations', type=int, default=3, help='Full flows per session')
+    parser.add_argument('--guests', type=int, default=500, help='Guests per workbook')
+    parser.add_argument('--reservations', type=int, default=1000, help='Reservations per workbook')
+    parser.add_argument('--invoices', type=int, default=800, help='Maximum invoices per workbook')
+    parser.add_argument('--seed', type=int, default=42, help='Mock data seed')
+    parser.add_argument('--url', help='Test a running server instead of starting gunicorn')
+    parser.add_argument('--port', type=int, default=5098, help='Port for the started gunicorn')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers (WEB_WORKERS)')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads (WORKER_THREADS)')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='Seconds between RSS samples')
+    parser.add_argument('--json', help='Also write the full report to this file')
+    args = parser.parse_args()
+    
+    print(f'Generating workbooks ({args.guests} guests, {args.reservations} reservations)...')
+    workbooks = build_workbooks(args.guests, args.reservations, args.invoices, args.seed)
+    
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server = start_server(args.port, args.workers, args.threads)
+        base_url = f'http://127.0.0.1:{args.port}'
+    
+    recorder = Recorder()
+    memory: List[Dict] = []
+    stop = threading.Event()
+    sampler = None
+    if server is not None and os.path.isdir('/proc'):
+        sampler = threading.Thread(target=sample_memory, args=(server.pid, args.sample_interval, stop, memory), daemon=True)
+        sampler.start()
+    
+    try:
+        sessions = [
+            threading.Thread(target=run_session, args=(base_url, workbooks, args.iterations, recorder))
+            for _ in range(args.sessions)
+        ]
+        start = time.perf_counter()
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        if sampler is not None:
+            sampler.join()
+        if server is not None:
+            server.terminate()
+            server.wait()
+    
+    report = summarize(recorder, elapsed, memory)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
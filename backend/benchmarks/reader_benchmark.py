@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Reader Benchmark
+================
+Compare the Excel engines used for full workbook parses.
+
+Builds reservations workbooks with ``MockDataGenerator`` at several sizes,
+parses each with every installed engine through ``excel_reader.read_dataframe``
+and reports the median parse time, peak traced memory and the speedup over
+openpyxl. Frames from every engine are checked to be identical, so a faster
+engine cannot silently change what the pipeline sees.
+
+Legacy .xls workbooks are included when ``xlwt`` is installed to write them.
+
+Usage:
+    python benchmarks/reader_benchmark.py
+    python benchmarks/reader_benchmark.py --sizes 1000 20000 60000 --runs 5
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import pandas as pd
+
+from services import excel_reader
+from tests.generate_mock_data import MockDataGenerator
+
+
+def build_workbooks(rows: int, seed: int) -> Dict[str, bytes]:
+    """Reservations workbook with ``rows`` rows, as xlsx and (if possible) xls bytes."""
+    df = MockDataGenerator(seed=seed).generate_all_data(max(1, rows // 2), rows, 1)['reservations']
+    workbooks = {}
+    output = io.BytesIO()
+    df.to_excel(output, index=False, engine='openpyxl')
+    workbooks['xlsx'] = output.getvalue()
+    
+    if rows <= 65535:
+        try:
+            import xlwt
+        except ImportError:
+            xlwt = None
+        if xlwt is not None:
+            workbooks['xls'] = _write_xls(df, xlwt)
+    return workbooks
+
+
+def _write_xls(df: pd.DataFrame, xlwt) -> bytes:
+    """Write ``df`` as a legacy .xls workbook (pandas no longer writes xls)."""
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet('Sheet1')
+    date_style = xlwt.easyxf(num_format_str='yyyy-mm-dd hh:mm:ss')
+    for col, name in enumerate(df.columns):
+        sheet.write(0, col, str(name))
+    for row, values in enumerate(df.itertuples(index=False), start=1):
+        for col, value in enumerate(values):
+            if pd.isna(value):
+                continue
+            if isinstance(value, pd.Timestamp):
+                sheet.write(row, col, value.to_pydatetime(), date_style)
+            else:
+                sheet.write(row, col, value.item() if hasattr(value, 'item') else value)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def measure(content: bytes, engine: str, runs: int) -> Tuple[float, int, pd.DataFrame]:
+    """Median seconds and peak traced bytes of parsing ``content`` with ``engine``."""
+    times = []
+    df = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        df = excel_reader.read_dataframe(content, engine=engine)
+        times.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    excel_reader.read_dataframe(content, engine=engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Excel reader engines on mock workbooks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='Reservation rows per workbook')
+    parser.add_argument('--runs', type=int, default=3, help='Parses per engine, the median is reported')
+    parser.add_argument('--seed', type=int, default=42, help='Mock data seed')
+    args = parser.parse_args()
+    
+    results: List[Tuple] = []
+    for rows in args.sizes:
+        for fmt, content in build_workbooks(rows, args.seed).items():
+            engines = excel_reader.select_engines(content, 'auto')
+            auto = engines[0]
+            timings = {}
+            reference = None
+            for engine in sorted(engines):
+                seconds, peak, df = measure(content, engine, args.runs)
+                if reference is None:
+                    reference = df
+                else:
+                    pd.testing.assert_frame_equal(df, reference)
+                timings[engine] = (seconds, peak)
+            results.append((rows, fmt, len(content), auto, timings))
+    
+    print(f"{'rows':>8} {'format':>6} {'size MB':>8}  {'engine':<10}{'median s':>10}{'peak MB':>9}{'speedup':>9}")
+    for rows, fmt, size, auto, timings in results:
+        baseline = timings.get('openpyxl', timings.get('xlrd'))[0]
+        for engine, (seconds, peak) in timings.items():
+            marker = ' (auto)' if engine == auto else ''
+            print(f'{rows:>8} {fmt:>6} {size / 2 ** 20:>8.2f}  {engine:<10}{seconds:>10.3f}'
+                  f'{peak / 2 ** 20:>9.1f}{baseline / seconds:>8.1f}x{marker}')
+    print('\nAll engines produced identical DataFrames.')
+
+
+if __name__ == '__main__':
+    main()
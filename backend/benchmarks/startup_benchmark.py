@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+=================
+Measures cold-start latency of the backend.
+
+Each run starts a fresh interpreter and reports:
+
+- import: time to import ``app`` (create the Flask app)
+- health: time until ``/api/health/live`` answers
+- first_upload: time until a first guests upload has been parsed, which
+  includes loading pandas/openpyxl when they were deferred
+
+``--eager`` imports the heavy modules before creating the app, as the
+backend did before imports were deferred, for comparison. ``--server``
+starts gunicorn with ``gunicorn.conf.py`` instead and measures the time
+until the health check answers over HTTP.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--eager] [--server]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside a fresh interpreter; prints one JSON line of timings
+IN_PROCESS_SCRIPT = '''
+import io, json, sys, time
+start = time.perf_counter()
+if {eager}:
+    from services.lazy_import import HEAVY_MODULES
+    import importlib
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+from app import create_app
+app = create_app({{'TESTING': True}})
+imported = time.perf_counter()
+client = app.test_client()
+assert client.get('/api/health/live').status_code == 200
+health = time.perf_counter()
+workbook = io.BytesIO({workbook!r})
+response = client.post('/api/upload/guests', data={{'file': (workbook, 'guests.xlsx')}},
+                       content_type='multipart/form-data')
+assert response.status_code == 200, response.data
+uploaded = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'health': health - start, 'first_upload': uploaded - start}}))
+'''
+
+
+def _guests_workbook() -> bytes:
+    sys.path.insert(0, BACKEND_DIR)
+    from tests.generate_mock_data import MockDataGenerator
+    import io
+    
+    output = io.BytesIO()
+    MockDataGenerator(seed=42).generate_guests_data(50).to_excel(output, index=False)
+    return output.getvalue()
+
+
+def run_in_process(eager: bool, workbook: bytes) -> dict:
+    """Time one cold start in a fresh interpreter."""
+    script = IN_PROCESS_SCRIPT.format(eager=eager, workbook=workbook)
+    output = subprocess.run(
+        [sys.executable, '-c', script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_server(port: int, timeout: float = 60) -> dict:
+    """Time from starting gunicorn to the first successful health check."""
+    env = {**os.environ, 'PORT': str(port)}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health/live', timeout=1):
+                    return {'health': time.perf_counter() - start}
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError('Server did not become healthy')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure backend cold-start latency')
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts to measure')
+    parser.add_argument('--eager', action='store_true', help='Import heavy modules up front (old behaviour)')
+    parser.add_argument('--server', action='store_true', help='Start gunicorn and time the first health check')
+    parser.add_argument('--port', type=int, default=5099, help='Port for --server')
+    args = parser.parse_args()
+    
+    if args.server:
+        runs = [run_server(args.port) for _ in range(args.runs)]
+    else:
+        workbook = _guests_workbook()
+        runs = [run_in_process(args.eager, workbook) for _ in range(args.runs)]
+    
+    for metric in runs[0]:
+        values = [run[metric] for run in runs]
+        print(f'{metric:>14}: median {statistics.median(values) * 1000:8.1f} ms  '
+              f'(min {min(values) * 1000:.1f}, max {max(values) * 1000:.1f})')
+
+
+if __name__ == '__main__':
+    main()
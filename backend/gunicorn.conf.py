@@ -0,0 +1,45 @@
+"""
+Gunicorn Configuration
+======================
+Startup-optimized settings for the production server.
+
+The app is loaded once in the master (``preload_app``) and forked into
+workers. Heavy data libraries are not imported by the app itself; when
+they load depends on ``IMPORT_MODE``:
+
+- ``background`` (default): each worker starts serving immediately and
+  imports them on a background thread
+- ``lazy``: imported by the first request that needs them
+- ``preload``: imported in the master before forking, so workers share the
+  pages; health checks wait for the imports
+"""
+
+import gc
+import importlib
+import os
+
+from services.lazy_import import HEAVY_MODULES, warm_up
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_WORKERS', 1))
+threads = int(os.environ.get('WORKER_THREADS', 4))
+preload_app = os.environ.get('PRELOAD_APP', 'true').lower() == 'true'
+IMPORT_MODE = os.environ.get('IMPORT_MODE', 'background')
+
+
+def on_starting(server):
+    if IMPORT_MODE == 'preload':
+        for name in HEAVY_MODULES:
+            importlib.import_module(name)
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far to the permanent generation, so GC
+    # passes in workers do not write to (and copy) pages shared with the master
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if IMPORT_MODE == 'background':
+        warm_up()
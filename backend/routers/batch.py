@@ -0,0 +1,284 @@
+"""
+Batch Router
+============
+Runs the ETL pipeline for many datasets (clients or months) in one request.
+
+Datasets are sent either as a zip archive, with one top-level folder per
+dataset, or as individual multipart fields named ``<dataset>/<file_type>``.
+Each dataset may carry its own ``config`` (``iva_rates``, ``property_groups``).
+"""
+
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import zipfile
+import json
+import io
+import os
+
+from routers.upload import allowed_file, detect_file_type
+from services.cancellation import CancellationToken
+from services.lazy_import import lazy_module
+from services.metrics import ACTIVE_JOBS
+from services.worker_pool import pool_context
+
+etl_service = lazy_module('services.etl_service')
+excel_reader = lazy_module('services.excel_reader')
+history = lazy_module('services.history')
+
+batch_bp = Blueprint('batch', __name__)
+
+
+FILE_TYPES = ('guests', 'reservations', 'invoices')
+
+
+def _classify_file(filename, df):
+    """
+    Decide which dataset slot a workbook or sheet belongs to.
+    
+    The file or sheet name is trusted first (``guests.xlsx``,
+    ``2025-01_reservations.xlsx``), then the column headers.
+    
+    Returns:
+        str: 'guests', 'reservations', 'invoices' or 'unknown'
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0].lower()
+    for file_type in FILE_TYPES:
+        if file_type in stem:
+            return file_type
+    
+    detected_type, _ = detect_file_type(df)
+    return detected_type
+
+
+def _run_dataset(name, files, config, time_limit=0, cpu_time_limit=0, engine='auto'):
+    """
+    Parse and process one dataset. Runs inside a worker process.
+    
+    Args:
+        name: Dataset name
+        files: Dictionary mapping file name to raw workbook bytes
+        config: Optional ETL config overrides for this dataset
+        time_limit: Wall seconds allowed for the pipeline run, 0 for none
+        cpu_time_limit: CPU seconds allowed for the pipeline run, 0 for none
+        engine: Excel engine for parsing the workbooks
+    
+    Returns:
+        tuple: (name, result) where result mirrors ``ETLService.run_pipeline``
+    """
+    frames = {}
+    errors = []
+    
+    for filename, content in files.items():
+        try:
+            sheets = excel_reader.read_all_sheets(content, engine)
+        except Exception as e:
+            errors.append(f'{filename}: failed to read workbook ({str(e)})')
+            continue
+        
+        # Sheets of a multi-sheet workbook are classified by their own name
+        # and header; unclassified sheets are skipped
+        by_type = {}
+        if len(sheets) > 1:
+            for sheet_name, df in sheets.items():
+                file_type = _classify_file(sheet_name, df)
+                if file_type != 'unknown':
+                    by_type.setdefault(file_type, []).append(df)
+        if not by_type:
+            first = next(iter(sheets.values()))
+            by_type = {_classify_file(filename, first): [first]}
+        
+        for file_type, dfs in by_type.items():
+            if file_type == 'unknown':
+                errors.append(f'{filename}: unable to determine file type')
+            elif file_type in frames:
+                errors.append(f'{filename}: duplicate {file_type} file')
+            else:
+                frames[file_type] = dfs[0] if len(dfs) == 1 else excel_reader.merge_frames(dfs)
+    
+    for required in ('guests', 'reservations'):
+        if required not in frames:
+            errors.append(f'{required.capitalize()} file is required')
+    
+    if errors:
+        return name, {'success': False, 'errors': errors, 'log': []}
+    
+    token = CancellationToken(wall_time_limit=time_limit, cpu_time_limit=cpu_time_limit)
+    etl = etl_service.ETLService(config=config, cancel_token=token)
+    result = etl.run_pipeline(frames['guests'], frames['reservations'], frames.get('invoices'))
+    return name, result
+
+
+def _collect_datasets():
+    """
+    Gather datasets and per-dataset configs from the current request.
+    
+    Returns:
+        tuple: (datasets, configs) where datasets maps dataset name to
+        ``{filename: bytes}`` and configs maps dataset name to config dict
+    
+    Raises:
+        ValueError: If the request payload is malformed
+    """
+    datasets = {}
+    configs = {}
+    
+    archive = request.files.get('archive')
+    if archive is not None and archive.filename:
+        if not archive.filename.lower().endswith('.zip'):
+            raise ValueError('Archive must be a .zip file')
+        
+        max_size = current_app.config.get('BATCH_MAX_UNCOMPRESSED_SIZE')
+        with zipfile.ZipFile(io.BytesIO(archive.read())) as zf:
+            members = [
+                info for info in zf.infolist()
+                if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+            ]
+            if max_size and sum(info.file_size for info in members) > max_size:
+                raise ValueError('Archive is too large once extracted')
+            
+            for info in members:
+                parts = info.filename.strip('/').split('/')
+                dataset = parts[0] if len(parts) > 1 else 'default'
+                basename = parts[-1]
+                
+                if basename == 'config.json':
+                    configs[dataset] = json.loads(zf.read(info))
+                elif allowed_file(basename):
+                    datasets.setdefault(dataset, {})[basename] = zf.read(info)
+    
+    for field, file in request.files.items(multi=True):
+        if field == 'archive' or '/' not in field:
+            continue
+        dataset, file_type = field.split('/', 1)
+        if file_type not in FILE_TYPES:
+            raise ValueError(f'Invalid file type in field "{field}". Must be one of: {", ".join(FILE_TYPES)}')
+        if not allowed_file(file.filename):
+            raise ValueError(f'Invalid file "{file.filename}". Only Excel files (.xlsx, .xls) are allowed')
+        # Name the file after its declared type so classification follows the field
+        extension = os.path.splitext(file.filename)[1].lower()
+        datasets.setdefault(dataset, {})[f'{file_type}{extension}'] = file.read()
+    
+    if request.form.get('config'):
+        form_configs = json.loads(request.form['config'])
+        if not isinstance(form_configs, dict):
+            raise ValueError('config must be a JSON object keyed by dataset name')
+        configs.update(form_configs)
+    
+    return datasets, configs
+
+
+def _dataset_summary(name, result):
+    """Compact per-dataset entry returned to the client."""
+    entry = {'dataset': name, 'success': result['success']}
+    if result['success']:
+        entry['summary'] = result['summary']
+    else:
+        entry['errors'] = result['errors']
+    return entry
+
+
+@batch_bp.route('/batch', methods=['POST'])
+def run_batch():
+    """
+    Process many datasets concurrently on a bounded worker pool.
+    
+    Accepts either an ``archive`` zip (one folder per dataset, optional
+    ``config.json`` inside each folder) or fields named ``<dataset>/<file_type>``.
+    An optional ``config`` form field maps dataset names to config overrides.
+    
+    Pass ``?stream=true`` to receive one JSON line per dataset as it finishes;
+    a dataset whose worker fails gets a line with its error. Full results are
+    kept for ``GET /api/batch/results`` and ``GET /api/download/batch`` as
+    each dataset finishes, and the batch runs to the end even if the
+    streaming client disconnects.
+    """
+    try:
+        datasets, configs = _collect_datasets()
+    except (ValueError, zipfile.BadZipFile, json.JSONDecodeError) as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid batch request: {str(e)}'
+        }), 400
+    
+    if not datasets:
+        return jsonify({
+            'success': False,
+            'error': 'No datasets provided'
+        }), 400
+    
+    storage = current_app.config['DATA_STORAGE']
+    max_workers = min(current_app.config.get('BATCH_MAX_WORKERS', 2), len(datasets))
+    stream = request.args.get('stream', 'false').lower() == 'true'
+    time_limit = current_app.config['PIPELINE_TIME_LIMIT']
+    cpu_time_limit = current_app.config['PIPELINE_CPU_TIME_LIMIT']
+    engine = current_app.config['EXCEL_ENGINE']
+    
+    def run():
+        results = {}
+        storage['batch'] = {}
+        # Started from a request thread, so never forked (see services.worker_pool)
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context())
+        with ACTIVE_JOBS.track_inprogress(job='batch'), executor:
+            futures = {
+                executor.submit(_run_dataset, name, files, configs.get(name), time_limit, cpu_time_limit, engine): name
+                for name, files in sorted(datasets.items())
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    _, result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'errors': [f'Processing failed: {str(e)}'], 'log': []}
+                aggregates = result.pop('aggregates', None)
+                if aggregates is not None:
+                    history.record_run(storage, name, aggregates)
+                # Stored as each dataset finishes, so finished results survive
+                # a failure or disconnect later in the batch
+                results[name] = result
+                storage['batch'] = dict(sorted(results.items()))
+                yield name, result
+    
+    if stream:
+        def generate():
+            batch = run()
+            try:
+                for name, result in batch:
+                    yield json.dumps(_dataset_summary(name, result), default=str) + '\n'
+            finally:
+                # A client disconnecting does not stop the batch; the
+                # remaining datasets are still processed and stored
+                for _ in batch:
+                    pass
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    try:
+        entries = [_dataset_summary(name, result) for name, result in run()]
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Batch processing failed: {str(e)}'
+        }), 500
+    
+    entries.sort(key=lambda entry: entry['dataset'])
+    return jsonify({
+        'success': all(entry['success'] for entry in entries),
+        'datasets': entries
+    }), 200
+
+
+@batch_bp.route('/batch/results', methods=['GET'])
+def get_batch_results():
+    """Get full results of the last batch run."""
+    storage = current_app.config['DATA_STORAGE']
+    
+    if 'batch' not in storage:
+        return jsonify({
+            'success': False,
+            'error': 'No batch results available. Please run a batch first.'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': storage['batch']
+    }), 200
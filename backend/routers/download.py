@@ -4,14 +4,115 @@ Download Router
 Provides endpoints for downloading processed data as Excel files.
 """
 
-from flask import Blueprint, jsonify, current_app, send_file
-import pandas as pd
+from flask import Blueprint, jsonify, current_app, request, send_file
 import io
 
+from services.lazy_import import lazy_module
+from services.load_control import admission_controlled
+from services.metrics import EXPORT_RENDER_DURATION
+
+# pandas (and openpyxl through ExcelWriter) load on the first download
+pd = lazy_module('pandas')
+history = lazy_module('services.history')
+
 download_bp = Blueprint('download', __name__)
 
 
+def _write_analytics_sheets(writer, analytics):
+    """Write channel analytics, lead-time and length-of-stay sheets."""
+    by_channel = pd.DataFrame(analytics['by_channel'])
+    by_channel.columns = ['Channel', 'Reservations', 'Cancelled', 'Cancellation Rate', 'Room Nights', 'Revenue',
+                          'Commission', 'Commission Rate', 'Cleaning Fees', 'ADR', 'RevPAR',
+                          'Avg Lead Time (days)', 'Avg Length of Stay']
+    by_channel.to_excel(writer, sheet_name='Channel Analytics', index=False)
+    
+    lead_time = pd.DataFrame(analytics['lead_time_histogram']).rename(columns={'channel': 'Channel'})
+    lead_time.to_excel(writer, sheet_name='Lead Time', index=False)
+    
+    length_of_stay = pd.DataFrame(analytics['length_of_stay_distribution']).rename(columns={'channel': 'Channel'})
+    length_of_stay.to_excel(writer, sheet_name='Length of Stay', index=False)
+    
+    if 'pace' in analytics:
+        _write_pace_sheet(writer, analytics['pace'])
+
+
+def _write_pace_sheet(writer, pace):
+    """Write on-the-books pace per stay month and days before arrival."""
+    by_month = pd.DataFrame(pace['by_stay_month'],
+                            columns=['stay_month', 'days_before_arrival', 'reservations', 'room_nights', 'revenue',
+                                     'pickup_room_nights', 'last_year_room_nights', 'room_nights_vs_last_year',
+                                     'pickup_revenue', 'last_year_revenue', 'revenue_vs_last_year'])
+    by_month.columns = ['Stay Month', 'Days Before Arrival', 'Reservations', 'Room Nights', 'Revenue',
+                        'Pickup Room Nights', 'Room Nights LY', 'Room Nights vs LY',
+                        'Pickup Revenue', 'Revenue LY', 'Revenue vs LY']
+    by_month.to_excel(writer, sheet_name='Booking Pace', index=False)
+
+
+def _write_tourist_tax_sheet(writer, tourist_tax):
+    """Write tourist tax per property and check-in month with a total row."""
+    by_month = pd.DataFrame(tourist_tax['by_property_month'],
+                            columns=['property', 'municipality', 'month', 'reservations', 'nights',
+                                     'taxable_person_nights', 'exempt_person_nights', 'tax'])
+    by_month.columns = ['Property', 'Municipality', 'Month', 'Reservations', 'Nights',
+                        'Taxable Person-Nights', 'Exempt Person-Nights', 'Tourist Tax']
+    summary = tourist_tax['summary']
+    total = pd.DataFrame([{
+        'Property': 'TOTAL',
+        'Reservations': summary['total_reservations'],
+        'Nights': by_month['Nights'].sum(),
+        'Taxable Person-Nights': summary['taxable_person_nights'],
+        'Exempt Person-Nights': summary['exempt_person_nights'],
+        'Tourist Tax': summary['total_tax']
+    }])
+    pd.concat([by_month, total], ignore_index=True).to_excel(writer, sheet_name='Tourist Tax', index=False)
+
+
+def _comparison_columns(table, metrics, labels):
+    """Rename ``metric``, ``_previous``, ``_change`` and ``_change_rate`` columns for a comparison sheet."""
+    names = {}
+    for metric in metrics:
+        label = labels[metric]
+        names.update({
+            metric: label,
+            f'{metric}_previous': f'{label} (Previous)',
+            f'{metric}_change': f'{label} Change',
+            f'{metric}_change_rate': f'{label} Change %'
+        })
+    return table.rename(columns=names)
+
+
+def _write_comparison_sheets(writer, comparison):
+    """Write period-over-period summary, revenue by property and nationality sheets."""
+    period, against = comparison['period'], comparison['against']
+    summary = pd.DataFrame([
+        {'Metric': name.replace('_', ' ').title(), **values}
+        for name, values in comparison['general_stats'].items()
+    ])
+    summary.columns = ['Metric', f"{period['start']} to {period['end']}", f"{against['start']} to {against['end']}",
+                       'Change', 'Change %']
+    summary.to_excel(writer, sheet_name='Comparison Summary', index=False)
+    
+    by_property = _comparison_columns(pd.DataFrame(comparison['reservations_by_property']), history.REVENUE_METRICS, {
+        'gross_value': 'Gross Value', 'commission': 'Commission', 'iva_amount': 'IVA Amount',
+        'net_value': 'Net Value', 'reservation_count': 'Reservation Count'
+    }).rename(columns={'property': 'Property'})
+    by_property.to_excel(writer, sheet_name='Comparison by Property', index=False)
+    
+    nationality_frames = []
+    for property_name, records in comparison['occupancy_by_property'].items():
+        df = pd.DataFrame(records)
+        df.insert(0, 'property', property_name)
+        nationality_frames.append(df)
+    if nationality_frames:
+        nationalities = _comparison_columns(pd.concat(nationality_frames, ignore_index=True), history.OCCUPANCY_METRICS, {
+            'unique_guests': 'Unique Guests', 'total_people': 'Total People', 'total_nights': 'Total Nights',
+            'person_nights': 'Person-Nights', 'reservations': 'Reservations'
+        }).rename(columns={'property': 'Property', 'nationality': 'Nationality'})
+        nationalities.to_excel(writer, sheet_name='Comparison Nationalities', index=False)
+
+
 @download_bp.route('/download/occupancy', methods=['GET'])
+@admission_controlled
 def download_occupancy():
     """Download occupancy report as Excel file."""
     storage = current_app.config['DATA_STORAGE']
@@ -33,7 +134,7 @@ def download_occupancy():
         # Create Excel file in memory
         output = io.BytesIO()
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        with EXPORT_RENDER_DURATION.time(report='occupancy'), pd.ExcelWriter(output, engine='openpyxl') as writer:
             # General statistics sheet
             general_stats = pd.DataFrame([occupancy['general_stats']])
             general_stats.columns = ['Total Guests', 'Total Nights', 'Total Reservations']
@@ -57,7 +158,7 @@ def download_occupancy():
             as_attachment=True,
             download_name='occupancy_report.xlsx'
         )
-        
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -66,6 +167,7 @@ def download_occupancy():
 
 
 @download_bp.route('/download/revenue', methods=['GET'])
+@admission_controlled
 def download_revenue():
     """Download revenue report as Excel file."""
     storage = current_app.config['DATA_STORAGE']
@@ -86,7 +188,7 @@ def download_revenue():
     try:
         output = io.BytesIO()
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        with EXPORT_RENDER_DURATION.time(report='revenue'), pd.ExcelWriter(output, engine='openpyxl') as writer:
             # Reservations summary
             res_summary = pd.DataFrame([revenue['reservations_summary']])
             res_summary.columns = ['Total Gross Value', 'Total Commissions', 'Total IVA', 'Total Net Value', 'Total Reservations']
@@ -113,6 +215,24 @@ def download_revenue():
                 detailed = pd.DataFrame(revenue['detailed_calculations'])
                 detailed.columns = ['Property', 'Gross Value', 'Commission', 'IVA Rate', 'IVA Amount', 'Net Value']
                 detailed.to_excel(writer, sheet_name='Detailed Calculations', index=False)
+            
+            # Invoice reconciliation
+            if revenue.get('reconciliation'):
+                rec_by_prop = pd.DataFrame(revenue['reconciliation']['by_property'])
+                rec_by_prop.columns = ['Property', 'Reservation Value', 'Invoiced Value', 'Difference',
+                                       'Matched', 'Amount Mismatch', 'Unmatched Reservations', 'Unmatched Invoices']
+                rec_by_prop.to_excel(writer, sheet_name='Reconciliation', index=False)
+                
+                exceptions = pd.DataFrame(revenue['reconciliation']['exceptions'],
+                                          columns=['property', 'reservation_id', 'document_id', 'checkin', 'document_date',
+                                                   'reservation_value', 'invoiced_value', 'difference', 'status'])
+                exceptions.columns = ['Property', 'Reservation', 'Invoice', 'Checkin', 'Invoice Date',
+                                      'Reservation Value', 'Invoiced Value', 'Difference', 'Status']
+                exceptions.to_excel(writer, sheet_name='Reconciliation Exceptions', index=False)
+            
+            # Municipal tourist tax
+            if revenue.get('tourist_tax'):
+                _write_tourist_tax_sheet(writer, revenue['tourist_tax'])
         
         output.seek(0)
         
@@ -122,7 +242,7 @@ def download_revenue():
             as_attachment=True,
             download_name='revenue_report.xlsx'
         )
-        
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -131,6 +251,7 @@ def download_revenue():
 
 
 @download_bp.route('/download/all', methods=['GET'])
+@admission_controlled
 def download_all():
     """Download all reports as a single Excel file with multiple sheets."""
     storage = current_app.config['DATA_STORAGE']
@@ -160,7 +281,7 @@ def download_all():
     try:
         output = io.BytesIO()
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        with EXPORT_RENDER_DURATION.time(report='all'), pd.ExcelWriter(output, engine='openpyxl') as writer:
             # Occupancy general stats
             general_stats = pd.DataFrame([occupancy['general_stats']])
             general_stats.columns = ['Total Guests', 'Total Nights', 'Total Reservations']
@@ -176,6 +297,10 @@ def download_all():
             res_by_prop.columns = ['Property', 'Gross Value', 'Commission', 'IVA Amount', 'Net Value', 'Reservation Count']
             res_by_prop.to_excel(writer, sheet_name='Revenue by Property', index=False)
             
+            # Municipal tourist tax
+            if revenue.get('tourist_tax'):
+                _write_tourist_tax_sheet(writer, revenue['tourist_tax'])
+            
             # Occupancy by property (limited sheets)
             for i, (property_name, data) in enumerate(occupancy.get('by_property', {}).items()):
                 if i >= 10:  # Limit to 10 property sheets
@@ -184,6 +309,11 @@ def download_all():
                 df.columns = ['Nationality', 'Unique Guests', 'Total People', 'Total Nights', 'Person-Nights']
                 sheet_name = f"Occ {property_name}"[:31].replace('(', '').replace(')', '').replace(',', '')
                 df.to_excel(writer, sheet_name=sheet_name, index=False)
+            
+            # Channel analytics
+            analytics = storage['results'].get('analytics')
+            if analytics:
+                _write_analytics_sheets(writer, analytics)
         
         output.seek(0)
         
@@ -193,7 +323,203 @@ def download_all():
             as_attachment=True,
             download_name='talkguest_report.xlsx'
         )
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to generate Excel file: {str(e)}'
+        }), 500
+
+
+@download_bp.route('/download/analytics', methods=['GET'])
+@admission_controlled
+def download_analytics():
+    """Download channel and booking-window analytics as Excel file."""
+    storage = current_app.config['DATA_STORAGE']
+    
+    if 'results' not in storage:
+        return jsonify({
+            'success': False,
+            'error': 'No results available. Please run processing first.'
+        }), 404
+    
+    analytics = storage['results'].get('analytics')
+    if not analytics:
+        return jsonify({
+            'success': False,
+            'error': 'Analytics data not available'
+        }), 404
+    
+    try:
+        output = io.BytesIO()
+        
+        with EXPORT_RENDER_DURATION.time(report='analytics'), pd.ExcelWriter(output, engine='openpyxl') as writer:
+            _write_analytics_sheets(writer, analytics)
+        
+        output.seek(0)
+        
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name='channel_analytics.xlsx'
+        )
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to generate Excel file: {str(e)}'
+        }), 500
+
+
+@download_bp.route('/download/pace', methods=['GET'])
+@admission_controlled
+def download_pace():
+    """Download the booking pace report as Excel file."""
+    storage = current_app.config['DATA_STORAGE']
+    
+    if 'results' not in storage:
+        return jsonify({
+            'success': False,
+            'error': 'No results available. Please run processing first.'
+        }), 404
+    
+    analytics = storage['results'].get('analytics')
+    if not analytics or 'pace' not in analytics:
+        return jsonify({
+            'success': False,
+            'error': 'Pace data not available'
+        }), 404
+    
+    try:
+        output = io.BytesIO()
+        
+        with EXPORT_RENDER_DURATION.time(report='pace'), pd.ExcelWriter(output, engine='openpyxl') as writer:
+            _write_pace_sheet(writer, analytics['pace'])
+        
+        output.seek(0)
+        
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name='booking_pace.xlsx'
+        )
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to generate Excel file: {str(e)}'
+        }), 500
+
+
+@download_bp.route('/download/comparison', methods=['GET'])
+@admission_controlled
+def download_comparison():
+    """Download a period-over-period comparison as Excel file (same parameters as /results/comparison)."""
+    storage = current_app.config['DATA_STORAGE']
+    stored = storage.get(history.history_key(request.args.get('dataset')))
+    
+    try:
+        period, against = history.resolve_periods(stored, request.args.get('period'), request.args.get('against'))
+        comparison = history.compare_periods(stored, period, against)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    
+    try:
+        output = io.BytesIO()
+        
+        with EXPORT_RENDER_DURATION.time(report='comparison'), pd.ExcelWriter(output, engine='openpyxl') as writer:
+            _write_comparison_sheets(writer, comparison)
         
+        output.seek(0)
+        
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=f"comparison_{period[0]}_{period[1]}_vs_{against[0]}_{against[1]}.xlsx"
+        )
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to generate Excel file: {str(e)}'
+        }), 500
+
+
+@download_bp.route('/download/batch', methods=['GET'])
+@admission_controlled
+def download_batch():
+    """Download a combined workbook for the last batch run."""
+    storage = current_app.config['DATA_STORAGE']
+    
+    if 'batch' not in storage:
+        return jsonify({
+            'success': False,
+            'error': 'No batch results available. Please run a batch first.'
+        }), 404
+    
+    try:
+        summary_rows = []
+        revenue_frames = []
+        occupancy_frames = []
+        
+        for dataset, result in storage['batch'].items():
+            if not result['success']:
+                summary_rows.append({'Dataset': dataset, 'Status': 'Failed', 'Errors': '; '.join(result['errors'])})
+                continue
+            
+            general = result['occupancy']['general_stats']
+            revenue = result['revenue']['reservations_summary']
+            summary_rows.append({
+                'Dataset': dataset,
+                'Status': 'OK',
+                'Errors': '',
+                'Total Guests': general['total_guests'],
+                'Total Nights': general['total_nights'],
+                'Total Reservations': general['total_reservations'],
+                'Total Gross Value': revenue['total_gross_value'],
+                'Total Commissions': revenue['total_commissions'],
+                'Total IVA': revenue['total_iva'],
+                'Total Net Value': revenue['total_net_value']
+            })
+            
+            res_by_prop = pd.DataFrame(result['revenue']['reservations_by_property'])
+            res_by_prop.columns = ['Property', 'Gross Value', 'Commission', 'IVA Amount', 'Net Value', 'Reservation Count']
+            res_by_prop.insert(0, 'Dataset', dataset)
+            revenue_frames.append(res_by_prop)
+            
+            for property_name, data in result['occupancy'].get('by_property', {}).items():
+                df = pd.DataFrame(data)
+                df.columns = ['Nationality', 'Unique Guests', 'Total People', 'Total Nights', 'Person-Nights']
+                df = df[df['Nationality'] != '']
+                df.insert(0, 'Property', property_name)
+                df.insert(0, 'Dataset', dataset)
+                occupancy_frames.append(df)
+        
+        output = io.BytesIO()
+        
+        with EXPORT_RENDER_DURATION.time(report='batch'), pd.ExcelWriter(output, engine='openpyxl') as writer:
+            pd.DataFrame(summary_rows).to_excel(writer, sheet_name='Batch Summary', index=False)
+            
+            if revenue_frames:
+                pd.concat(revenue_frames, ignore_index=True).to_excel(writer, sheet_name='Revenue by Property', index=False)
+            
+            if occupancy_frames:
+                pd.concat(occupancy_frames, ignore_index=True).to_excel(writer, sheet_name='Occupancy by Property', index=False)
+        
+        output.seek(0)
+        
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name='talkguest_batch_report.xlsx'
+        )
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -1,19 +1,35 @@
 """
 Health Check Router
 ===================
-Provides health check endpoint for Docker and load balancers.
+Provides liveness and readiness endpoints for Docker and load balancers.
+
+Liveness only says the process answers requests. Readiness also reports
+whether this worker can take more work: free heavy-work slots, background
+parse queue depth and memory pressure.
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
 
 health_bp = Blueprint('health', __name__)
 
 
 @health_bp.route('/health', methods=['GET'])
+@health_bp.route('/health/live', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
+    """Liveness endpoint."""
     return jsonify({
         'status': 'healthy',
         'service': 'talkguest-api',
         'version': '1.0.0'
     }), 200
+
+
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint; 503 while the worker is saturated."""
+    status = current_app.extensions['load_controller'].status()
+    
+    return jsonify({
+        'status': 'ready' if status['ready'] else 'saturated',
+        **status
+    }), 200 if status['ready'] else 503
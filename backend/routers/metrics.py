@@ -0,0 +1,25 @@
+"""
+Metrics Router
+==============
+Exposes operational metrics in the Prometheus text format.
+"""
+
+from flask import Blueprint, Response, current_app
+
+from services import metrics
+from services.dataset_store import PersistentStorage
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Request latencies, upload sizes, parse and pipeline stage durations,
+    export render times, storage footprint, active jobs and cache hit counts.
+    """
+    storage = current_app.config['DATA_STORAGE']
+    entries = storage.loaded_items() if isinstance(storage, PersistentStorage) else dict(storage)
+    metrics.update_storage_footprint(entries)
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
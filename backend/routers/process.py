@@ -1,16 +1,36 @@
 """
 Process Router
 ==============
-Handles ETL processing trigger and status.
+Handles ETL processing trigger, cancellation and status.
 """
 
+import time
+import uuid
+
 from flask import Blueprint, request, jsonify, current_app
-from services.etl_service import ETLService
+from services.cancellation import CancellationToken
+from services.lazy_import import lazy_module
+from services.load_control import admission_controlled
+from services.metrics import ACTIVE_JOBS
+
+etl_service = lazy_module('services.etl_service')
+excel_reader = lazy_module('services.excel_reader')
+history = lazy_module('services.history')
 
 process_bp = Blueprint('process', __name__)
 
+# Storage keys shared by all worker processes
+ACTIVE_RUN_KEY = 'active_run'
+CANCEL_REQUEST_KEY = 'cancel_requested'
+
+
+def _uploaded_dataframe(storage, file_type):
+    """Parsed upload of ``file_type``, waiting for a parse running in any worker."""
+    return excel_reader.get_dataframe(storage[file_type], reload=lambda: storage[file_type])
+
 
 @process_bp.route('/process', methods=['POST'])
+@admission_controlled
 def run_processing():
     """
     Run the ETL pipeline on uploaded files.
@@ -18,10 +38,15 @@ def run_processing():
     Requires: guests and reservations files to be uploaded.
     Optional: invoices file.
     
+    ``?dataset=`` names the client or property portfolio whose comparison
+    history the run's monthly totals are added to (default ``default``).
+    
     Request body can contain optional config overrides:
     {
         "iva_rates": {"azores": 0.04, "fuzeta": 0.06},
-        "property_groups": {...}
+        "property_groups": {...},
+        "name_matching": {"enabled": true, "threshold": 0.88},
+        "tourist_tax": {"enabled": true, "municipalities": {"olhao": {"rate": 1.5}}, ...}
     }
     """
     storage = current_app.config['DATA_STORAGE']
@@ -44,33 +69,72 @@ def run_processing():
     if request.is_json and request.json:
         config = request.json.get('config')
     
+    # Wait for any background parses still running
+    try:
+        guests_df = _uploaded_dataframe(storage, 'guests')
+        reservations_df = _uploaded_dataframe(storage, 'reservations')
+        invoices_df = _uploaded_dataframe(storage, 'invoices') if 'invoices' in storage else None
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to process file: {str(e)}'
+        }), 400
+    
+    # Cancelled by DELETE /api/process on this worker directly, or on another
+    # worker through the shared storage flag
+    run_id = uuid.uuid4().hex
+    token = CancellationToken(
+        wall_time_limit=current_app.config['PIPELINE_TIME_LIMIT'],
+        cpu_time_limit=current_app.config['PIPELINE_CPU_TIME_LIMIT'],
+        external_check=lambda: storage.get(CANCEL_REQUEST_KEY) == run_id,
+        run_id=run_id
+    )
+    storage[ACTIVE_RUN_KEY] = {'run_id': run_id, 'started_at': token.started_at}
+    
     try:
         # Initialize ETL service
-        etl = ETLService(config=config)
+        etl = etl_service.ETLService(
+            config=config,
+            max_workers=current_app.config.get('ETL_MAX_WORKERS', 0),
+            cancel_token=token
+        )
         
-        # Get dataframes from storage
-        guests_df = storage['guests']['dataframe']
-        reservations_df = storage['reservations']['dataframe']
-        invoices_df = storage['invoices']['dataframe'] if 'invoices' in storage else None
+        # Clean and merge; report sections are built when first requested
+        with ACTIVE_JOBS.track_inprogress(job='process'), current_app.extensions['pipeline_runs'].track(token):
+            result = etl.run_pipeline(guests_df, reservations_df, invoices_df, lazy=True)
         
-        # Run pipeline
-        result = etl.run_pipeline(guests_df, reservations_df, invoices_df)
+        if result.get('cancelled'):
+            # Nothing from the stopped run is kept
+            return jsonify({
+                'success': False,
+                'cancelled': True,
+                'timed_out': result['timed_out'],
+                'errors': result['errors'],
+                'log': result['log']
+            }), 422 if result['timed_out'] else 409
         
         if result['success']:
             # Store results
             storage['results'] = {
                 'occupancy': result['occupancy'],
                 'revenue': result['revenue'],
-                'summary': result['summary']
+                'analytics': result['analytics'],
+                'summary': result['summary'],
+                'data_quality': result['data_quality']
             }
             storage['processing_log'] = result['log']
             
-            return jsonify({
+            response = jsonify({
                 'success': True,
                 'message': 'Processing completed successfully',
                 'summary': result['summary'],
                 'log': result['log']
-            }), 200
+            })
+            # This run's monthly totals are kept for later period comparisons;
+            # they are computed once the response has been sent
+            dataset = request.args.get('dataset')
+            response.call_on_close(lambda: history.record_run(storage, dataset, result['aggregates']))
+            return response, 200
         else:
             # Store errors
             storage['errors'] = result['errors']
@@ -81,12 +145,55 @@ def run_processing():
                 'errors': result['errors'],
                 'log': result['log']
             }), 400
-            
+    
     except Exception as e:
         return jsonify({
             'success': False,
             'error': f'Processing failed: {str(e)}'
         }), 500
+    
+    finally:
+        _finish_run(storage, run_id)
+
+
+def _finish_run(storage, run_id: str):
+    """Clear the shared run markers if they still belong to ``run_id``."""
+    active = storage.get(ACTIVE_RUN_KEY)
+    if active is not None and active['run_id'] == run_id:
+        del storage[ACTIVE_RUN_KEY]
+    if storage.get(CANCEL_REQUEST_KEY) == run_id:
+        del storage[CANCEL_REQUEST_KEY]
+
+
+@process_bp.route('/process', methods=['DELETE'])
+def cancel_processing():
+    """
+    Cancel the pipeline run in progress.
+    
+    The run stops at its next checkpoint (between stages or properties),
+    discards its partial results and answers its own request with 409.
+    Previously stored results are left untouched.
+    """
+    storage = current_app.config['DATA_STORAGE']
+    active = storage.get(ACTIVE_RUN_KEY)
+    cancelled = current_app.extensions['pipeline_runs'].cancel()
+    
+    # The run may be on another worker process; it polls this flag
+    if active is not None and active['run_id'] not in cancelled:
+        storage[CANCEL_REQUEST_KEY] = active['run_id']
+        cancelled.append(active['run_id'])
+    
+    if not cancelled:
+        return jsonify({
+            'success': False,
+            'error': 'No processing run in progress'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'message': 'Cancellation requested',
+        'run_ids': cancelled
+    }), 202
 
 
 @process_bp.route('/process/status', methods=['GET'])
@@ -96,9 +203,12 @@ def processing_status():
     
     has_results = 'results' in storage
     has_errors = 'errors' in storage
+    active = storage.get(ACTIVE_RUN_KEY)
     
     status = 'not_started'
-    if has_results:
+    if active is not None:
+        status = 'running'
+    elif has_results:
         status = 'completed'
     elif has_errors:
         status = 'failed'
@@ -109,6 +219,10 @@ def processing_status():
         'log': storage.get('processing_log', [])
     }
     
+    if active is not None:
+        response['run_id'] = active['run_id']
+        response['elapsed_seconds'] = round(time.time() - active['started_at'], 1)
+    
     if has_results:
         response['summary'] = storage['results'].get('summary', {})
     
@@ -2,16 +2,37 @@
 Results Router
 ==============
 Provides access to processed data results.
+
+Report sections are computed on first request. Every endpoint accepts an
+optional ``sections`` query parameter (comma-separated, dotted for nested
+sections) so clients can fetch only what they display.
 """
 
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
+from services.lazy_import import lazy_module
+from services.lazy_report import materialize
+
+history = lazy_module('services.history')
 
 results_bp = Blueprint('results', __name__)
 
 
+def _requested_sections():
+    """Section names from the ``sections`` query parameter, or None for all."""
+    sections = request.args.get('sections')
+    if not sections:
+        return None
+    return [section.strip() for section in sections.split(',') if section.strip()]
+
+
 @results_bp.route('/results', methods=['GET'])
 def get_all_results():
-    """Get all processing results."""
+    """
+    Get all processing results.
+    
+    Example: ``/results?sections=summary,occupancy.general_stats`` returns the
+    summary and the occupancy totals without building any other section.
+    """
     storage = current_app.config['DATA_STORAGE']
     
     if 'results' not in storage:
@@ -22,7 +43,7 @@ def get_all_results():
     
     return jsonify({
         'success': True,
-        'data': storage['results']
+        'data': materialize(storage['results'], _requested_sections())
     }), 200
 
 
@@ -46,7 +67,7 @@ def get_occupancy_results():
     
     return jsonify({
         'success': True,
-        'data': occupancy
+        'data': materialize(occupancy, _requested_sections())
     }), 200
 
 
@@ -70,7 +91,82 @@ def get_revenue_results():
     
     return jsonify({
         'success': True,
-        'data': revenue
+        'data': materialize(revenue, _requested_sections())
+    }), 200
+
+
+@results_bp.route('/results/analytics', methods=['GET'])
+def get_analytics_results():
+    """Get channel and booking-window analytics."""
+    storage = current_app.config['DATA_STORAGE']
+    
+    if 'results' not in storage:
+        return jsonify({
+            'success': False,
+            'error': 'No results available. Please run processing first.'
+        }), 404
+    
+    analytics = storage['results'].get('analytics')
+    if not analytics:
+        return jsonify({
+            'success': False,
+            'error': 'Analytics data not available'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': materialize(analytics, _requested_sections())
+    }), 200
+
+
+@results_bp.route('/results/pace', methods=['GET'])
+def get_pace_results():
+    """Get booking pace per stay month and days before arrival."""
+    storage = current_app.config['DATA_STORAGE']
+    
+    if 'results' not in storage:
+        return jsonify({
+            'success': False,
+            'error': 'No results available. Please run processing first.'
+        }), 404
+    
+    analytics = storage['results'].get('analytics')
+    if not analytics or 'pace' not in analytics:
+        return jsonify({
+            'success': False,
+            'error': 'Pace data not available'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': materialize(analytics['pace'], _requested_sections())
+    }), 200
+
+
+@results_bp.route('/results/comparison', methods=['GET'])
+def get_comparison():
+    """
+    Compare a period with an earlier one from stored monthly aggregates.
+    
+    Query parameters: ``period`` (``YYYY-MM`` or ``YYYY-MM:YYYY-MM``, default
+    the months of the last run), ``against`` (``last_year`` by default,
+    ``previous`` or a month range) and ``dataset`` (the history to read,
+    ``default`` unless the runs or batch datasets were named).
+    """
+    storage = current_app.config['DATA_STORAGE']
+    stored = storage.get(history.history_key(request.args.get('dataset')))
+    
+    try:
+        period, against = history.resolve_periods(stored, request.args.get('period'), request.args.get('against'))
+        comparison = history.compare_periods(stored, period, against)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    
+    return jsonify({
+        'success': True,
+        'data': materialize(comparison, _requested_sections())
     }), 200
 
 
@@ -5,18 +5,33 @@ Handles file uploads for guests, reservations, and invoices data.
 """
 
 from flask import Blueprint, request, jsonify, current_app
-import pandas as pd
+import threading
+import zipfile
 import io
+import os
+
+from services.chunked_upload import ChunkedUploadStore, ChunkedUploadError
+from services.lazy_import import lazy_module
+from services.metrics import UPLOAD_SIZE
+
+excel_reader = lazy_module('services.excel_reader')
+etl_service = lazy_module('services.etl_service')
+history = lazy_module('services.history')
 
 upload_bp = Blueprint('upload', __name__)
 
 
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ARCHIVE_EXTENSIONS = {'zip'}
+
+# File types that accept several workbooks (or a zip) in one upload
+MULTI_FILE_TYPES = {'reservations', 'invoices'}
 
 # Column markers for file type detection
 GUESTS_MARKERS = {'Nome', 'Pais'}  # Portuguese guests file columns
 RESERVATIONS_MARKERS_PT = {'Reserva', 'Hóspede', 'Noites', 'Alojamento', 'Valor Reserva'}
 RESERVATIONS_MARKERS_EN = {'Reservation', 'Guest', 'Nights', 'Rental', 'Reservation Value'}
+INVOICES_MARKERS = {'Tipo Item', 'Total Documento', 'Anulado'}
 
 
 def allowed_file(filename):
@@ -24,12 +39,18 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def is_archive(filename):
+    """Check if file is a zip archive of workbooks."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ARCHIVE_EXTENSIONS
+
+
 def detect_file_type(df):
     """
     Detect the actual file type based on column headers.
     
     Returns:
-        tuple: (detected_type, confidence) where type is 'guests', 'reservations', or 'unknown'
+        tuple: (detected_type, confidence) where type is 'guests', 'reservations',
+        'invoices' or 'unknown'
     """
     columns = set(df.columns)
     
@@ -37,6 +58,7 @@ def detect_file_type(df):
     reservations_pt_matches = len(columns & RESERVATIONS_MARKERS_PT)
     reservations_en_matches = len(columns & RESERVATIONS_MARKERS_EN)
     reservations_matches = max(reservations_pt_matches, reservations_en_matches)
+    invoices_matches = len(columns & INVOICES_MARKERS)
     
     # Guests file typically has Nome and Pais
     if guests_matches >= 2 and reservations_matches < 3:
@@ -46,6 +68,10 @@ def detect_file_type(df):
     if reservations_matches >= 3:
         return 'reservations', reservations_matches
     
+    # Invoices export has the document type, total and cancelled flag
+    if invoices_matches >= 2:
+        return 'invoices', invoices_matches
+    
     return 'unknown', 0
 
 
@@ -77,6 +103,10 @@ def upload_file(file_type):
     """
     Upload an Excel file for processing.
     
+    Workbooks with several sheets are split by sheet content: every sheet
+    is classified from its header, and guests, reservations and invoices
+    sheets replace their own uploads, so one workbook can fill several slots.
+    
     Args:
         file_type: One of 'guests', 'reservations', or 'invoices'
     
@@ -97,7 +127,11 @@ def upload_file(file_type):
             'error': 'No file provided'
         }), 400
     
-    file = request.files['file']
+    files = request.files.getlist('file')
+    if len(files) > 1 or is_archive(files[0].filename):
+        return _upload_many(file_type, files)
+    
+    file = files[0]
     
     if file.filename == '':
         return jsonify({
@@ -114,29 +148,357 @@ def upload_file(file_type):
     try:
         # Read file into memory
         file_content = file.read()
+        return _store_upload(file_type, file.filename, file_content)
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to process file: {str(e)}'
+        }), 400
+
+
+def _store_upload(file_type, filename, source, release_source=None):
+    """
+    Validate an uploaded workbook and store it for processing.
+    
+    Args:
+        file_type: One of 'guests', 'reservations', or 'invoices'
+        filename: Original file name
+        source: Raw workbook bytes, or the path of a workbook on disk
+        release_source: Optional callback run once ``source`` is no longer needed
+    
+    Returns:
+        Flask response tuple with upload status and file info
+    """
+    release_source = release_source or (lambda: None)
+    UPLOAD_SIZE.observe(len(source) if isinstance(source, bytes) else os.path.getsize(source), file_type=file_type)
+    
+    if filename.rsplit('.', 1)[1].lower() == 'xlsx':
+        # Fast path: header and first rows only, full parse continues in the background
+        sheets = excel_reader.read_sheet_previews(source)
+        parsed_sheets = None
+    else:
+        # Legacy .xls files have no streaming preview; parse them up front
+        parsed_sheets = excel_reader.read_all_sheets(source, current_app.config['EXCEL_ENGINE'])
+        sheets = [
+            (name, df.head(excel_reader.PREVIEW_ROWS), len(df))
+            for name, df in parsed_sheets.items()
+        ]
+        release_source()
+    
+    if len(sheets) > 1:
+        return _store_sheets(file_type, filename, source, sheets, parsed_sheets, release_source)
+    
+    sheet_name, preview_df, row_count = sheets[0]
+    parsed = parsed_sheets[sheet_name] if parsed_sheets is not None else None
+    
+    # Validate file type matches expected type (guests vs reservations)
+    if file_type in ['guests', 'reservations']:
+        is_valid, error_code, error_type = validate_file_type(preview_df, file_type)
+        if not is_valid:
+            release_source()
+            return jsonify({
+                'success': False,
+                'error': error_code,
+                'error_type': error_type
+            }), 400
+    
+    # Store in app storage
+    storage = current_app.config['DATA_STORAGE']
+    entry = {
+        'filename': filename,
+        'sheets': [sheet_name],
+        'columns': preview_df.columns.tolist(),
+        'row_count': row_count
+    }
+    if parsed is not None:
+        entry['dataframe'] = parsed
+    else:
+        # Kept until parsed, in case the parse has to be repeated in another worker
+        entry['data'] = source
+        entry['engine'] = current_app.config['EXCEL_ENGINE']
+        entry['dataframe_future'] = excel_reader.submit_parse(source, sheet_name, current_app.config['EXCEL_ENGINE'])
+        entry['dataframe_future'].add_done_callback(lambda _: release_source())
+    storage[file_type] = entry
+    
+    # Clear any previous processing results when new file is uploaded
+    if 'results' in storage:
+        del storage['results']
+    if 'errors' in storage:
+        del storage['errors']
+    
+    # Convert preview to JSON-safe format (replace NaN with None)
+    preview_df = preview_df.astype(object).fillna('')  # Replace NaN/NaT with empty string for preview
+    
+    return jsonify({
+        'success': True,
+        'message': f'{file_type.capitalize()} file uploaded successfully',
+        'filename': filename,
+        'columns': preview_df.columns.tolist(),
+        'row_count': row_count,
+        'preview': preview_df.to_dict(orient='records')
+    }), 200
+
+
+def _dedup_subset(file_type, preview_df):
+    """Columns identifying a repeated row when merging parts of one upload; None for whole rows."""
+    if file_type != 'reservations':
+        return None
+    cols = etl_service.RESERVATIONS_COLUMNS[etl_service.detect_reservations_language(preview_df)]
+    return [cols['guest'], cols['checkin'], cols['checkout'], cols['property']]
+
+
+def _release_after(futures, release_source):
+    """Run ``release_source`` once every future has finished."""
+    if not futures:
+        release_source()
+        return
+    
+    remaining = [len(futures)]
+    lock = threading.Lock()
+    
+    def done(_future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            release_source()
+    
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def _store_sheets(file_type, filename, source, sheets, parsed_sheets, release_source):
+    """
+    Route the sheets of a multi-sheet workbook to their upload slots.
+    
+    Each sheet is classified from its header preview. Sheets of one type
+    must share their columns; they are parsed in parallel worker processes,
+    concatenated and stored as that type's upload. Unclassified sheets are
+    ignored, unless no sheet can be classified, in which case the first
+    sheet is stored as ``file_type`` like a single-sheet workbook.
+    
+    Args:
+        file_type: Upload slot the workbook was sent to
+        filename: Original file name
+        source: Raw workbook bytes, or the path of a workbook on disk
+        sheets: (sheet name, preview DataFrame, row count) per sheet
+        parsed_sheets: Fully parsed sheets for .xls workbooks, else None
+        release_source: Callback run once ``source`` is no longer needed
+    
+    Returns:
+        Flask response tuple with upload status, per-type sheets and
+        ignored sheets
+    """
+    groups = {}
+    ignored = []
+    for sheet in sheets:
+        detected_type, _ = detect_file_type(sheet[1])
+        if detected_type == 'unknown':
+            ignored.append(sheet[0])
+        else:
+            groups.setdefault(detected_type, []).append(sheet)
+    
+    if not groups:
+        groups = {file_type: sheets[:1]}
+        ignored = [name for name, _, _ in sheets[1:]]
+    
+    if file_type not in groups:
+        release_source()
+        # A workbook holding only the other kind of sheet is a swapped upload
+        is_valid, error_code, error_type = validate_file_type(next(iter(groups.values()))[0][1], file_type)
+        return jsonify({
+            'success': False,
+            'error': error_code if not is_valid else f'No {file_type} sheet found in {filename}',
+            'error_type': error_type if not is_valid else 'missing_sheet'
+        }), 400
+    
+    for detected_type, group in groups.items():
+        columns = set(group[0][1].columns)
+        for name, preview_df, _ in group[1:]:
+            if set(preview_df.columns) != columns:
+                release_source()
+                return jsonify({
+                    'success': False,
+                    'error': f'Columns of sheet {name} do not match the other {detected_type} sheets'
+                }), 400
+    
+    storage = current_app.config['DATA_STORAGE']
+    workers = current_app.config.get('UPLOAD_PARSE_WORKERS', 1)
+    futures = []
+    for detected_type, group in groups.items():
+        names = [name for name, _, _ in group]
+        subset = _dedup_subset(detected_type, group[0][1])
+        entry = {
+            'filename': filename,
+            'sheets': names,
+            'columns': group[0][1].columns.tolist(),
+            'row_count': sum(count for _, _, count in group)
+        }
+        if subset:
+            entry['subset'] = subset
+        if parsed_sheets is not None:
+            frames = [parsed_sheets[name] for name in names]
+            entry['dataframe'] = frames[0] if len(frames) == 1 else excel_reader.merge_frames(frames, subset)
+            entry['row_count'] = len(entry['dataframe'])
+        else:
+            entry['data'] = source
+            entry['engine'] = current_app.config['EXCEL_ENGINE']
+            entry['dataframe_future'] = excel_reader.submit_parse_sheets(
+                source, names, workers, subset, current_app.config['EXCEL_ENGINE']
+            )
+            futures.append(entry['dataframe_future'])
+        storage[detected_type] = entry
+    _release_after(futures, release_source)
+    
+    # Clear any previous processing results when new file is uploaded
+    if 'results' in storage:
+        del storage['results']
+    if 'errors' in storage:
+        del storage['errors']
+    
+    primary = groups[file_type]
+    preview_df = primary[0][1].astype(object).fillna('')
+    routed = ', '.join(
+        f"{detected_type} ({len(group)} sheet{'s' if len(group) > 1 else ''})"
+        for detected_type, group in groups.items()
+    )
+    
+    return jsonify({
+        'success': True,
+        'message': f'Workbook uploaded: {routed}',
+        'filename': filename,
+        'columns': storage[file_type]['columns'],
+        'row_count': storage[file_type]['row_count'],
+        'preview': preview_df.to_dict(orient='records'),
+        'sheets': {detected_type: [name for name, _, _ in group] for detected_type, group in groups.items()},
+        'ignored_sheets': ignored
+    }), 200
+
+
+def _upload_many(file_type, files):
+    """
+    Merge several workbooks (or a zip of workbooks) into one upload.
+    
+    Headers are checked up front so that swapped files and reservation
+    exports in different languages are rejected before anything is parsed.
+    From multi-sheet workbooks, the sheets classified as ``file_type`` are
+    taken (the first sheet if none is). The sheets are then parsed in
+    parallel in the background, concatenated and deduplicated.
+    
+    Returns:
+        Flask response tuple with upload status and merged file info
+    """
+    if file_type not in MULTI_FILE_TYPES:
+        return jsonify({
+            'success': False,
+            'error': f'Only one {file_type} file can be uploaded at a time'
+        }), 400
+    
+    try:
+        sources = []
+        # Extracted bytes of all archives in the request, checked before reading
+        max_size = current_app.config.get('UPLOAD_MAX_UNCOMPRESSED_SIZE')
+        extracted = 0
+        for file in files:
+            if is_archive(file.filename):
+                with zipfile.ZipFile(io.BytesIO(file.read())) as zf:
+                    members = [
+                        info for info in sorted(zf.infolist(), key=lambda info: info.filename)
+                        if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+                        and os.path.basename(info.filename) and allowed_file(os.path.basename(info.filename))
+                    ]
+                    extracted += sum(info.file_size for info in members)
+                    if max_size and extracted > max_size:
+                        return jsonify({
+                            'success': False,
+                            'error': 'Archive is too large once extracted'
+                        }), 400
+                    for info in members:
+                        sources.append((os.path.basename(info.filename), zf.read(info)))
+            elif allowed_file(file.filename):
+                sources.append((file.filename, file.read()))
+            else:
+                return jsonify({
+                    'success': False,
+                    'error': 'Invalid file type. Only Excel files (.xlsx, .xls) or .zip archives are allowed'
+                }), 400
+        
+        if not sources:
+            return jsonify({
+                'success': False,
+                'error': 'No Excel files found in upload'
+            }), 400
         
-        # Try to parse as Excel to validate
-        df = pd.read_excel(io.BytesIO(file_content))
+        for _, content in sources:
+            UPLOAD_SIZE.observe(len(content), file_type=file_type)
         
-        # Validate file type matches expected type (guests vs reservations)
-        if file_type in ['guests', 'reservations']:
-            is_valid, error_code, error_type = validate_file_type(df, file_type)
-            if not is_valid:
+        # (label, content, sheet, preview, row count) per sheet to merge
+        parts = []
+        for filename, content in sources:
+            if filename.rsplit('.', 1)[1].lower() == 'xlsx':
+                sheets = excel_reader.read_sheet_previews(content)
+            else:
+                sheets = [
+                    (name, df.head(excel_reader.PREVIEW_ROWS), len(df))
+                    for name, df in excel_reader.read_all_sheets(content, current_app.config['EXCEL_ENGINE']).items()
+                ]
+            matching = [sheet for sheet in sheets if detect_file_type(sheet[1])[0] == file_type]
+            for name, preview_df, count in matching or sheets[:1]:
+                label = filename if len(sheets) == 1 else f'{filename} [{name}]'
+                parts.append((label, content, name, preview_df, count))
+        
+        subset = None
+        if file_type == 'reservations':
+            languages = set()
+            for label, _, _, preview_df, _ in parts:
+                is_valid, error_code, error_type = validate_file_type(preview_df, file_type)
+                if not is_valid:
+                    return jsonify({
+                        'success': False,
+                        'error': error_code,
+                        'error_type': error_type,
+                        'filename': label
+                    }), 400
+                languages.add(etl_service.detect_reservations_language(preview_df))
+            
+            if len(languages) > 1:
+                return jsonify({
+                    'success': False,
+                    'error': 'All reservation files must use the same language (Portuguese or English columns)'
+                }), 400
+            
+            subset = _dedup_subset(file_type, parts[0][3])
+        
+        columns = parts[0][3].columns.tolist()
+        for label, _, _, preview_df, _ in parts:
+            if set(preview_df.columns) != set(columns):
                 return jsonify({
                     'success': False,
-                    'error': error_code,
-                    'error_type': error_type
+                    'error': f'Columns of {label} do not match the other {file_type} files'
                 }), 400
         
-        # Store in app storage
         storage = current_app.config['DATA_STORAGE']
-        storage[file_type] = {
-            'filename': file.filename,
-            'data': file_content,
-            'dataframe': df,
-            'columns': df.columns.tolist(),
-            'row_count': len(df)
+        row_count = sum(part[4] for part in parts)
+        entry = {
+            'filename': ', '.join(filename for filename, _ in sources),
+            'files': [filename for filename, _ in sources],
+            'columns': columns,
+            'row_count': row_count,
+            'data': [part[1] for part in parts],
+            'sheets': [part[2] for part in parts],
+            'engine': current_app.config['EXCEL_ENGINE']
         }
+        if subset:
+            entry['subset'] = subset
+        entry['dataframe_future'] = excel_reader.submit_parse_many(
+            entry['data'],
+            current_app.config.get('UPLOAD_PARSE_WORKERS', 1),
+            subset,
+            entry['sheets'],
+            entry['engine']
+        )
+        storage[file_type] = entry
         
         # Clear any previous processing results when new file is uploaded
         if 'results' in storage:
@@ -144,18 +506,18 @@ def upload_file(file_type):
         if 'errors' in storage:
             del storage['errors']
         
-        # Convert preview to JSON-safe format (replace NaN with None)
-        preview_df = df.head(5).fillna('')  # Replace NaN with empty string for preview
+        preview_df = parts[0][3].astype(object).fillna('')
         
         return jsonify({
             'success': True,
-            'message': f'{file_type.capitalize()} file uploaded successfully',
-            'filename': file.filename,
-            'columns': df.columns.tolist(),
-            'row_count': len(df),
+            'message': f'{len(sources)} {file_type} files uploaded successfully',
+            'filename': entry['filename'],
+            'files': entry['files'],
+            'columns': columns,
+            'row_count': row_count,
             'preview': preview_df.to_dict(orient='records')
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -163,6 +525,167 @@ def upload_file(file_type):
         }), 400
 
 
+def _chunked_store():
+    """Chunked upload store for the current app, created on first use."""
+    store = current_app.extensions.get('chunked_uploads')
+    if store is None:
+        store = ChunkedUploadStore(
+            current_app.config['UPLOAD_TMP_DIR'],
+            current_app.config['MAX_CHUNKED_UPLOAD_SIZE']
+        )
+        current_app.extensions['chunked_uploads'] = store
+    return store
+
+
+def _chunked_error(error):
+    """JSON response for a rejected chunked upload request."""
+    return jsonify({
+        'success': False,
+        'error': str(error)
+    }), error.status_code
+
+
+@upload_bp.route('/upload/<file_type>/sessions', methods=['POST'])
+def create_upload_session(file_type):
+    """
+    Start a resumable chunked upload.
+    
+    Request body:
+    {
+        "filename": "reservations_2024.xlsx",
+        "size": 123456789,
+        "sha256": "<optional hex digest of the whole file>"
+    }
+    
+    Returns:
+        JSON with ``upload_id`` and the suggested ``chunk_size``
+    """
+    valid_types = ['guests', 'reservations', 'invoices']
+    
+    if file_type not in valid_types:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid file type. Must be one of: {", ".join(valid_types)}'
+        }), 400
+    
+    body = request.get_json(silent=True) or {}
+    filename = body.get('filename', '')
+    
+    if not allowed_file(filename):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid file type. Only Excel files (.xlsx, .xls) are allowed'
+        }), 400
+    
+    try:
+        session = _chunked_store().create(file_type, filename, int(body.get('size', 0)), body.get('sha256'))
+    except ChunkedUploadError as e:
+        return _chunked_error(e)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'size must be an integer'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'upload_id': session['upload_id'],
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+        'received': 0
+    }), 201
+
+
+@upload_bp.route('/upload/sessions/<upload_id>', methods=['GET'])
+def upload_session_status(upload_id):
+    """Get how many bytes of a chunked upload have been received, for resuming."""
+    try:
+        session = _chunked_store().status(upload_id)
+    except ChunkedUploadError as e:
+        return _chunked_error(e)
+    
+    return jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'filename': session['filename'],
+        'size': session['size'],
+        'received': session['received']
+    }), 200
+
+
+@upload_bp.route('/upload/sessions/<upload_id>', methods=['PUT'])
+def append_upload_chunk(upload_id):
+    """
+    Append a chunk to a chunked upload.
+    
+    The raw request body is the chunk. ``?offset=`` must equal the bytes
+    received so far; an optional ``X-Chunk-SHA256`` header is verified
+    before the chunk is accepted.
+    """
+    try:
+        offset = int(request.args.get('offset', -1))
+        received = _chunked_store().append(
+            upload_id, offset, request.stream, request.headers.get('X-Chunk-SHA256')
+        )
+    except ChunkedUploadError as e:
+        return _chunked_error(e)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'offset must be an integer'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'received': received
+    }), 200
+
+
+@upload_bp.route('/upload/sessions/<upload_id>/finalize', methods=['POST'])
+def finalize_upload_session(upload_id):
+    """
+    Verify a completed chunked upload and hand it to the parser.
+    
+    Request body may carry ``sha256`` if it was not given when the session
+    was created. Responds like ``POST /api/upload/<file_type>``.
+    """
+    body = request.get_json(silent=True) or {}
+    
+    try:
+        session = _chunked_store().finalize(upload_id, body.get('sha256'))
+    except ChunkedUploadError as e:
+        return _chunked_error(e)
+    
+    path = session['path']
+    
+    def remove_file():
+        if os.path.exists(path):
+            os.remove(path)
+    
+    try:
+        return _store_upload(session['file_type'], session['filename'], path, release_source=remove_file)
+    except Exception as e:
+        remove_file()
+        return jsonify({
+            'success': False,
+            'error': f'Failed to process file: {str(e)}'
+        }), 400
+
+
+@upload_bp.route('/upload/sessions/<upload_id>', methods=['DELETE'])
+def abort_upload_session(upload_id):
+    """Abort a chunked upload and discard the received bytes."""
+    try:
+        _chunked_store().abort(upload_id)
+    except ChunkedUploadError as e:
+        return _chunked_error(e)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Upload session aborted'
+    }), 200
+
+
 @upload_bp.route('/upload/status', methods=['GET'])
 def upload_status():
     """Get status of uploaded files."""
@@ -227,9 +750,11 @@ def delete_file(file_type):
 
 @upload_bp.route('/upload/clear', methods=['DELETE'])
 def clear_all():
-    """Clear all uploaded files and results."""
+    """Clear all uploaded files and results; the comparison history is kept."""
     storage = current_app.config['DATA_STORAGE']
-    storage.clear()
+    for key in list(storage):
+        if not history.is_history_key(key):
+            del storage[key]
     
     return jsonify({
         'success': True,
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Generate services/iso3166.py
+============================
+Writes the ISO 3166-1 table used by ``services.countries`` from the list
+distributed with pycountry, which is only needed to run this script:
+
+    pip install pycountry
+    python scripts/generate_iso3166.py
+"""
+
+import os
+
+import pycountry
+
+
+HEADER = '''"""
+ISO 3166
+========
+ISO 3166-1 country codes.
+
+Every officially assigned alpha-2 code with its alpha-3 code, English short
+name and other English names (the full ISO name where the short name is a
+common form, and the official name). Taken from the ISO 3166-1 list
+distributed with pycountry, so resolving countries needs no extra runtime
+dependency. Regenerate with ``scripts/generate_iso3166.py``.
+"""
+
+from typing import Dict, List, Tuple
+
+
+# ISO alpha-2 -> (alpha-3, English short name, other English names)
+ISO_3166: Dict[str, Tuple[str, str, List[str]]] = {
+'''
+
+OUTPUT = os.path.join(os.path.dirname(__file__), '..', 'services', 'iso3166.py')
+
+
+def country_row(country) -> str:
+    """Table line for one pycountry country."""
+    short_name = getattr(country, 'common_name', None) or country.name
+    other_names = []
+    for name in (country.name, getattr(country, 'official_name', None)):
+        if name and name != short_name and name not in other_names:
+            other_names.append(name)
+    return f'    {country.alpha_2!r}: ({country.alpha_3!r}, {short_name!r}, {other_names!r})'
+
+
+def main():
+    countries = sorted(pycountry.countries, key=lambda country: country.alpha_2)
+    with open(OUTPUT, 'w', encoding='utf-8') as f:
+        f.write(HEADER)
+        f.write(',\n'.join(country_row(country) for country in countries))
+        f.write('\n}\n')
+
+
+if __name__ == '__main__':
+    main()
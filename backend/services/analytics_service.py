@@ -0,0 +1,197 @@
+"""
+Analytics Service
+=================
+Channel and booking-window analytics over cleaned reservation data.
+
+All metrics are computed with array arithmetic on datetime64/float columns:
+per-channel ADR, RevPAR and commission rate, lead-time histograms
+(booked at -> check-in), length-of-stay distributions and cancellation rates.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+
+# Histogram bucket lower edges (days) and labels
+LEAD_TIME_EDGES = [0, 1, 8, 31, 91, 181]
+LEAD_TIME_LABELS = ['0 days', '1-7 days', '8-30 days', '31-90 days', '91-180 days', '181+ days']
+
+LENGTH_OF_STAY_EDGES = [1, 2, 3, 4, 7, 14]
+LENGTH_OF_STAY_LABELS = ['1 night', '2 nights', '3 nights', '4-6 nights', '7-13 nights', '14+ nights']
+
+CANCELLED_STATUS_PATTERN = r'cancel'
+
+
+def cancelled_mask(df: pd.DataFrame, cols) -> np.ndarray:
+    """
+    Flag cancelled reservations from the status text or the cancellation date.
+
+    Args:
+        df: Reservations DataFrame
+        cols: ColumnMapper for the reservation language
+
+    Returns:
+        Boolean array, True for cancelled reservations
+    """
+    mask = np.zeros(len(df), dtype=bool)
+
+    col_status = cols.res('status')
+    if col_status in df.columns:
+        mask |= df[col_status].astype(str).str.contains(CANCELLED_STATUS_PATTERN, case=False, na=False).to_numpy()
+
+    col_canceled_at = cols.res('canceled_at')
+    if col_canceled_at in df.columns:
+        mask |= df[col_canceled_at].notna().to_numpy()
+
+    return mask
+
+
+def _histogram(codes: np.ndarray, values: np.ndarray, edges: List[int], n_groups: int) -> np.ndarray:
+    """
+    Count values per (group, bucket) in one bincount.
+
+    Values below the first edge or NaN are ignored.
+
+    Returns:
+        Array of shape (n_groups, len(edges))
+    """
+    valid = ~np.isnan(values) & (values >= edges[0])
+    buckets = np.searchsorted(edges, values[valid], side='right') - 1
+    flat = codes[valid] * len(edges) + buckets
+    return np.bincount(flat, minlength=n_groups * len(edges)).reshape(n_groups, len(edges))
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise ratio that yields 0 where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+
+def _period(df: pd.DataFrame, cols) -> Tuple[pd.Timestamp, pd.Timestamp, int]:
+    """Stay period covered by the data: first check-in to last checkout."""
+    start = df[cols.res('checkin')].min()
+    end = df[cols.res('checkout')].max()
+    if pd.isna(start) or pd.isna(end) or end <= start:
+        return start, end, 0
+    return start, end, int((end - start) / np.timedelta64(1, 'D'))
+
+
+def compute_channel_analytics(df: pd.DataFrame, cols) -> Dict:
+    """
+    Compute per-channel performance and booking-window metrics.
+
+    Cancelled reservations count towards cancellation rates only; revenue,
+    nights, lead times and stay lengths use the remaining reservations.
+    RevPAR divides revenue by the room-nights available across all
+    properties over the stay period.
+
+    Args:
+        df: Reservations after test-entry removal (zero-value rows included,
+            since cancellations are often zeroed)
+        cols: ColumnMapper for the reservation language
+
+    Returns:
+        Dictionary with period, overall totals, per-channel metrics and
+        lead-time / length-of-stay histograms as table records
+    """
+    col_channel = cols.res('channel')
+    col_nights = cols.res('nights')
+    col_value = cols.res('reservation_value')
+    col_commission = cols.res('channel_commission')
+    col_checkin = cols.res('checkin')
+    col_booked_at = cols.res('booked_at')
+    col_cleaning_fee = cols.res('cleaning_fee')
+    col_property = cols.res('property')
+
+    codes, channels = pd.factorize(df[col_channel].fillna('Unknown').astype(str).str.strip(), sort=True)
+    n_channels = len(channels)
+    cancelled = cancelled_mask(df, cols)
+    active = ~cancelled
+
+    nights = df[col_nights].to_numpy(dtype=float)
+    revenue = df[col_value].to_numpy(dtype=float)
+    commission = df[col_commission].to_numpy(dtype=float)
+    cleaning = df[col_cleaning_fee].to_numpy(dtype=float) if col_cleaning_fee in df.columns else np.zeros(len(df))
+
+    if col_booked_at in df.columns:
+        lead_time = (
+            df[col_checkin].to_numpy(dtype='datetime64[ns]') - df[col_booked_at].to_numpy(dtype='datetime64[ns]')
+        ) / np.timedelta64(1, 'D')
+    else:
+        lead_time = np.full(len(df), np.nan)
+    lead_time = np.where(active, np.floor(lead_time), np.nan)
+
+    def per_channel(values: np.ndarray) -> np.ndarray:
+        return np.bincount(codes, weights=values, minlength=n_channels)
+
+    reservations = np.bincount(codes, minlength=n_channels)
+    cancellations = per_channel(cancelled.astype(float))
+    room_nights = per_channel(np.where(active, nights, 0))
+    channel_revenue = per_channel(np.where(active, revenue, 0))
+    channel_commission = per_channel(np.where(active, commission, 0))
+    channel_cleaning = per_channel(np.where(active, cleaning, 0))
+    active_count = reservations - cancellations
+
+    has_lead = ~np.isnan(lead_time)
+    lead_sum = per_channel(np.where(has_lead, lead_time, 0))
+    lead_count = per_channel(has_lead.astype(float))
+
+    start, end, days = _period(df, cols)
+    properties = int(df[col_property].nunique())
+    available_nights = days * properties
+
+    by_channel = pd.DataFrame({
+        'channel': channels,
+        'reservations': reservations,
+        'cancelled': cancellations.astype(int),
+        'cancellation_rate': _safe_ratio(cancellations, reservations),
+        'room_nights': room_nights.astype(int),
+        'revenue': channel_revenue,
+        'commission': channel_commission,
+        'commission_rate': _safe_ratio(channel_commission, channel_revenue),
+        'cleaning_fees': channel_cleaning,
+        'adr': _safe_ratio(channel_revenue, room_nights),
+        'revpar': channel_revenue / available_nights if available_nights else 0.0,
+        'avg_lead_time': _safe_ratio(lead_sum, lead_count),
+        'avg_length_of_stay': _safe_ratio(room_nights, active_count)
+    })
+    by_channel = by_channel.sort_values('revenue', ascending=False).round(4)
+
+    total_revenue = float(channel_revenue.sum())
+    total_nights = float(room_nights.sum())
+    overall = {
+        'reservations': int(reservations.sum()),
+        'cancelled': int(cancellations.sum()),
+        'cancellation_rate': round(float(_safe_ratio(cancellations.sum(), reservations.sum())), 4),
+        'room_nights': int(total_nights),
+        'revenue': round(total_revenue, 2),
+        'commission_rate': round(float(_safe_ratio(channel_commission.sum(), total_revenue)), 4),
+        'adr': round(float(_safe_ratio(total_revenue, total_nights)), 2),
+        'revpar': round(total_revenue / available_nights, 2) if available_nights else 0.0,
+        'occupancy_rate': round(total_nights / available_nights, 4) if available_nights else 0.0
+    }
+
+    lead_hist = _histogram(codes, lead_time, LEAD_TIME_EDGES, n_channels)
+    stay_hist = _histogram(codes, np.where(active, nights, np.nan), LENGTH_OF_STAY_EDGES, n_channels)
+
+    def histogram_records(counts: np.ndarray, labels: List[str]) -> List[Dict]:
+        table = pd.DataFrame(counts, columns=labels)
+        table.insert(0, 'channel', channels)
+        totals = {'channel': 'TOTAL', **dict(zip(labels, counts.sum(axis=0).tolist()))}
+        return table.to_dict(orient='records') + [totals]
+
+    return {
+        'period': {
+            'start': start.strftime('%Y-%m-%d') if pd.notna(start) else None,
+            'end': end.strftime('%Y-%m-%d') if pd.notna(end) else None,
+            'days': days,
+            'properties': properties,
+            'available_room_nights': available_nights
+        },
+        'overall': overall,
+        'by_channel': by_channel.to_dict(orient='records'),
+        'lead_time_histogram': histogram_records(lead_hist, LEAD_TIME_LABELS),
+        'length_of_stay_distribution': histogram_records(stay_hist, LENGTH_OF_STAY_LABELS)
+    }
@@ -0,0 +1,146 @@
+"""
+Cancellation
+============
+Cooperative cancellation and time budgets for pipeline runs.
+
+A run carries a ``CancellationToken`` and calls ``check()`` at checkpoints
+between pipeline stages and inside loops over properties and names. The
+check raises ``PipelineCancelled`` once the run has been cancelled or has
+used up its wall-clock or CPU time budget, and the pipeline unwinds from
+there, dropping its intermediate frames.
+
+Runs started by this process are kept in a ``RunRegistry`` so that
+``DELETE /api/process`` can cancel them at the next checkpoint. A token can
+also poll an external flag (the shared dataset store) at a bounded rate, so
+a cancel request served by another worker process still reaches the run.
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class PipelineCancelled(Exception):
+    """Raised at a checkpoint once a run has been cancelled or is over budget."""
+    
+    def __init__(self, reason: str, timed_out: bool = False):
+        super().__init__(reason)
+        self.reason = reason
+        self.timed_out = timed_out
+
+
+class CancellationToken:
+    """Cancellation flag and time budget for one pipeline run."""
+    
+    def __init__(
+        self,
+        wall_time_limit: float = 0,
+        cpu_time_limit: float = 0,
+        external_check: Optional[Callable[[], bool]] = None,
+        poll_interval: float = 1.0,
+        run_id: Optional[str] = None
+    ):
+        """
+        Args:
+            wall_time_limit: Seconds of elapsed time allowed; 0 for no limit
+            cpu_time_limit: Seconds of CPU time allowed on the thread that
+                created the token; 0 for no limit. Time spent in worker
+                processes is not counted.
+            external_check: Returns True when the run was cancelled elsewhere
+            poll_interval: Minimum seconds between ``external_check`` calls
+            run_id: Identifier of the run; generated if None
+        """
+        self.run_id = run_id or uuid.uuid4().hex
+        self.wall_time_limit = wall_time_limit
+        self.cpu_time_limit = cpu_time_limit
+        self.external_check = external_check
+        self.poll_interval = poll_interval
+        self.started_at = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._last_poll = self._wall_start
+        self._cancelled = threading.Event()
+        self._reason: Optional[str] = None
+    
+    def cancel(self, reason: str = 'Cancelled by user'):
+        """Ask the run to stop at its next checkpoint."""
+        if self._reason is None:
+            self._reason = reason
+        self._cancelled.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    def elapsed(self) -> float:
+        """Wall-clock seconds since the run started."""
+        return time.perf_counter() - self._wall_start
+    
+    def check(self):
+        """
+        Checkpoint: return if the run may continue.
+        
+        Raises:
+            PipelineCancelled: If the run was cancelled or exceeded its budget
+        """
+        if self._cancelled.is_set():
+            raise PipelineCancelled(self._reason or 'Cancelled by user')
+        
+        now = time.perf_counter()
+        if self.wall_time_limit and now - self._wall_start > self.wall_time_limit:
+            raise PipelineCancelled(
+                f'Processing exceeded the time limit of {self.wall_time_limit:g}s', timed_out=True
+            )
+        # thread_time is per thread, so CPU time is only measured on the
+        # thread running the pipeline
+        if self.cpu_time_limit and time.thread_time() - self._cpu_start > self.cpu_time_limit:
+            raise PipelineCancelled(
+                f'Processing exceeded the CPU time limit of {self.cpu_time_limit:g}s', timed_out=True
+            )
+        
+        if self.external_check is not None and now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            if self.external_check():
+                self.cancel()
+                raise PipelineCancelled(self._reason)
+
+
+class RunRegistry:
+    """Pipeline runs in progress in this process, by run id."""
+    
+    def __init__(self):
+        self._tokens: Dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def track(self, token: CancellationToken) -> Iterator[CancellationToken]:
+        """Register ``token`` while the run is in progress."""
+        with self._lock:
+            self._tokens[token.run_id] = token
+        try:
+            yield token
+        finally:
+            with self._lock:
+                self._tokens.pop(token.run_id, None)
+    
+    def cancel(self, run_id: Optional[str] = None, reason: str = 'Cancelled by user') -> List[str]:
+        """
+        Cancel one run, or every run when ``run_id`` is None.
+        
+        Returns:
+            Ids of the runs that were cancelled
+        """
+        with self._lock:
+            tokens = [
+                token for token in self._tokens.values()
+                if run_id is None or token.run_id == run_id
+            ]
+        for token in tokens:
+            token.cancel(reason)
+        return [token.run_id for token in tokens]
+    
+    def active(self) -> List[str]:
+        with self._lock:
+            return list(self._tokens)
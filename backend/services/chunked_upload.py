@@ -0,0 +1,204 @@
+"""
+Chunked Upload Store
+====================
+Disk-backed sessions for resumable, chunked file uploads.
+
+Each session is a ``<id>.part`` data file plus a ``<id>.json`` metadata file
+in the upload directory. The size of the data file on disk is the resume
+offset, so an interrupted upload (or a restarted worker) continues where it
+stopped instead of starting over.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import IO, Dict, Optional
+
+
+COPY_BLOCK_SIZE = 1024 * 1024
+SESSION_TTL_SECONDS = 24 * 60 * 60
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ChunkedUploadError(ValueError):
+    """Raised when a chunked upload request cannot be applied."""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ChunkedUploadStore:
+    """Create, append to and finalize chunked upload sessions."""
+    
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        # Guards ``_session_locks`` only; appends and finalizes hold the lock
+        # of their own session, so a slow client never blocks other uploads
+        self._lock = threading.Lock()
+        self._session_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(directory, exist_ok=True)
+    
+    def _paths(self, upload_id: str):
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            raise ChunkedUploadError('Unknown upload session', 404)
+        base = os.path.join(self.directory, upload_id)
+        return base + '.json', base + '.part'
+    
+    def _session_lock(self, upload_id: str) -> threading.Lock:
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+    
+    def _release_session(self, upload_id: str):
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+    
+    def _load(self, upload_id: str) -> Dict:
+        meta_path, _ = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ChunkedUploadError('Unknown upload session', 404)
+    
+    def create(self, file_type: str, filename: str, size: int, sha256: Optional[str] = None) -> Dict:
+        """
+        Open a new upload session.
+        
+        Args:
+            file_type: Target upload slot ('guests', 'reservations', 'invoices')
+            filename: Original file name
+            size: Total file size in bytes
+            sha256: Optional expected hex digest of the whole file
+        
+        Returns:
+            Session metadata including ``upload_id``
+        """
+        self.purge_stale()
+        
+        if size <= 0:
+            raise ChunkedUploadError('File size must be positive')
+        if size > self.max_size:
+            raise ChunkedUploadError(f'File too large. Maximum size is {self.max_size // (1024 * 1024)}MB', 413)
+        
+        session = {
+            'upload_id': uuid.uuid4().hex,
+            'file_type': file_type,
+            'filename': filename,
+            'size': size,
+            'sha256': sha256.lower() if sha256 else None
+        }
+        meta_path, data_path = self._paths(session['upload_id'])
+        open(data_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump(session, f)
+        return session
+    
+    def status(self, upload_id: str) -> Dict:
+        """Session metadata plus the number of bytes received so far."""
+        session = self._load(upload_id)
+        _, data_path = self._paths(upload_id)
+        session['received'] = os.path.getsize(data_path)
+        return session
+    
+    def append(self, upload_id: str, offset: int, stream: IO[bytes], chunk_sha256: Optional[str] = None) -> int:
+        """
+        Append a chunk read from ``stream`` at ``offset``.
+        
+        The chunk is copied to disk in blocks and never held in memory as a
+        whole. If a checksum is given and does not match, the chunk is
+        discarded and the session stays at its previous offset.
+        
+        Returns:
+            Bytes received so far, after this chunk
+        """
+        with self._session_lock(upload_id):
+            session = self.status(upload_id)
+            if offset != session['received']:
+                raise ChunkedUploadError(
+                    f"Chunk offset {offset} does not match received bytes {session['received']}", 409
+                )
+            
+            _, data_path = self._paths(upload_id)
+            hasher = hashlib.sha256()
+            written = 0
+            with open(data_path, 'ab') as f:
+                while True:
+                    block = stream.read(COPY_BLOCK_SIZE)
+                    if not block:
+                        break
+                    written += len(block)
+                    if offset + written > session['size']:
+                        f.truncate(offset)
+                        raise ChunkedUploadError('Chunk exceeds declared file size')
+                    hasher.update(block)
+                    f.write(block)
+                
+                if chunk_sha256 and hasher.hexdigest() != chunk_sha256.lower():
+                    f.truncate(offset)
+                    raise ChunkedUploadError('Chunk checksum mismatch')
+            
+            return offset + written
+    
+    def finalize(self, upload_id: str, sha256: Optional[str] = None) -> Dict:
+        """
+        Verify a complete upload and close its session.
+        
+        The data file is kept, renamed to the original extension, so the
+        caller can parse it; its path is returned as ``path``.
+        
+        Raises:
+            ChunkedUploadError: If bytes are missing or the checksum differs
+        """
+        with self._session_lock(upload_id):
+            session = self.status(upload_id)
+            if session['received'] != session['size']:
+                raise ChunkedUploadError(
+                    f"Upload incomplete: received {session['received']} of {session['size']} bytes", 409
+                )
+            
+            meta_path, data_path = self._paths(upload_id)
+            expected = (sha256 or session['sha256'] or '').lower()
+            if expected:
+                hasher = hashlib.sha256()
+                with open(data_path, 'rb') as f:
+                    for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b''):
+                        hasher.update(block)
+                if hasher.hexdigest() != expected:
+                    raise ChunkedUploadError('File checksum mismatch')
+            
+            # Readers pick the workbook format from the extension
+            final_path = os.path.splitext(data_path)[0] + os.path.splitext(session['filename'])[1].lower()
+            os.replace(data_path, final_path)
+            os.remove(meta_path)
+            self._release_session(upload_id)
+            session['path'] = final_path
+            return session
+    
+    def purge_stale(self, max_age: int = SESSION_TTL_SECONDS):
+        """Remove sessions that have not received data for ``max_age`` seconds."""
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.directory):
+            upload_id, extension = os.path.splitext(name)
+            if extension != '.part' or not UPLOAD_ID_PATTERN.match(upload_id):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    self.abort(upload_id)
+            except (OSError, ChunkedUploadError):
+                continue
+    
+    def abort(self, upload_id: str):
+        """Delete a session and any bytes received."""
+        meta_path, data_path = self._paths(upload_id)
+        self._load(upload_id)
+        for path in (meta_path, data_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._release_session(upload_id)
@@ -0,0 +1,178 @@
+"""
+Countries
+=========
+Country normalization for guest nationalities.
+
+Free-text country values ("Portugal", "PT", "portugal ", "Portuguesa",
+"Alemanha", "Deutschland" ...) are resolved to ISO-3166 alpha-2 codes using
+a lookup dictionary built once at import. Every ISO 3166-1 country resolves
+by its alpha-2 code, alpha-3 code and English names; the guests' most
+common countries also resolve by local-language names and demonyms. Resolution is memoized per
+distinct value, so cost scales with the number of distinct spellings, not
+with the number of rows.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.iso3166 import ISO_3166
+
+
+# Code used for missing countries, so they form their own group instead of
+# silently dropping out of groupby (ZZ is reserved for user assignment).
+UNKNOWN_CODE = 'ZZ'
+UNKNOWN_NAME = 'Unknown'
+
+# Aliases on top of ISO_3166: alpha-2 -> (alpha-3, display name, other
+# spellings). Other spellings cover Portuguese, French, German and Spanish
+# names plus common demonyms; the display name replaces the ISO short name.
+COUNTRIES: Dict[str, Tuple[str, str, List[str]]] = {
+    'PT': ('PRT', 'Portugal', ['Portuguesa', 'Português', 'Portuguese', 'Portugais', 'Portugiesisch', 'Portugués']),
+    'ES': ('ESP', 'Spain', ['Espanha', 'Espanhola', 'Espanhol', 'Espagne', 'Spanien', 'España', 'Spanish', 'Española', 'Español']),
+    'DE': ('DEU', 'Germany', ['Alemanha', 'Alemã', 'Alemão', 'Allemagne', 'Deutschland', 'Alemania', 'German', 'Deutsch']),
+    'FR': ('FRA', 'France', ['França', 'Francesa', 'Francês', 'Frankreich', 'Francia', 'French', 'Française', 'Français']),
+    'GB': ('GBR', 'United Kingdom', [
+        'UK', 'Reino Unido', 'Royaume-Uni', 'Vereinigtes Königreich', 'Great Britain', 'Britain', 'England',
+        'Scotland', 'Wales', 'Northern Ireland', 'Inglaterra', 'British', 'Britânica', 'Britânico', 'Inglesa'
+    ]),
+    'NL': ('NLD', 'Netherlands', ['Países Baixos', 'Holanda', 'Pays-Bas', 'Niederlande', 'Holland', 'The Netherlands', 'Dutch', 'Holandesa', 'Holandês', 'Neerlandesa']),
+    'IT': ('ITA', 'Italy', ['Itália', 'Italie', 'Italien', 'Italia', 'Italian', 'Italiana', 'Italiano']),
+    'US': ('USA', 'United States', [
+        'United States of America', 'USA', 'U.S.A.', 'U.S.', 'America', 'Estados Unidos', 'Estados Unidos da América',
+        'États-Unis', 'Vereinigte Staaten', 'American', 'Americana', 'Americano', 'Norte-Americana'
+    ]),
+    'BR': ('BRA', 'Brazil', ['Brasil', 'Brésil', 'Brasilien', 'Brazilian', 'Brasileira', 'Brasileiro']),
+    'CA': ('CAN', 'Canada', ['Canadá', 'Kanada', 'Canadian', 'Canadiana', 'Canadense']),
+    'BE': ('BEL', 'Belgium', ['Bélgica', 'Belgique', 'Belgien', 'Belgian', 'Belga']),
+    'CH': ('CHE', 'Switzerland', ['Suíça', 'Suisse', 'Schweiz', 'Suiza', 'Swiss', 'Suíço']),
+    'AT': ('AUT', 'Austria', ['Áustria', 'Autriche', 'Österreich', 'Austrian', 'Austríaca', 'Austríaco']),
+    'IE': ('IRL', 'Ireland', ['Irlanda', 'Irlande', 'Irland', 'Irish', 'Irlandesa', 'Irlandês']),
+    'LU': ('LUX', 'Luxembourg', ['Luxemburgo', 'Luxemburg', 'Luxembourgish', 'Luxemburguesa']),
+    'DK': ('DNK', 'Denmark', ['Dinamarca', 'Danemark', 'Dänemark', 'Danish', 'Dinamarquesa']),
+    'SE': ('SWE', 'Sweden', ['Suécia', 'Suède', 'Schweden', 'Suecia', 'Swedish', 'Sueca', 'Sueco']),
+    'NO': ('NOR', 'Norway', ['Noruega', 'Norvège', 'Norwegen', 'Norwegian', 'Norueguesa']),
+    'FI': ('FIN', 'Finland', ['Finlândia', 'Finlande', 'Finnland', 'Finlandia', 'Finnish', 'Finlandesa']),
+    'IS': ('ISL', 'Iceland', ['Islândia', 'Islande', 'Island', 'Islandia', 'Icelandic']),
+    'PL': ('POL', 'Poland', ['Polónia', 'Polônia', 'Pologne', 'Polen', 'Polonia', 'Polish', 'Polaca', 'Polaco']),
+    'CZ': ('CZE', 'Czech Republic', ['Czechia', 'República Checa', 'Chéquia', 'Tchéquie', 'Tschechien', 'Czech', 'Checa']),
+    'SK': ('SVK', 'Slovakia', ['Eslováquia', 'Slovaquie', 'Slowakei', 'Eslovaquia', 'Slovak']),
+    'HU': ('HUN', 'Hungary', ['Hungria', 'Hongrie', 'Ungarn', 'Hungarian', 'Húngara']),
+    'RO': ('ROU', 'Romania', ['Roménia', 'Romênia', 'Roumanie', 'Rumänien', 'Rumania', 'Romanian', 'Romena']),
+    'BG': ('BGR', 'Bulgaria', ['Bulgária', 'Bulgarie', 'Bulgarien', 'Bulgarian', 'Búlgara']),
+    'GR': ('GRC', 'Greece', ['Grécia', 'Grèce', 'Griechenland', 'Grecia', 'Greek', 'Grega', 'Grego']),
+    'HR': ('HRV', 'Croatia', ['Croácia', 'Croatie', 'Kroatien', 'Croacia', 'Croatian']),
+    'SI': ('SVN', 'Slovenia', ['Eslovénia', 'Eslovênia', 'Slovénie', 'Slowenien', 'Eslovenia', 'Slovenian']),
+    'EE': ('EST', 'Estonia', ['Estónia', 'Estônia', 'Estonie', 'Estland', 'Estonian']),
+    'LV': ('LVA', 'Latvia', ['Letónia', 'Letônia', 'Lettonie', 'Lettland', 'Letonia', 'Latvian']),
+    'LT': ('LTU', 'Lithuania', ['Lituânia', 'Lituanie', 'Litauen', 'Lituania', 'Lithuanian']),
+    'MT': ('MLT', 'Malta', ['Malte', 'Maltese']),
+    'CY': ('CYP', 'Cyprus', ['Chipre', 'Chypre', 'Zypern', 'Cypriot']),
+    'UA': ('UKR', 'Ukraine', ['Ucrânia', 'Ucrania', 'Ukrainian', 'Ucraniana']),
+    'RU': ('RUS', 'Russia', ['Rússia', 'Russie', 'Russland', 'Rusia', 'Russian Federation', 'Russian', 'Russa']),
+    'TR': ('TUR', 'Turkey', ['Türkiye', 'Turquia', 'Turquie', 'Türkei', 'Turkish', 'Turca']),
+    'IL': ('ISR', 'Israel', ['Israël', 'Israeli', 'Israelita']),
+    'MA': ('MAR', 'Morocco', ['Marrocos', 'Maroc', 'Marokko', 'Marruecos', 'Moroccan']),
+    'ZA': ('ZAF', 'South Africa', ['África do Sul', 'Afrique du Sud', 'Südafrika', 'Sudáfrica', 'South African']),
+    'AO': ('AGO', 'Angola', ['Angolan', 'Angolana', 'Angolano']),
+    'MZ': ('MOZ', 'Mozambique', ['Moçambique', 'Mosambik', 'Mozambican', 'Moçambicana']),
+    'CV': ('CPV', 'Cape Verde', ['Cabo Verde', 'Cap-Vert', 'Kap Verde', 'Cape Verdean', 'Cabo-verdiana']),
+    'MX': ('MEX', 'Mexico', ['México', 'Mexique', 'Mexiko', 'Mexican', 'Mexicana', 'Mexicano']),
+    'AR': ('ARG', 'Argentina', ['Argentine', 'Argentinien', 'Argentinian', 'Argentino']),
+    'CL': ('CHL', 'Chile', ['Chili', 'Chilean', 'Chilena', 'Chileno']),
+    'CO': ('COL', 'Colombia', ['Colômbia', 'Colombie', 'Kolumbien', 'Colombian', 'Colombiana']),
+    'VE': ('VEN', 'Venezuela', ['Venezuelan', 'Venezuelana', 'Venezolana']),
+    'AU': ('AUS', 'Australia', ['Austrália', 'Australie', 'Australien', 'Australian', 'Australiana']),
+    'NZ': ('NZL', 'New Zealand', ['Nova Zelândia', 'Nouvelle-Zélande', 'Neuseeland', 'Nueva Zelanda', 'New Zealander']),
+    'JP': ('JPN', 'Japan', ['Japão', 'Japon', 'Japón', 'Japanese', 'Japonesa']),
+    'CN': ('CHN', 'China', ['Chine', 'Chinese', 'Chinesa', 'Chinês']),
+    'KR': ('KOR', 'South Korea', ['Korea', 'Republic of Korea', 'Coreia do Sul', 'Corée du Sud', 'Südkorea', 'Corea del Sur', 'Korean']),
+    'IN': ('IND', 'India', ['Índia', 'Inde', 'Indien', 'Indian']),
+}
+
+# Placeholders exports use for a missing country, as lookup keys; "NA" and
+# "N/A" would otherwise resolve to Namibia's code
+PLACEHOLDERS = {
+    '', 'na', 'n a', 'nd', 'n d', 'none', 'null', 'nan', 'nil', 'unknown', 'desconhecido', 'desconhecida',
+    'sem pais', 'outro', 'other', 'xx', 'x'
+}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_key(value: str) -> str:
+    """Case-, accent-, punctuation- and spacing-insensitive lookup key."""
+    text = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM.sub(' ', text.casefold()).strip()
+
+
+def _build_lookup() -> Dict[str, str]:
+    lookup = {}
+    # Aliases last, so they win over an ISO name normalizing to the same key
+    for table in (ISO_3166, COUNTRIES):
+        for code, (alpha3, name, spellings) in table.items():
+            for spelling in [code, alpha3, name, *spellings]:
+                lookup[normalize_key(spelling)] = code
+    return lookup
+
+
+COUNTRY_LOOKUP = _build_lookup()
+COUNTRY_NAMES = {code: name for table in (ISO_3166, COUNTRIES) for code, (_, name, _) in table.items()}
+COUNTRY_NAMES[UNKNOWN_CODE] = UNKNOWN_NAME
+
+
+@lru_cache(maxsize=4096)
+def resolve_country(value: str) -> Optional[str]:
+    """
+    ISO alpha-2 code for a free-text country value.
+    
+    Returns:
+        The code, ``UNKNOWN_CODE`` for placeholders such as "N/A" or "-",
+        or None if the value is not a known country
+    """
+    key = normalize_key(value)
+    if key in PLACEHOLDERS:
+        return UNKNOWN_CODE
+    return COUNTRY_LOOKUP.get(key)
+
+
+def country_name(code: str) -> str:
+    """Display name for a code from ``country_codes``; unresolved values pass through."""
+    return COUNTRY_NAMES.get(code, code)
+
+
+def country_codes(values: pd.Series) -> Tuple[pd.Categorical, List[str]]:
+    """
+    Resolve a country column to categorical codes.
+    
+    Each distinct value is resolved once. Missing values and placeholders
+    ("N/A", "-" ...) become ``UNKNOWN_CODE``; values not in the dictionary keep their stripped text
+    so they still form their own group.
+    
+    Args:
+        values: Raw country column
+    
+    Returns:
+        tuple: (categorical of ISO alpha-2 codes, unresolved distinct values)
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    
+    keys = []
+    unresolved = []
+    for value in uniques:
+        text = str(value).strip()
+        code = resolve_country(text) if text else UNKNOWN_CODE
+        if code is None:
+            code = text
+            unresolved.append(text)
+        keys.append(code)
+    
+    categories = sorted(set(keys) | {UNKNOWN_CODE})
+    positions = {key: i for i, key in enumerate(categories)}
+    mapping = np.array([positions[key] for key in keys] + [positions[UNKNOWN_CODE]], dtype=np.int64)
+    # factorize marks missing values with -1, which indexes the UNKNOWN_CODE slot
+    return pd.Categorical.from_codes(mapping[codes], categories=categories), unresolved
@@ -0,0 +1,422 @@
+"""
+Dataset Store
+=============
+SQLite-backed replacement for the in-memory ``DATA_STORAGE`` dict.
+
+Uploaded datasets, results and processing logs are written through to an
+embedded SQLite database so that deploys and worker restarts do not force
+users to re-upload and re-process. Entries are loaded lazily on first
+access and then served from memory; the database file is memory-mapped so
+those first reads come straight from the page cache.
+
+DataFrames inside an entry (parsed uploads, the merged dataset held by a
+results report) are written once as Arrow IPC files next to the database
+and only referenced from the pickled payload. Loading an entry
+memory-maps those files, so every worker process reading the same dataset
+shares one copy in the OS page cache instead of deserializing its own.
+Without pyarrow, DataFrames are pickled inline.
+
+Lazy reports are stored unbuilt, with the frames their sections are built
+from. The first worker to build a section saves it in the ``sections``
+table, tied to the entry version it belongs to, and the other workers read
+it from there instead of building it again.
+
+Each worker keeps the entries it has loaded, and reloads one when another
+worker has written it since. The SQLite connection is opened per process,
+so the store can be created before gunicorn forks its workers (--preload).
+pandas and pyarrow are only imported once a DataFrame is stored or loaded.
+"""
+
+import importlib.util
+import io
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections.abc import MutableMapping
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+ARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+
+MMAP_SIZE = 1024 * 1024 * 1024  # Map up to 1GB of the database file
+FRAME_REFERENCE = 'arrow-ipc'
+
+
+def write_frame(df: 'pd.DataFrame', directory: str) -> Optional[str]:
+    """
+    Write a DataFrame to a new Arrow IPC file.
+    
+    Returns:
+        File name within ``directory``, or None if the frame cannot be
+        represented in Arrow (non-string or duplicate column names, mixed
+        object columns) and should be pickled instead
+    """
+    columns = list(df.columns)
+    if not all(isinstance(column, str) for column in columns) or len(set(columns)) != len(columns):
+        return None
+    
+    import pyarrow as pa
+    import pyarrow.ipc
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+    
+    name = f'{uuid.uuid4().hex}.arrow'
+    with pa.OSFile(os.path.join(directory, name), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return name
+
+
+def read_frame(path: str) -> 'pd.DataFrame':
+    """Open an Arrow IPC file as a DataFrame backed by the memory-mapped file where possible."""
+    import pyarrow as pa
+    import pyarrow.ipc
+    
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    # split_blocks keeps one block per column, so columns are not
+    # consolidated into freshly allocated 2D arrays
+    return table.to_pandas(split_blocks=True)
+
+
+class _FramePickler(pickle.Pickler):
+    """Pickler storing DataFrames as Arrow IPC files referenced by name."""
+    
+    def __init__(self, file, frames_dir: Optional[str]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.frames_dir = frames_dir
+        self.written: List[str] = []
+        self._names: Dict[int, Optional[str]] = {}
+    
+    def persistent_id(self, obj):
+        pd = sys.modules.get('pandas')
+        if self.frames_dir is None or pd is None or not isinstance(obj, pd.DataFrame):
+            return None
+        if id(obj) not in self._names:
+            name = write_frame(obj, self.frames_dir)
+            self._names[id(obj)] = name
+            if name is not None:
+                self.written.append(name)
+        name = self._names[id(obj)]
+        return (FRAME_REFERENCE, name) if name is not None else None
+
+
+class _FrameUnpickler(pickle.Unpickler):
+    """Unpickler memory-mapping the Arrow IPC files referenced by a payload."""
+    
+    def __init__(self, file, frames_dir: str):
+        super().__init__(file)
+        self.frames_dir = frames_dir
+    
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != FRAME_REFERENCE:
+            raise pickle.UnpicklingError(f'Unknown persistent reference: {kind}')
+        return read_frame(os.path.join(self.frames_dir, name))
+
+
+class _StoredSections:
+    """Sections of one lazy report within a stored entry version."""
+    
+    def __init__(self, storage: 'PersistentStorage', key: str, generation: float, report: str):
+        self.storage = storage
+        self.key = key
+        self.generation = generation
+        self.report = report
+    
+    def load(self, section: str) -> Tuple[bool, Any]:
+        return self.storage.load_section(self.key, self.generation, f'{self.report}.{section}')
+    
+    def save(self, section: str, value: Any):
+        self.storage.save_section(self.key, self.generation, f'{self.report}.{section}', value)
+
+
+class PersistentStorage(MutableMapping):
+    """Dict-like storage that persists every entry to SQLite."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.frames_dir = os.path.join(os.path.dirname(os.path.abspath(path)), 'frames')
+        os.makedirs(self.frames_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._versions: Dict[str, float] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, payload BLOB NOT NULL, updated_at REAL NOT NULL, '
+            "frames TEXT NOT NULL DEFAULT '[]')"
+        )
+        # Lazy report sections, stored as they are built, per entry version
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sections ('
+            'key TEXT NOT NULL, generation REAL NOT NULL, section TEXT NOT NULL, payload BLOB NOT NULL, '
+            "frames TEXT NOT NULL DEFAULT '[]', PRIMARY KEY (key, section))"
+        )
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(entries)')]
+        if 'frames' not in columns:
+            self._conn.execute("ALTER TABLE entries ADD COLUMN frames TEXT NOT NULL DEFAULT '[]'")
+    
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Connection for the current process; SQLite connections must not cross a fork."""
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+            self._pid = os.getpid()
+        return self._connection
+    
+    @staticmethod
+    def _serializable(value: Any) -> Any:
+        """
+        Copy of ``value`` without objects that cannot be pickled.
+        
+        Upload entries still being parsed are saved with their raw bytes,
+        without the pending future and with ``parsing_since`` set, so other
+        workers wait for the parse instead of repeating it. Once the parse
+        finishes the entry is saved again with its DataFrame (or the parse
+        error), and the raw bytes are dropped.
+        """
+        if not isinstance(value, dict) or 'dataframe_future' not in value:
+            return value
+        
+        entry = {k: v for k, v in value.items() if k != 'dataframe_future'}
+        future: Optional[Future] = value.get('dataframe_future')
+        if 'dataframe' not in entry and future is not None:
+            if not future.done():
+                entry['parsing_since'] = time.time()
+            elif future.exception() is not None:
+                entry['parse_error'] = str(future.exception())
+            else:
+                entry['dataframe'] = future.result()
+        if 'dataframe' in entry or 'parse_error' in entry:
+            entry.pop('data', None)
+        return entry
+    
+    def persist(self, key: str):
+        """Write the current in-memory value of ``key`` to the database."""
+        with self._lock:
+            if key not in self._cache:
+                return
+            value = self._cache[key]
+            future = value.get('dataframe_future') if isinstance(value, dict) else None
+        serializable = self._serializable(value)
+        
+        with self._lock:
+            if self._cache.get(key) is not value:
+                # Replaced in the meantime; the newer value is persisted instead
+                return
+            payload, written = self._dump(serializable)
+            
+            replaced = self._frames(key) + self._section_frames(key)
+            updated_at = time.time()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, payload, updated_at, frames) VALUES (?, ?, ?, ?)',
+                (key, payload, updated_at, json.dumps(written))
+            )
+            self._conn.execute('DELETE FROM sections WHERE key = ?', (key,))
+            self._versions[key] = updated_at
+            self._remove_frames(replaced)
+            self._attach_section_stores(key, value, updated_at)
+        
+        if future is not None and 'parsing_since' in serializable:
+            # Runs at once if the parse finished while the entry was written
+            future.add_done_callback(lambda _: self._persist_if_current(key, value))
+    
+    def _persist_if_current(self, key: str, value: Any):
+        """Persist ``key`` again unless it has been replaced in the meantime."""
+        with self._lock:
+            if self._cache.get(key) is value:
+                self.persist(key)
+    
+    def _dump(self, value: Any) -> Tuple[bytes, List[str]]:
+        """Pickle ``value``, writing its DataFrames as Arrow files; returns the payload and the files written."""
+        buffer = io.BytesIO()
+        pickler = _FramePickler(buffer, self.frames_dir if ARROW_AVAILABLE else None)
+        pickler.dump(value)
+        return buffer.getvalue(), pickler.written
+    
+    def _attach_section_stores(self, key: str, value: Any, generation: float, path: str = ''):
+        """Give the lazy reports in ``value`` the sections stored for this version of ``key``."""
+        lazy_report = sys.modules.get('services.lazy_report')
+        if lazy_report is None:
+            return
+        if isinstance(value, lazy_report.LazyReport):
+            value.attach_store(_StoredSections(self, key, generation, path))
+        elif isinstance(value, dict):
+            for name, item in value.items():
+                self._attach_section_stores(key, item, generation, f'{path}.{name}' if path else str(name))
+    
+    def load_section(self, key: str, generation: float, section: str) -> Tuple[bool, Any]:
+        """(True, value) if ``section`` of this version of ``key`` has been stored, else (False, None)."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload FROM sections WHERE key = ? AND generation = ? AND section = ?',
+                (key, generation, section)
+            ).fetchone()
+            if row is None:
+                return False, None
+            try:
+                return True, _FrameUnpickler(io.BytesIO(row[0]), self.frames_dir).load()
+            except FileNotFoundError:
+                # Removed by a concurrent replace of the entry
+                return False, None
+    
+    def save_section(self, key: str, generation: float, section: str, value: Any):
+        """
+        Store a built report section of this version of ``key``.
+        
+        Nothing is stored once the entry has been replaced or deleted, or if
+        another worker stored the section first.
+        """
+        with self._lock:
+            payload, written = self._dump(value)
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO sections (key, generation, section, payload, frames) '
+                'SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM entries WHERE key = ? AND updated_at = ?)',
+                (key, generation, section, payload, json.dumps(written), key, generation)
+            )
+            if cursor.rowcount == 0:
+                self._remove_frames(written)
+    
+    def _section_frames(self, key: str) -> List[str]:
+        return [
+            name for row in self._conn.execute('SELECT frames FROM sections WHERE key = ?', (key,))
+            for name in json.loads(row[0])
+        ]
+    
+    def _frames(self, key: str) -> List[str]:
+        row = self._conn.execute('SELECT frames FROM entries WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else []
+    
+    def _remove_frames(self, names: List[str]):
+        """
+        Delete frame files no longer referenced.
+        
+        Workers that already mapped a file keep reading it after the unlink.
+        """
+        for name in names:
+            try:
+                os.remove(os.path.join(self.frames_dir, name))
+            except FileNotFoundError:
+                pass
+    
+    def _load(self, key: str) -> Any:
+        """Read ``key`` from the database into the cache."""
+        # A concurrent write in another worker can remove the frame files of
+        # the row just read; reading the row again picks up the new files.
+        for attempt in range(2):
+            row = self._conn.execute(
+                'SELECT payload, updated_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._cache.pop(key, None)
+                self._versions.pop(key, None)
+                raise KeyError(key)
+            try:
+                value = _FrameUnpickler(io.BytesIO(row[0]), self.frames_dir).load()
+                break
+            except FileNotFoundError:
+                if attempt:
+                    raise
+        
+        self._cache[key] = value
+        self._versions[key] = row[1]
+        self._attach_section_stores(key, value, row[1])
+        return value
+    
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute('SELECT updated_at FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None and key in self._cache and self._versions.get(key) == row[0]:
+                return self._cache[key]
+            return self._load(key)
+    
+    def __setitem__(self, key: str, value: Any):
+        with self._lock:
+            self._cache[key] = value
+        self.persist(key)
+    
+    def modify(self, key: str, function: Callable[[Any], Any]) -> Any:
+        """
+        Replace ``key`` with ``function(current value)`` as one transaction.
+        
+        The current value is None if ``key`` is missing. The SQLite write
+        lock is held from the read to the write, so concurrent updates from
+        other threads and worker processes are applied one after another
+        instead of overwriting each other.
+        
+        Returns:
+            The new value
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                value = function(self[key] if key in self else None)
+                self._cache[key] = value
+                self.persist(key)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                self._cache.pop(key, None)
+                self._versions.pop(key, None)
+                raise
+            self._conn.execute('COMMIT')
+            return value
+    
+    def __delitem__(self, key: str):
+        with self._lock:
+            frames = self._frames(key) + self._section_frames(key)
+            cursor = self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._conn.execute('DELETE FROM sections WHERE key = ?', (key,))
+            cached = self._cache.pop(key, None)
+            self._versions.pop(key, None)
+            self._remove_frames(frames)
+            if cursor.rowcount == 0 and cached is None:
+                raise KeyError(key)
+    
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is not None
+    
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute('SELECT key FROM entries ORDER BY key')]
+        return iter(keys)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+    
+    def loaded_items(self) -> Dict[str, Any]:
+        """Entries currently held in memory, without loading the rest."""
+        with self._lock:
+            return dict(self._cache)
+    
+    def clear(self):
+        """Remove every entry from memory and from the database."""
+        with self._lock:
+            frames = [
+                name
+                for table in ('entries', 'sections')
+                for row in self._conn.execute(f'SELECT frames FROM {table}')
+                for name in json.loads(row[0])
+            ]
+            self._conn.execute('DELETE FROM entries')
+            self._conn.execute('DELETE FROM sections')
+            self._cache.clear()
+            self._versions.clear()
+            self._remove_frames(frames)
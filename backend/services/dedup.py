@@ -0,0 +1,96 @@
+"""
+Deduplication
+=============
+Duplicate detection on composite keys.
+
+Each key column is factorized to integer codes and the codes are combined
+into one int64 array, so finding duplicates hashes a single integer per row
+instead of a tuple of strings and timestamps. Missing values get their own
+code and compare equal, as in ``DataFrame.drop_duplicates``.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Largest number of distinct keys the int64 composite can hold
+MAX_KEYS = np.iinfo(np.int64).max
+
+# Dropped rows listed in the data quality report for review
+MAX_REPORTED_DUPLICATES = 50
+
+
+def composite_key(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    One int64 per row, equal for rows with equal values in ``columns``.
+    
+    Args:
+        df: Frame to key
+        columns: Key columns
+    
+    Returns:
+        Array of keys aligned with the rows of ``df``
+    """
+    key = np.zeros(len(df), dtype=np.int64)
+    size = 1
+    for column in columns:
+        codes, uniques = pd.factorize(df[column])
+        # Missing values are coded -1; shift so they take code 0
+        cardinality = len(uniques) + 1
+        if size * cardinality > MAX_KEYS:
+            # Renumber the keys so far densely, which keeps the product in range
+            key, uniques = pd.factorize(key)
+            size = len(uniques)
+        key = key * cardinality + (codes + 1)
+        size *= cardinality
+    return key
+
+
+def _json_value(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def drop_duplicate_rows(
+    df: pd.DataFrame,
+    columns: List[str],
+    key: Optional[np.ndarray] = None
+) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Drop rows repeating an earlier row's values in ``columns``.
+    
+    Args:
+        df: Frame to deduplicate
+        columns: Columns identifying a row
+        key: Precomputed ``composite_key(df, columns)``
+    
+    Returns:
+        tuple: (frame keeping the first of each key, report with the number
+        of dropped rows and up to ``MAX_REPORTED_DUPLICATES`` examples giving
+        the dropped row, the row it duplicates and the key values)
+    """
+    if key is None:
+        key = composite_key(df, columns)
+    duplicated = pd.Series(key).duplicated().to_numpy()
+    report = {'dropped': int(duplicated.sum()), 'columns': list(columns), 'rows': []}
+    if not report['dropped']:
+        return df, report
+    
+    kept = ~duplicated
+    examples = np.flatnonzero(duplicated)[:MAX_REPORTED_DUPLICATES]
+    first_positions = np.flatnonzero(kept)[pd.Index(key[kept]).get_indexer(key[examples])]
+    dropped = df[columns].iloc[examples]
+    for row, duplicate_of, values in zip(
+        dropped.index, df.index[first_positions], dropped.itertuples(index=False)
+    ):
+        report['rows'].append({
+            'row': _json_value(row),
+            'duplicate_of': _json_value(duplicate_of),
+            'values': {column: _json_value(value) for column, value in zip(columns, values)}
+        })
+    return df[kept], report
@@ -5,10 +5,26 @@ Core data processing service for hospitality data analysis.
 Extracted from talkguest_etl.py and adapted for API use.
 """
 
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
 import pandas as pd
 import numpy as np
 from typing import Dict, Any, Optional, Tuple
 
+from services.schema import RESERVATIONS_SCHEMA, FATURACAO_SCHEMA, DECIMAL_SEPARATORS, coerce_frame
+from services.analytics_service import compute_channel_analytics
+from services.pace import compute_pace_report
+from services.countries import country_codes, country_name
+from services.dedup import composite_key, drop_duplicate_rows
+from services.name_matching import DEFAULT_THRESHOLD, match_names
+from services.tourist_tax import DEFAULT_TOURIST_TAX, compute_tourist_tax, resolve_tourist_tax
+from services.lazy_report import LazyReport, materialize
+from services.cancellation import CancellationToken, PipelineCancelled
+from services.metrics import PIPELINE_RUNS_STOPPED, PIPELINE_STAGE_DURATION
+from services.worker_pool import FrameHandle, discard_pool, frame_files, load_frame, shared_pool
+
 
 # =============================================================================
 # COLUMN MAPPINGS FOR BILINGUAL SUPPORT
@@ -75,6 +91,7 @@ FATURACAO_COLUMNS = {
     'document_id': 'Documento',
     'property': 'Alojamento',
     'stay_value': 'Estadia',
+    'document_date': 'Data Documento',
 }
 
 # Default configuration
@@ -88,9 +105,27 @@ DEFAULT_CONFIG = {
         'doze_ribeiras_combined': ['Doze Ribeiras 0', 'Doze Ribeiras 1'],
         'casas_separate': ['Casa 1', 'Casa 2', 'Casa 3', 'Casa 4', 'Casa 5'],
         'fuzeta_combined': ['Fuzeta 0', 'Fuzeta 1']
-    }
+    },
+    'reconciliation': {
+        'date_tolerance_days': 7,  # Max distance between check-in and invoice date
+        'amount_tolerance': 0.01   # Max absolute difference still counted as matched
+    },
+    'name_matching': {
+        'enabled': False,               # Match guest names ignoring accents, case, spacing and typos
+        'threshold': DEFAULT_THRESHOLD  # Minimum similarity for a fuzzy match
+    },
+    'tourist_tax': DEFAULT_TOURIST_TAX
 }
 
+# Shallow copies are only independent when pandas copies on write
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True
+
+# Fuzzy name matches listed in the data quality report for review
+MAX_REPORTED_NAME_MATCHES = 50
+
+# Seconds between cancellation checks while waiting on worker processes
+CHECKPOINT_INTERVAL = 0.5
+
 
 def detect_reservations_language(df: pd.DataFrame) -> str:
     """
@@ -98,10 +133,10 @@ def detect_reservations_language(df: pd.DataFrame) -> str:
     
     Args:
         df: pandas DataFrame with reservation data
-        
+    
     Returns:
         str: 'pt' or 'en'
-        
+    
     Raises:
         ValueError: If columns don't match either language schema
     """
@@ -125,6 +160,77 @@ def detect_reservations_language(df: pd.DataFrame) -> str:
         )
 
 
+# Sections of compute_channel_analytics, in output order
+ANALYTICS_SECTIONS = ['period', 'overall', 'by_channel', 'lead_time_histogram', 'length_of_stay_distribution']
+
+
+def _nationality_table(
+    property_data: pd.DataFrame,
+    col_guest: str,
+    col_nights: str,
+    col_country: str
+) -> list:
+    """
+    Build the nationality breakdown for a single property.
+    
+    Args:
+        property_data: Rows of ``combined_df`` belonging to one property group
+        col_guest: Reservation guest column name
+        col_nights: Reservation nights column name
+        col_country: Categorical column of codes from ``country_codes``
+    
+    Returns:
+        list: Table records sorted by nights, followed by a blank and a TOTAL row
+    """
+    property_data = property_data.copy()
+    property_data['person_nights'] = property_data['total_people'] * property_data[col_nights]
+    
+    nationality_stats = property_data.groupby(col_country, observed=True).agg({
+        col_guest: 'nunique',
+        'total_people': 'sum',
+        col_nights: 'sum',
+        'person_nights': 'sum'
+    }).reset_index()
+    
+    # English column names
+    nationality_stats.columns = ['nationality', 'unique_guests', 'total_people', 'total_nights', 'person_nights']
+    nationality_stats['nationality'] = nationality_stats['nationality'].astype(str).map(country_name)
+    nationality_stats = nationality_stats.sort_values('total_nights', ascending=False).reset_index(drop=True)
+    
+    # Add totals row
+    totals = {
+        'nationality': 'TOTAL',
+        'unique_guests': int(property_data[col_guest].nunique()),
+        'total_people': int(property_data['total_people'].sum()),
+        'total_nights': int(property_data[col_nights].sum()),
+        'person_nights': int(property_data['person_nights'].sum())
+    }
+    
+    nationality_stats = pd.concat([
+        nationality_stats,
+        pd.DataFrame([{'nationality': '', 'unique_guests': '', 'total_people': '', 'total_nights': '', 'person_nights': ''}]),
+        pd.DataFrame([totals])
+    ], ignore_index=True)
+    
+    return nationality_stats.to_dict(orient='records')
+
+
+def _working_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of an input frame that the pipeline can modify.
+    
+    With copy-on-write (always on from pandas 3) a shallow copy suffices:
+    columns are only copied when modified, so unchanged columns of a
+    memory-mapped upload stay shared.
+    """
+    return df.copy(deep=not COPY_ON_WRITE)
+
+
+def _partition_nationality_table(partition: FrameHandle, col_guest: str, col_nights: str, col_country: str) -> list:
+    """Pool task building the nationality table of a partition from ``frame_files``."""
+    return _nationality_table(load_frame(partition), col_guest, col_nights, col_country)
+
+
 class ColumnMapper:
     """Helper class to access column names based on detected language."""
     
@@ -150,30 +256,77 @@ class ColumnMapper:
 class ETLService:
     """ETL service for processing hospitality data."""
     
-    def __init__(self, config: Optional[Dict] = None):
-        """Initialize ETL service with configuration."""
+    def __init__(
+        self,
+        config: Optional[Dict] = None,
+        max_workers: int = 0,
+        cancel_token: Optional[CancellationToken] = None
+    ):
+        """
+        Initialize ETL service with configuration.
+        
+        Args:
+            config: Optional overrides for IVA rates and property groups
+            max_workers: Worker processes for per-property reports; 0 or 1 runs serially
+            cancel_token: Checked between stages and in per-property loops;
+                the run stops when it is cancelled or over its time budget
+        """
         self.config = config or DEFAULT_CONFIG
+        self.max_workers = max_workers or 0
+        self.cancel_token = cancel_token
         self.cols: Optional[ColumnMapper] = None
         self.guests_df: Optional[pd.DataFrame] = None
         self.reservations_df: Optional[pd.DataFrame] = None
         self.faturacao_df: Optional[pd.DataFrame] = None
         self.combined_df: Optional[pd.DataFrame] = None
-        self.occupancy_data: Optional[Dict] = None
-        self.revenue_data: Optional[Dict] = None
+        self.occupancy_data: Optional[LazyReport] = None
+        self.revenue_data: Optional[LazyReport] = None
+        self.analytics_base_df: Optional[pd.DataFrame] = None
+        self.analytics_data: Optional[LazyReport] = None
+        self.aggregates: Optional[LazyReport] = None
+        self.faturacao_clean: Optional[pd.DataFrame] = None
+        self._memo: Dict[str, Any] = {}
+        self.coercion_report: Dict[str, Dict] = {}
+        self.name_match_report: Optional[Dict] = None
+        self.dedup_report: Dict[str, Dict] = {}
+        self.tourist_tax_settings: Optional[Dict] = None
         self.processing_log: list = []
         self.errors: list = []
     
+    def __getstate__(self):
+        """
+        State pickled with the lazy reports of a stored result.
+        
+        The raw inputs are left out; report sections are built from the
+        cleaned frames only. The cancellation token belongs to the run.
+        """
+        state = self.__dict__.copy()
+        for attribute in ('guests_df', 'reservations_df', 'faturacao_df', 'cancel_token'):
+            state[attribute] = None
+        return state
+    
     def log(self, message: str, level: str = 'info'):
         """Add log message."""
         self.processing_log.append({'level': level, 'message': message})
         if level == 'error':
             self.errors.append(message)
     
+    def checkpoint(self):
+        """
+        Stop here if the run was cancelled or is over its time budget.
+        
+        Raises:
+            PipelineCancelled: From the cancellation token
+        """
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+    
     def run_pipeline(
         self,
         guests_df: pd.DataFrame,
         reservations_df: pd.DataFrame,
-        faturacao_df: Optional[pd.DataFrame] = None
+        faturacao_df: Optional[pd.DataFrame] = None,
+        lazy: bool = False
     ) -> Dict[str, Any]:
         """
         Run the complete ETL pipeline.
@@ -182,41 +335,90 @@ class ETLService:
             guests_df: Guest data DataFrame
             reservations_df: Reservations data DataFrame
             faturacao_df: Optional invoices data DataFrame
-            
+            lazy: Return occupancy, revenue and analytics as ``LazyReport``
+                mappings whose sections are computed on first access, instead
+                of computing every section up front
+        
         Returns:
             Dictionary with processing results
         """
         self.processing_log = []
         self.errors = []
+        self._memo = {}
+        self.name_match_report = None
+        self.dedup_report = {}
         
         try:
-            # Store input data
-            self.guests_df = guests_df.copy()
-            self.reservations_df = reservations_df.copy()
-            self.faturacao_df = faturacao_df.copy() if faturacao_df is not None else None
+            # Config errors fail the run up front, not a report section later
+            self.tourist_tax_settings = resolve_tourist_tax(self.config.get('tourist_tax'))
+            
+            # Store input data; inputs may be read-only memory-mapped frames
+            self.guests_df = _working_copy(guests_df)
+            self.reservations_df = _working_copy(reservations_df)
+            self.faturacao_df = _working_copy(faturacao_df) if faturacao_df is not None else None
             
             # Detect language and setup column mapper
             language = detect_reservations_language(self.reservations_df)
             self.cols = ColumnMapper(language)
             self.log(f"Detected reservation file language: {language.upper()}")
             
+            # Coerce typed columns once, up front
+            self.checkpoint()
+            with PIPELINE_STAGE_DURATION.time(stage='coerce'):
+                self._coerce_inputs()
+            
             # Process data
-            self._process_data()
+            self.checkpoint()
+            with PIPELINE_STAGE_DURATION.time(stage='process'):
+                self._process_data()
+            
+            if self.combined_df is None:
+                raise ValueError("No reservations left after cleaning")
             
-            # Generate reports
-            self._generate_occupancy_report()
-            self._generate_revenue_report()
+            # Set up report sections; they are computed when first read
+            self._build_reports()
+            if not lazy:
+                self.checkpoint()
+                self.occupancy_data = materialize(self.occupancy_data)
+                self.checkpoint()
+                self.revenue_data = materialize(self.revenue_data)
+                self.checkpoint()
+                self.analytics_data = materialize(self.analytics_data)
+                self.checkpoint()
+                self.aggregates = materialize(self.aggregates)
             
+            # The budget covers this run; sections computed later on request
+            # are not cancelled with it
+            self.cancel_token = None
             self.log("Pipeline completed successfully")
             
             return {
                 'success': True,
                 'occupancy': self.occupancy_data,
                 'revenue': self.revenue_data,
+                'analytics': self.analytics_data,
                 'log': self.processing_log,
-                'summary': self._get_summary()
+                'summary': self._get_summary(),
+                'aggregates': self.aggregates,
+                'data_quality': {
+                    'coercion_failures': self.coercion_report,
+                    'name_matching': self.name_match_report,
+                    'deduplication': self.dedup_report
+                }
             }
-            
+        
+        except PipelineCancelled as e:
+            self._discard()
+            PIPELINE_RUNS_STOPPED.inc(reason='timed_out' if e.timed_out else 'cancelled')
+            self.log(f"Pipeline stopped: {e.reason}", level='error')
+            return {
+                'success': False,
+                'cancelled': True,
+                'timed_out': e.timed_out,
+                'errors': self.errors,
+                'log': self.processing_log
+            }
+        
         except Exception as e:
             self.log(f"Pipeline error: {str(e)}", level='error')
             return {
@@ -225,6 +427,38 @@ class ETLService:
                 'log': self.processing_log
             }
     
+    def _discard(self):
+        """Drop the frames and reports of a stopped run so their memory is freed."""
+        self.guests_df = None
+        self.reservations_df = None
+        self.faturacao_df = None
+        self.faturacao_clean = None
+        self.combined_df = None
+        self.analytics_base_df = None
+        self.occupancy_data = None
+        self.revenue_data = None
+        self.analytics_data = None
+        self.aggregates = None
+        self._memo = {}
+    
+    def _coerce_inputs(self):
+        """Coerce reservation and invoice columns to their schema types."""
+        _, report = coerce_frame(
+            self.reservations_df, RESERVATIONS_SCHEMA, RESERVATIONS_COLUMNS[self.cols.language],
+            DECIMAL_SEPARATORS[self.cols.language]
+        )
+        if self.faturacao_df is not None:
+            _, invoices_report = coerce_frame(self.faturacao_df, FATURACAO_SCHEMA, FATURACAO_COLUMNS, DECIMAL_SEPARATORS['pt'])
+            report.update(invoices_report)
+        
+        self.coercion_report = report
+        for column, failure in report.items():
+            self.log(
+                f"Column '{column}': {failure['failed']} values could not be parsed "
+                f"(e.g. {', '.join(failure['examples'])}) and were treated as empty",
+                level='warning'
+            )
+    
     def _process_data(self):
         """Clean and combine the data."""
         col_guest = self.cols.res('guest')
@@ -249,8 +483,8 @@ class ETLService:
         booking_count = booking_mask.sum()
         
         if booking_count > 0:
-            valor_bruto = pd.to_numeric(self.reservations_df[col_value], errors='coerce').fillna(0)
-            existing_commission = pd.to_numeric(self.reservations_df[col_commission], errors='coerce').fillna(0)
+            valor_bruto = self.reservations_df[col_value]
+            existing_commission = self.reservations_df[col_commission]
             additional_commission = valor_bruto * 0.014
             
             self.reservations_df.loc[booking_mask, col_commission] = (
@@ -261,6 +495,7 @@ class ETLService:
             self.log(f"Applied Booking.com commission: {booking_count} reservations, +€{total_additional:.2f}")
         
         # Remove test entries
+        self.checkpoint()
         guests_before = len(self.guests_df)
         test_words = ['Eu', 'Test']
         pattern = r'\b(' + '|'.join(test_words) + r')\b'
@@ -272,38 +507,83 @@ class ETLService:
         # Remove test and zero-value reservations
         reservations_before = len(self.reservations_df)
         reservation_mask = self.reservations_df[col_guest].str.contains(pattern, case=False, na=False, regex=True)
-        self.reservations_df = self.reservations_df[
-            (~reservation_mask) & 
-            (pd.to_numeric(self.reservations_df[col_value], errors='coerce') > 0)
-        ]
+        
+        # A stay is identified by guest, dates and property; the key is built
+        # once and shared by both deduplications below
+        duplicate_check_columns = [col_guest, col_checkin, col_checkout, col_property]
+        stay_key = composite_key(self.reservations_df, duplicate_check_columns)
+        
+        keep = ~reservation_mask.to_numpy()
+        paid = keep & (self.reservations_df[col_value] > 0).to_numpy()
+        
+        # Channel analytics need cancellations, which are often zero-valued.
+        # A stay with a paid row keeps that row, as in the reservations
+        # below, even when a zero-valued duplicate comes first
+        analytics_rows = paid | (keep & ~pd.Series(stay_key).isin(stay_key[paid]).to_numpy())
+        self.analytics_base_df, _ = drop_duplicate_rows(
+            self.reservations_df[analytics_rows], duplicate_check_columns, stay_key[analytics_rows]
+        )
+        
+        keep = paid
+        self.reservations_df = self.reservations_df[keep]
         reservations_after = len(self.reservations_df)
         self.log(f"Removed {reservations_before - reservations_after} invalid reservations")
         
+        # Remove duplicates before the join, so they are not merged and
+        # matched only to be dropped afterwards
+        self.checkpoint()
+        self.reservations_df, self.dedup_report['reservations'] = drop_duplicate_rows(
+            self.reservations_df, duplicate_check_columns, stay_key[keep]
+        )
+        if self.dedup_report['reservations']['dropped']:
+            self.log(f"Removed {self.dedup_report['reservations']['dropped']} duplicate reservations")
+        
+        # A guest name listed twice would repeat its reservations in the join;
+        # the first entry is used
+        join_guests, self.dedup_report['guests'] = drop_duplicate_rows(self.guests_df, [col_guest_name])
+        if self.dedup_report['guests']['dropped']:
+            self.log(
+                f"{self.dedup_report['guests']['dropped']} guest names appear more than once; "
+                f"reservations use the first entry",
+                level='warning'
+            )
+        
         # Combine data
+        self.checkpoint()
+        guest_key = col_guest
+        matching = {**DEFAULT_CONFIG['name_matching'], **self.config.get('name_matching', {})}
+        if matching['enabled']:
+            guest_key = self._match_guest_names(matching['threshold'])
+        
         self.combined_df = pd.merge(
             self.reservations_df,
-            self.guests_df,
-            left_on=col_guest,
+            join_guests,
+            left_on=guest_key,
             right_on=col_guest_name,
             how='left',
             suffixes=('_reservation', '_guest')
         )
         
         # Calculate total people
+        self.checkpoint()
         self.combined_df['total_people'] = (
-            pd.to_numeric(self.combined_df[col_adults], errors='coerce').fillna(0) +
-            pd.to_numeric(self.combined_df[col_children_no_tmt], errors='coerce').fillna(0) +
-            pd.to_numeric(self.combined_df[col_children_tmt], errors='coerce').fillna(0)
+            self.combined_df[col_adults] +
+            self.combined_df[col_children_no_tmt] +
+            self.combined_df[col_children_tmt]
         ).astype(int)
         
-        # Remove duplicates
-        before_dedup = len(self.combined_df)
-        duplicate_check_columns = [col_guest, col_checkin, col_checkout, col_property]
-        self.combined_df = self.combined_df.drop_duplicates(subset=duplicate_check_columns, keep='first')
-        after_dedup = len(self.combined_df)
+        # Apply property groupings
+        self.checkpoint()
+        self.combined_df['property_group'] = self.combined_df[col_property].apply(self._group_property)
         
-        if before_dedup - after_dedup > 0:
-            self.log(f"Removed {before_dedup - after_dedup} duplicates")
+        # Normalize free-text countries to ISO codes; missing ones group as Unknown
+        self.combined_df['country_code'], unresolved = country_codes(self.combined_df[self.cols.guest('country')])
+        if unresolved:
+            self.log(
+                f"{len(unresolved)} country values not recognised and kept as written "
+                f"(e.g. {', '.join(unresolved[:3])})",
+                level='warning'
+            )
         
         # Process faturacao if available
         if self.faturacao_df is not None:
@@ -322,6 +602,47 @@ class ETLService:
         else:
             self.log(f"Final dataset: {len(self.combined_df)} unique records")
     
+    def _match_guest_names(self, threshold: float) -> str:
+        """
+        Resolve reservation guest names to guests-file names before the join.
+        
+        Adds ``matched_guest`` and ``name_match_confidence`` columns to the
+        reservations; names without a match keep their own name.
+        
+        Returns:
+            Name of the column to join on
+        """
+        col_guest = self.cols.res('guest')
+        matches = match_names(
+            self.reservations_df[col_guest].unique(),
+            self.guests_df[self.cols.guest('name')].unique(),
+            threshold,
+            checkpoint=self.checkpoint
+        )
+        
+        guest_names = {name: match[0] or name for name, match in matches.items()}
+        confidence = {name: match[1] for name, match in matches.items()}
+        self.reservations_df = self.reservations_df.assign(
+            matched_guest=self.reservations_df[col_guest].map(guest_names),
+            name_match_confidence=self.reservations_df[col_guest].map(confidence)
+        )
+        
+        methods = pd.Series([match[2] for match in matches.values()])
+        fuzzy = [
+            {'reservation_name': name, 'guest_name': match[0], 'confidence': match[1]}
+            for name, match in matches.items() if match[2] == 'fuzzy'
+        ]
+        fuzzy.sort(key=lambda item: item['confidence'])
+        self.name_match_report = {
+            **{method: int((methods == method).sum()) for method in ['exact', 'normalized', 'fuzzy', 'unmatched']},
+            'fuzzy_matches': fuzzy[:MAX_REPORTED_NAME_MATCHES]
+        }
+        self.log(
+            f"Matched guest names: {self.name_match_report['normalized']} after normalization, "
+            f"{self.name_match_report['fuzzy']} fuzzy, {self.name_match_report['unmatched']} unmatched"
+        )
+        return 'matched_guest'
+    
     def _group_property(self, property_name: str) -> str:
         """Group property according to business rules."""
         if pd.isna(property_name):
@@ -341,97 +662,191 @@ class ETLService:
         else:
             return property_name
     
-    def _generate_occupancy_report(self):
-        """Generate occupancy report with English column names."""
-        col_property = self.cols.res('property')
+    def _build_reports(self):
+        """Create the lazy occupancy, revenue and analytics reports."""
+        self.occupancy_data = LazyReport({
+            'general_stats': self._occupancy_general_stats,
+            'by_property': self._occupancy_by_property
+        }, name='occupancy', retained=self._retained_frames)
+        self.revenue_data = LazyReport({
+            'reservations_summary': self._revenue_reservations_summary,
+            'reservations_by_property': self._revenue_reservations_by_property,
+            'invoices_summary': self._revenue_invoices_summary,
+            'invoices_by_property': self._revenue_invoices_by_property,
+            'detailed_calculations': self._revenue_detailed_calculations,
+            'reconciliation': self._revenue_reconciliation,
+            'tourist_tax': self._revenue_tourist_tax
+        }, name='revenue', retained=self._retained_frames)
+        self.analytics_data = LazyReport({
+            **{section: partial(self._analytics_section, section) for section in ANALYTICS_SECTIONS},
+            'pace': self._analytics_pace
+        }, name='analytics', retained=self._retained_frames)
+        # Monthly totals kept for comparisons with later runs
+        self.aggregates = LazyReport({
+            'occupancy': self._aggregate_occupancy,
+            'revenue': self._aggregate_revenue,
+            'guests': self._aggregate_guests
+        }, name='aggregates', retained=self._retained_frames)
+    
+    def _retained_frames(self) -> list:
+        """Frames the lazy reports read from, for the storage footprint."""
+        frames = [self.combined_df, self.analytics_base_df, self.faturacao_clean, *self._memo.values()]
+        return [frame for frame in frames if isinstance(frame, pd.DataFrame)]
+    
+    def _memoized(self, key: str, build) -> Any:
+        """Intermediate results shared by several sections of one report."""
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+    
+    def _occupancy_general_stats(self) -> Dict:
+        """Overall guest, night and reservation totals."""
         col_guest = self.cols.res('guest')
         col_nights = self.cols.res('nights')
-        col_country = self.cols.guest('country')
-        
-        # Apply property groupings
-        self.combined_df['property_group'] = self.combined_df[col_property].apply(self._group_property)
-        
-        # Overall statistics (English column names)
-        total_stats = {
+        return {
             'total_guests': int(self.combined_df[col_guest].nunique()),
             'total_nights': int(self.combined_df[col_nights].sum()),
             'total_reservations': len(self.combined_df)
         }
+    
+    def _occupancy_by_property(self) -> Dict[str, list]:
+        """Nationality tables per property group."""
+        col_guest = self.cols.res('guest')
+        col_nights = self.cols.res('nights')
+        col_country = 'country_code'
+        
+        # Only the columns the tables need are partitioned, which keeps
+        # per-worker data small.
+        report_columns = ['property_group', col_guest, col_country, col_nights, 'total_people']
+        partitions = {
+            property_name: property_data
+            for property_name, property_data in self.combined_df[report_columns].groupby('property_group', sort=True)
+            if property_name != 'Unknown'
+        }
         
-        # Property breakdown with nationality
-        property_tabs = {}
-        unique_properties = self.combined_df['property_group'].unique()
+        if self.max_workers > 1 and len(partitions) > 1:
+            property_tabs = self._nationality_tables_parallel(partitions, col_guest, col_nights, col_country)
+        else:
+            property_tabs = {}
+            for property_name, property_data in partitions.items():
+                self.checkpoint()
+                property_tabs[property_name] = _nationality_table(property_data, col_guest, col_nights, col_country)
         
-        for property_name in sorted(unique_properties):
-            if property_name == 'Unknown':
-                continue
-            
-            property_data = self.combined_df[self.combined_df['property_group'] == property_name].copy()
-            property_data['person_nights'] = property_data['total_people'] * property_data[col_nights]
-            
-            nationality_stats = property_data.groupby(col_country).agg({
-                col_guest: 'nunique',
-                'total_people': 'sum',
-                col_nights: 'sum',
-                'person_nights': 'sum'
-            }).reset_index()
-            
-            # English column names
-            nationality_stats.columns = ['nationality', 'unique_guests', 'total_people', 'total_nights', 'person_nights']
-            nationality_stats = nationality_stats.sort_values('total_nights', ascending=False).reset_index(drop=True)
-            
-            # Add totals row
-            totals = {
-                'nationality': 'TOTAL',
-                'unique_guests': int(property_data[col_guest].nunique()),
-                'total_people': int(property_data['total_people'].sum()),
-                'total_nights': int(property_data[col_nights].sum()),
-                'person_nights': int(property_data['person_nights'].sum())
-            }
-            
-            nationality_stats = pd.concat([
-                nationality_stats,
-                pd.DataFrame([{'nationality': '', 'unique_guests': '', 'total_people': '', 'total_nights': '', 'person_nights': ''}]),
-                pd.DataFrame([totals])
-            ], ignore_index=True)
-            
-            property_tabs[property_name] = nationality_stats.to_dict(orient='records')
+        self.log("Occupancy property tables generated")
+        return property_tabs
+    
+    def _nationality_tables_parallel(
+        self,
+        partitions: Dict[str, pd.DataFrame],
+        col_guest: str,
+        col_nights: str,
+        col_country: str
+    ) -> Dict[str, list]:
+        """
+        Build per-property nationality tables on the shared report pool.
         
-        self.occupancy_data = {
-            'general_stats': total_stats,
-            'by_property': property_tabs
-        }
+        Partitions are handed over as Arrow IPC files in shared memory (see
+        ``frame_files``), so workers map them instead of unpickling copies,
+        and the long-lived pool is reused across runs. Waiting for results is
+        interrupted by cancellation checks; a cancelled run drops the tables
+        not yet started and returns without waiting for the running ones.
         
-        self.log("Occupancy report generated")
+        Returns:
+            Dictionary mapping property name to table records, in sorted order
+        """
+        workers = min(self.max_workers, len(partitions))
+        pool = shared_pool(workers)
+        
+        tables = {}
+        with frame_files(partitions) as handles:
+            futures = {
+                name: pool.submit(_partition_nationality_table, handle, col_guest, col_nights, col_country)
+                for name, handle in handles.items()
+            }
+            try:
+                for name, future in futures.items():
+                    while name not in tables:
+                        try:
+                            tables[name] = future.result(timeout=CHECKPOINT_INTERVAL)
+                        except FutureTimeout:
+                            self.checkpoint()
+            except BrokenProcessPool:
+                discard_pool(pool)
+                raise
+            except BaseException:
+                for future in futures.values():
+                    future.cancel()
+                raise
+        
+        self.log(f"Built {len(tables)} property tables on {workers} worker processes")
+        return tables
     
-    def _generate_revenue_report(self):
-        """Generate revenue report with English column names."""
+    def _revenue_frame(self) -> pd.DataFrame:
+        """Reservations with IVA and net value columns, built once per run."""
+        return self._memoized('revenue_frame', self._build_revenue_frame)
+    
+    def _build_revenue_frame(self) -> pd.DataFrame:
         col_property = self.cols.res('property')
         col_value = self.cols.res('reservation_value')
         col_commission = self.cols.res('channel_commission')
-        col_reservation_id = self.cols.res('reservation_id')
         
         revenue_df = self.combined_df.copy()
-        revenue_df['individual_property'] = revenue_df[col_property].apply(lambda x: str(x).strip() if pd.notna(x) else 'Unknown')
+        properties = revenue_df[col_property]
+        missing = properties.isna()
+        property_names = properties.astype(str).str.strip()
+        revenue_df['individual_property'] = property_names.mask(missing, 'Unknown')
         
         # IVA rate based on location
-        def get_iva_rate(property_name):
-            if pd.isna(property_name):
-                return 0
-            prop_lower = str(property_name).lower()
-            if 'fuzeta' in prop_lower:
-                return self.config['iva_rates'].get('fuzeta', 0.06)
-            else:
-                return self.config['iva_rates'].get('azores', 0.04)
-        
-        revenue_df['iva_rate'] = revenue_df[col_property].apply(get_iva_rate)
-        revenue_df['gross_value'] = pd.to_numeric(revenue_df[col_value], errors='coerce').fillna(0)
-        revenue_df['commission'] = pd.to_numeric(revenue_df[col_commission], errors='coerce').fillna(0)
+        fuzeta = property_names.str.contains('fuzeta', case=False, regex=False)
+        revenue_df['iva_rate'] = np.select(
+            [missing, fuzeta],
+            [0, self.config['iva_rates'].get('fuzeta', 0.06)],
+            self.config['iva_rates'].get('azores', 0.04)
+        )
+        revenue_df['gross_value'] = revenue_df[col_value]
+        revenue_df['commission'] = revenue_df[col_commission]
         revenue_df['iva_amount'] = revenue_df['gross_value'] * revenue_df['iva_rate']
         revenue_df['net_value'] = revenue_df['gross_value'] - revenue_df['commission'] - revenue_df['iva_amount']
+        return revenue_df
+    
+    def _invoice_frame(self) -> Optional[pd.DataFrame]:
+        """Stay invoices with signed totals (cancellations negative), or None."""
+        return self._memoized('invoice_frame', self._build_invoice_frame)
+    
+    def _build_invoice_frame(self) -> Optional[pd.DataFrame]:
+        if self.faturacao_clean is None:
+            return None
+        
+        col_total_doc = self.cols.fat('total_document')
+        col_base_amount = self.cols.fat('base_amount')
+        col_vat_amount = self.cols.fat('vat_amount')
+        col_cancelled = self.cols.fat('cancelled')
+        
+        faturacao_df = self.faturacao_clean.copy()
+        
+        faturacao_df['multiplier'] = np.where(faturacao_df[col_cancelled], -1, 1)
+        
+        faturacao_df['total_final'] = faturacao_df[col_total_doc] * faturacao_df['multiplier']
+        faturacao_df['base_final'] = faturacao_df[col_base_amount] * faturacao_df['multiplier']
+        faturacao_df['vat_final'] = faturacao_df[col_vat_amount] * faturacao_df['multiplier']
+        return faturacao_df
+    
+    def _revenue_reservations_summary(self) -> Dict:
+        """Overall reservation revenue totals."""
+        revenue_df = self._revenue_frame()
+        return {
+            'total_gross_value': round(revenue_df['gross_value'].sum(), 2),
+            'total_commissions': round(revenue_df['commission'].sum(), 2),
+            'total_iva': round(revenue_df['iva_amount'].sum(), 2),
+            'total_net_value': round(revenue_df['net_value'].sum(), 2),
+            'total_reservations': len(revenue_df)
+        }
+    
+    def _revenue_reservations_by_property(self) -> list:
+        """Reservation revenue per individual property."""
+        col_reservation_id = self.cols.res('reservation_id')
         
-        # Group by property
-        by_property = revenue_df.groupby('individual_property').agg({
+        by_property = self._revenue_frame().groupby('individual_property').agg({
             'gross_value': 'sum',
             'commission': 'sum',
             'iva_amount': 'sum',
@@ -444,74 +859,278 @@ class ETLService:
         for col in ['gross_value', 'commission', 'iva_amount', 'net_value']:
             by_property[col] = by_property[col].round(2)
         
-        # Overall summary
-        reservations_summary = {
-            'total_gross_value': round(revenue_df['gross_value'].sum(), 2),
-            'total_commissions': round(revenue_df['commission'].sum(), 2),
-            'total_iva': round(revenue_df['iva_amount'].sum(), 2),
-            'total_net_value': round(revenue_df['net_value'].sum(), 2),
-            'total_reservations': len(revenue_df)
+        self.log("Revenue by property generated")
+        return by_property.to_dict(orient='records')
+    
+    def _revenue_invoices_summary(self) -> Optional[Dict]:
+        """Overall invoice totals, or None without an invoices file."""
+        faturacao_df = self._invoice_frame()
+        if faturacao_df is None:
+            return None
+        
+        return {
+            'total_gross_value': round(faturacao_df['total_final'].sum(), 2),
+            'total_iva': round(faturacao_df['vat_final'].sum(), 2),
+            'total_net_value': round(faturacao_df['base_final'].sum(), 2),
+            'total_invoices': len(faturacao_df)
         }
+    
+    def _revenue_invoices_by_property(self) -> Optional[list]:
+        """Invoice totals per property, or None without an invoices file."""
+        faturacao_df = self._invoice_frame()
+        if faturacao_df is None:
+            return None
         
-        # Faturacao data if available
-        invoices_summary = None
-        invoices_by_property = None
-        
-        if self.faturacao_clean is not None:
-            col_fat_property = self.cols.fat('property')
-            col_total_doc = self.cols.fat('total_document')
-            col_base_amount = self.cols.fat('base_amount')
-            col_vat_amount = self.cols.fat('vat_amount')
-            col_cancelled = self.cols.fat('cancelled')
-            col_document_id = self.cols.fat('document_id')
-            
-            faturacao_df = self.faturacao_clean.copy()
-            
-            faturacao_df['total_document_clean'] = pd.to_numeric(faturacao_df[col_total_doc], errors='coerce').fillna(0)
-            faturacao_df['base_amount_clean'] = pd.to_numeric(faturacao_df[col_base_amount], errors='coerce').fillna(0)
-            faturacao_df['vat_amount_clean'] = pd.to_numeric(faturacao_df[col_vat_amount], errors='coerce').fillna(0)
-            
-            faturacao_df['cancelled_bool'] = faturacao_df[col_cancelled].fillna(False)
-            faturacao_df['multiplier'] = faturacao_df['cancelled_bool'].apply(lambda x: -1 if x else 1)
-            
-            faturacao_df['total_final'] = faturacao_df['total_document_clean'] * faturacao_df['multiplier']
-            faturacao_df['base_final'] = faturacao_df['base_amount_clean'] * faturacao_df['multiplier']
-            faturacao_df['vat_final'] = faturacao_df['vat_amount_clean'] * faturacao_df['multiplier']
-            
-            inv_by_prop = faturacao_df.groupby(col_fat_property).agg({
-                'total_final': 'sum',
-                'base_final': 'sum',
-                'vat_final': 'sum',
-                col_document_id: 'count'
-            }).reset_index()
-            
-            inv_by_prop.columns = ['property', 'gross_value', 'net_value', 'iva_amount', 'invoice_count']
-            
-            for col in ['gross_value', 'net_value', 'iva_amount']:
-                inv_by_prop[col] = inv_by_prop[col].round(2)
-            
-            invoices_by_property = inv_by_prop.to_dict(orient='records')
-            
-            invoices_summary = {
-                'total_gross_value': round(faturacao_df['total_final'].sum(), 2),
-                'total_iva': round(faturacao_df['vat_final'].sum(), 2),
-                'total_net_value': round(faturacao_df['base_final'].sum(), 2),
-                'total_invoices': len(faturacao_df)
-            }
+        col_fat_property = self.cols.fat('property')
+        col_document_id = self.cols.fat('document_id')
+        
+        inv_by_prop = faturacao_df.groupby(col_fat_property).agg({
+            'total_final': 'sum',
+            'base_final': 'sum',
+            'vat_final': 'sum',
+            col_document_id: 'count'
+        }).reset_index()
         
-        # Detailed calculations for export
-        detailed = revenue_df[['individual_property', 'gross_value', 'commission', 'iva_rate', 'iva_amount', 'net_value']].copy()
+        inv_by_prop.columns = ['property', 'gross_value', 'net_value', 'iva_amount', 'invoice_count']
+        
+        for col in ['gross_value', 'net_value', 'iva_amount']:
+            inv_by_prop[col] = inv_by_prop[col].round(2)
+        
+        return inv_by_prop.to_dict(orient='records')
+    
+    def _revenue_detailed_calculations(self) -> list:
+        """Per-reservation revenue calculations for export."""
+        detailed = self._revenue_frame()[['individual_property', 'gross_value', 'commission', 'iva_rate', 'iva_amount', 'net_value']].copy()
         detailed.columns = ['property', 'gross_value', 'commission', 'iva_rate', 'iva_amount', 'net_value']
         
-        self.revenue_data = {
-            'reservations_summary': reservations_summary,
-            'reservations_by_property': by_property.to_dict(orient='records'),
-            'invoices_summary': invoices_summary,
-            'invoices_by_property': invoices_by_property,
-            'detailed_calculations': detailed.to_dict(orient='records')
+        self.log("Detailed revenue calculations generated")
+        return detailed.to_dict(orient='records')
+    
+    def _revenue_reconciliation(self) -> Optional[Dict]:
+        """Invoice-to-reservation reconciliation, or None without an invoices file."""
+        faturacao_df = self._invoice_frame()
+        if faturacao_df is None:
+            return None
+        return self._reconcile_invoices(self._revenue_frame(), faturacao_df)
+    
+    def _revenue_tourist_tax(self) -> Optional[Dict]:
+        """Municipal tourist tax per property and check-in month, or None if disabled."""
+        settings = self.tourist_tax_settings
+        if not settings['enabled']:
+            return None
+        
+        tourist_tax = compute_tourist_tax(self.combined_df, self.cols, settings)
+        self.log(f"Tourist tax computed: €{tourist_tax['summary']['total_tax']:.2f}")
+        return tourist_tax
+    
+    def _analytics_section(self, section: str):
+        """One section of the channel analytics, computed together on first use."""
+        analytics = self._memoized('channel_analytics', self._generate_channel_analytics)
+        return analytics[section]
+    
+    def _generate_channel_analytics(self) -> Dict:
+        """Generate per-channel and booking-window analytics."""
+        analytics = compute_channel_analytics(self.analytics_base_df, self.cols)
+        self.log(f"Channel analytics generated for {len(analytics['by_channel'])} channels")
+        return analytics
+    
+    def _analytics_pace(self) -> Dict:
+        """Booking pace per stay month against the same month last year."""
+        pace = compute_pace_report(self.analytics_base_df, self.cols)
+        if pace['missing_booking_date']:
+            self.log(
+                f"{pace['missing_booking_date']} reservations without a booking date left out of the pace report",
+                level='warning'
+            )
+        return pace
+    
+    def _reconcile_invoices(self, revenue_df: pd.DataFrame, faturacao_df: pd.DataFrame) -> Optional[Dict]:
+        """
+        Link stay invoices to reservations and flag discrepancies.
+        
+        Matching is done per property with sorted as-of joins on the invoice
+        date against the check-in date. A first pass pairs invoices with a
+        reservation of the same amount inside the date tolerance; a second pass
+        assigns the remaining invoices to the nearest reservation. Invoice base
+        amounts (signed, so cancellations offset) are then summed per
+        reservation and compared with the reservation gross value.
+        
+        Args:
+            revenue_df: Reservations with ``individual_property`` and ``gross_value``
+            faturacao_df: Stay invoices with signed ``base_final`` amounts
+        
+        Returns:
+            Dictionary with summary, per-property counts and exception rows,
+            or None when the invoices carry no document date
+        """
+        col_checkin = self.cols.res('checkin')
+        col_reservation_id = self.cols.res('reservation_id')
+        col_fat_property = self.cols.fat('property')
+        col_document_id = self.cols.fat('document_id')
+        col_document_date = self.cols.fat('document_date')
+        
+        if col_document_date not in faturacao_df.columns:
+            self.log("Invoices have no document date - skipping reconciliation", level='warning')
+            return None
+        
+        settings = {**DEFAULT_CONFIG['reconciliation'], **self.config.get('reconciliation', {})}
+        tolerance = pd.Timedelta(days=settings['date_tolerance_days'])
+        amount_tolerance = settings['amount_tolerance']
+        
+        reservations = pd.DataFrame({
+            'res_idx': np.arange(len(revenue_df)),
+            'property': revenue_df['individual_property'].to_numpy(),
+            'reservation_id': revenue_df[col_reservation_id].to_numpy(),
+            'checkin': revenue_df[col_checkin].to_numpy(),
+            'reservation_value': revenue_df['gross_value'].to_numpy()
+        })
+        reservations['amount_key'] = np.round(reservations['reservation_value'].abs() * 100).astype('int64')
+        
+        invoices = pd.DataFrame({
+            'inv_idx': np.arange(len(faturacao_df)),
+            'property': faturacao_df[col_fat_property].astype(str).str.strip().to_numpy(),
+            'document_id': faturacao_df[col_document_id].to_numpy(),
+            'document_date': faturacao_df[col_document_date].to_numpy(),
+            'invoiced_value': faturacao_df['base_final'].to_numpy()
+        })
+        invoices['amount_key'] = np.round(invoices['invoiced_value'].abs() * 100).astype('int64')
+        
+        reservations = reservations.dropna(subset=['checkin']).sort_values('checkin')
+        dated = invoices.dropna(subset=['document_date']).sort_values('document_date')
+        invoices['res_idx'] = -1
+        
+        # Pass 1: same property and amount, nearest date within tolerance
+        exact = pd.merge_asof(
+            dated, reservations[['checkin', 'property', 'amount_key', 'res_idx']],
+            left_on='document_date', right_on='checkin', by=['property', 'amount_key'],
+            direction='nearest', tolerance=tolerance
+        )
+        matched = exact['res_idx'].notna()
+        invoices.loc[exact.loc[matched, 'inv_idx'].to_numpy(), 'res_idx'] = exact.loc[matched, 'res_idx'].to_numpy()
+        
+        # Pass 2: remaining invoices to the nearest reservation not yet paired
+        paired = invoices.loc[invoices['res_idx'] >= 0, 'res_idx'].unique()
+        remaining = dated[~dated['inv_idx'].isin(invoices.loc[invoices['res_idx'] >= 0, 'inv_idx'])]
+        nearest = pd.merge_asof(
+            remaining, reservations.loc[~reservations['res_idx'].isin(paired), ['checkin', 'property', 'res_idx']],
+            left_on='document_date', right_on='checkin', by='property',
+            direction='nearest', tolerance=tolerance
+        )
+        matched = nearest['res_idx'].notna()
+        invoices.loc[nearest.loc[matched, 'inv_idx'].to_numpy(), 'res_idx'] = nearest.loc[matched, 'res_idx'].to_numpy()
+        
+        # Per-reservation invoiced totals and status
+        invoiced = invoices[invoices['res_idx'] >= 0].groupby('res_idx').agg(
+            invoiced_value=('invoiced_value', 'sum'),
+            document_id=('document_id', lambda ids: ', '.join(map(str, ids))),
+            document_date=('document_date', 'min')
+        )
+        reservations = reservations.set_index('res_idx').join(invoiced, how='left').reset_index()
+        has_invoice = reservations['invoiced_value'].notna()
+        reservations['difference'] = (reservations['invoiced_value'].fillna(0) - reservations['reservation_value']).round(2)
+        reservations['status'] = np.select(
+            [~has_invoice, reservations['difference'].abs() > amount_tolerance],
+            ['unmatched_reservation', 'amount_mismatch'],
+            default='matched'
+        )
+        
+        orphans = invoices[invoices['res_idx'] < 0].assign(
+            reservation_id=None, checkin=pd.NaT, reservation_value=0.0,
+            difference=lambda df: df['invoiced_value'].round(2), status='unmatched_invoice'
+        )
+        
+        rows = pd.concat([
+            reservations[['property', 'reservation_id', 'document_id', 'checkin', 'document_date',
+                          'reservation_value', 'invoiced_value', 'difference', 'status']],
+            orphans[['property', 'reservation_id', 'document_id', 'checkin', 'document_date',
+                     'reservation_value', 'invoiced_value', 'difference', 'status']]
+        ], ignore_index=True)
+        
+        by_property = pd.crosstab(rows['property'], rows['status'])
+        for status in ['matched', 'amount_mismatch', 'unmatched_reservation', 'unmatched_invoice']:
+            if status not in by_property.columns:
+                by_property[status] = 0
+        totals = rows.groupby('property').agg(
+            reservation_value=('reservation_value', 'sum'),
+            invoiced_value=('invoiced_value', 'sum'),
+            difference=('difference', 'sum')
+        ).round(2)
+        by_property = totals.join(by_property[['matched', 'amount_mismatch', 'unmatched_reservation', 'unmatched_invoice']])
+        by_property = by_property.reset_index().sort_values('property')
+        
+        exceptions = rows[rows['status'] != 'matched'].sort_values(['property', 'status']).copy()
+        for col in ['checkin', 'document_date']:
+            exceptions[col] = exceptions[col].dt.strftime('%Y-%m-%d')
+        exceptions['invoiced_value'] = exceptions['invoiced_value'].fillna(0).round(2)
+        exceptions['reservation_value'] = exceptions['reservation_value'].round(2)
+        exceptions = exceptions.astype(object).where(exceptions.notna(), None)
+        
+        status_counts = rows['status'].value_counts()
+        summary = {
+            'matched': int(status_counts.get('matched', 0)),
+            'amount_mismatch': int(status_counts.get('amount_mismatch', 0)),
+            'unmatched_reservations': int(status_counts.get('unmatched_reservation', 0)),
+            'unmatched_invoices': int(status_counts.get('unmatched_invoice', 0)),
+            'total_difference': round(float(rows['difference'].sum()), 2)
         }
         
-        self.log("Revenue report generated")
+        self.log(
+            f"Reconciled invoices: {summary['matched']} matched, {summary['amount_mismatch']} mismatched, "
+            f"{summary['unmatched_reservations']} reservations and {summary['unmatched_invoices']} invoices unmatched"
+        )
+        
+        return {
+            'summary': summary,
+            'by_property': by_property.to_dict(orient='records'),
+            'exceptions': exceptions.to_dict(orient='records')
+        }
+    
+    def _checkin_month(self) -> pd.Series:
+        """Check-in month of each row of ``combined_df`` as 'YYYY-MM'."""
+        return self._memoized('checkin_month', lambda: self.combined_df[self.cols.res('checkin')].dt.strftime('%Y-%m'))
+    
+    def _nationality(self) -> pd.Series:
+        """Country name of each row of ``combined_df``, as in the nationality tables."""
+        return self._memoized('nationality', lambda: self.combined_df['country_code'].astype(str).map(country_name))
+    
+    def _aggregate_occupancy(self) -> pd.DataFrame:
+        """Occupancy totals per property group, check-in month and nationality."""
+        col_guest = self.cols.res('guest')
+        col_nights = self.cols.res('nights')
+        return self.combined_df.assign(
+            month=self._checkin_month(),
+            nationality=self._nationality(),
+            person_nights=self.combined_df['total_people'] * self.combined_df[col_nights]
+        ).groupby(['property_group', 'month', 'nationality']).agg(
+            unique_guests=(col_guest, 'nunique'),
+            total_people=('total_people', 'sum'),
+            total_nights=(col_nights, 'sum'),
+            person_nights=('person_nights', 'sum'),
+            reservations=(col_guest, 'size')
+        ).reset_index().rename(columns={'property_group': 'property'})
+    
+    def _aggregate_revenue(self) -> pd.DataFrame:
+        """Reservation revenue per individual property and check-in month."""
+        col_reservation_id = self.cols.res('reservation_id')
+        return self._revenue_frame().assign(month=self._checkin_month()).groupby(['individual_property', 'month']).agg(
+            gross_value=('gross_value', 'sum'),
+            commission=('commission', 'sum'),
+            iva_amount=('iva_amount', 'sum'),
+            net_value=('net_value', 'sum'),
+            reservation_count=(col_reservation_id, 'count')
+        ).reset_index().rename(columns={'individual_property': 'property'})
+    
+    def _aggregate_guests(self) -> pd.DataFrame:
+        """Hashed guest names per property group, check-in month and nationality, one row per guest."""
+        col_guest = self.cols.res('guest')
+        named = self.combined_df[col_guest].notna()
+        guests = pd.DataFrame({
+            'property': self.combined_df['property_group'],
+            'month': self._checkin_month(),
+            'nationality': self._nationality(),
+            'guest': pd.util.hash_pandas_object(self.combined_df[col_guest], index=False)
+        })[named]
+        return guests.drop_duplicates(ignore_index=True)
     
     def _get_summary(self) -> Dict:
         """Get processing summary."""
@@ -0,0 +1,454 @@
+"""
+Excel Reader
+============
+Workbook reading helpers for the upload path.
+
+Uploads are answered from a cheap preview (header, first rows and the row
+count stored in the sheet dimension) while the full parse runs in the
+background, so the DataFrame is usually ready before processing starts.
+
+Workbooks may hold several sheets (monthly reservation sheets, or guests
+and reservations side by side). Every sheet is previewed from one
+read-only open of the workbook, and the sheets that are kept are parsed in
+parallel worker processes and concatenated.
+
+Full parses go through one of several pandas engines: calamine (Rust,
+several times faster), openpyxl and xlrd (legacy .xls). ``auto`` picks
+calamine unless a large .xlsx would make its higher peak memory a risk, and
+falls back to the next installed engine when one fails. Output is
+normalized so every engine returns the same DataFrame for a workbook.
+"""
+
+import importlib.util
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import openpyxl
+import pandas as pd
+
+from services.metrics import ACTIVE_JOBS, CACHE_REQUESTS, PARSE_DURATION, PARSE_ENGINE_RESULTS
+from services.worker_pool import discard_pool, shared_pool
+
+
+PREVIEW_ROWS = 5
+PARSE_WORKERS = 2
+# How long a worker waits for a parse running in another worker process
+# before parsing the upload itself
+PARSE_WAIT_TIMEOUT = 120
+PARSE_POLL_INTERVAL = 0.25
+
+_parse_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+_pending_lock = threading.Lock()
+
+# Raw workbook bytes, or the path of a workbook on disk
+Source = Union[bytes, str]
+# Sheet name, or position in the workbook
+Sheet = Union[str, int]
+
+# Engine -> (module providing it, workbook formats it reads), in fallback order
+ENGINES = {
+    'calamine': ('python_calamine', ('xlsx', 'xls')),
+    'openpyxl': ('openpyxl', ('xlsx',)),
+    'xlrd': ('xlrd', ('xls',)),
+}
+# pandas reads with calamine from 2.2 on; older versions leave it out
+CALAMINE_SUPPORTED = tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+# calamine peaks at about twice openpyxl's memory; above this size 'auto'
+# prefers openpyxl for .xlsx
+CALAMINE_MAX_SIZE = 32 * 1024 * 1024
+# Legacy .xls files are OLE2 compound documents
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+
+def _as_file(source: Source):
+    """Wrap raw bytes in a buffer; paths are passed through for the readers to open."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def _normalize_header(header: tuple) -> List[str]:
+    """
+    Turn a raw header row into column names the way pandas does.
+    
+    Trailing empty cells are dropped, empty cells become ``Unnamed: <i>``
+    and repeated names get ``.1``, ``.2`` suffixes.
+    """
+    header = list(header)
+    while header and header[-1] is None:
+        header.pop()
+    
+    columns = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(header):
+        name = f'Unnamed: {i}' if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _sheet_preview(sheet, rows: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Read the header and first rows of a read-only worksheet.
+    
+    The row count comes from the sheet dimension metadata; if the writer did
+    not record one, the rows are counted instead.
+    
+    Returns:
+        tuple: (preview DataFrame, data row count excluding the header)
+    """
+    row_iter = sheet.iter_rows(values_only=True)
+    columns = _normalize_header(next(row_iter, ()))
+    data = [list(row[:len(columns)]) for row in islice(row_iter, rows)]
+    
+    max_row = sheet.max_row
+    if max_row is None:
+        max_row = 1 + len(data) + sum(1 for _ in row_iter)
+    
+    preview = pd.DataFrame(data, columns=columns)
+    return preview, max(max_row - 1, 0)
+
+
+def read_sheet_previews(source: Source, rows: int = PREVIEW_ROWS) -> List[Tuple[str, pd.DataFrame, int]]:
+    """
+    Preview every worksheet of a workbook without parsing the rest.
+    
+    Only the header and first rows of each sheet are read. Sheets without a
+    header row (blank sheets left in by Excel) are skipped, unless every
+    sheet is blank.
+    
+    Args:
+        source: Raw .xlsx bytes or path
+        rows: Number of data rows to include in each preview
+    
+    Returns:
+        List of (sheet name, preview DataFrame, data row count), in workbook order
+    """
+    workbook = openpyxl.load_workbook(_as_file(source), read_only=True, data_only=True)
+    try:
+        sheets = [(sheet.title, *_sheet_preview(sheet, rows)) for sheet in workbook.worksheets]
+    finally:
+        workbook.close()
+    
+    return [sheet for sheet in sheets if len(sheet[1].columns)] or sheets[:1]
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def _available(engine: str, module: str) -> bool:
+    """Whether ``engine`` is installed and usable with the installed pandas."""
+    return (engine != 'calamine' or CALAMINE_SUPPORTED) and _installed(module)
+
+
+def workbook_format(source: Source) -> str:
+    """'xls' for legacy OLE2 workbooks, otherwise 'xlsx'."""
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[:len(OLE2_SIGNATURE)])
+    else:
+        with open(source, 'rb') as f:
+            head = f.read(len(OLE2_SIGNATURE))
+    return 'xls' if head == OLE2_SIGNATURE else 'xlsx'
+
+
+def select_engines(source: Source, engine: str = 'auto') -> List[str]:
+    """
+    Installed engines able to read ``source``, in the order to try them.
+    
+    Args:
+        source: Raw workbook bytes or path
+        engine: 'auto', or an engine name to try first
+    
+    Returns:
+        Engine names; the preferred one first, the rest as fallbacks
+    
+    Raises:
+        ValueError: If ``engine`` is unknown or no installed engine reads the format
+    """
+    if engine != 'auto' and engine not in ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}'. Use 'auto' or one of: {', '.join(ENGINES)}")
+    
+    fmt = workbook_format(source)
+    candidates = [
+        name for name, (module, formats) in ENGINES.items()
+        if fmt in formats and _available(name, module)
+    ]
+    if not candidates:
+        raise ValueError(f'No Excel reader installed for .{fmt} files')
+    
+    if engine == 'auto':
+        size = len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+        engine = 'openpyxl' if fmt == 'xlsx' and size > CALAMINE_MAX_SIZE else 'calamine'
+    return sorted(candidates, key=lambda name: name != engine)
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make engine output identical.
+    
+    Text cells holding only whitespace become missing values, as calamine
+    already reads them; openpyxl and xlrd keep the whitespace.
+    """
+    for column in df.columns:
+        values = df[column]
+        if values.dtype != object and not isinstance(values.dtype, pd.StringDtype):
+            continue
+        try:
+            blank = values.str.strip().eq('')
+        except AttributeError:
+            # Object column without any strings (times, mixed numbers)
+            continue
+        if blank.any():
+            df[column] = values.mask(blank)
+    return df
+
+
+def _read_excel(source: Source, sheet: Optional[Sheet], engine: str):
+    """``pd.read_excel`` with engine fallback; a dict of frames when ``sheet`` is None."""
+    errors = []
+    for name in select_engines(source, engine):
+        try:
+            result = pd.read_excel(_as_file(source), sheet_name=sheet, engine=name)
+        except Exception as e:
+            PARSE_ENGINE_RESULTS.inc(engine=name, result='failed')
+            errors.append(f'{name}: {e}')
+            continue
+        PARSE_ENGINE_RESULTS.inc(engine=name, result='ok')
+        if isinstance(result, dict):
+            return {sheet_name: normalize_frame(df) for sheet_name, df in result.items()}
+        return normalize_frame(result)
+    
+    raise ValueError(f"Could not read workbook ({'; '.join(errors)})")
+
+
+def read_all_sheets(source: Source, engine: str = 'auto') -> Dict[str, pd.DataFrame]:
+    """Fully parse every sheet with a header row (used for legacy .xls files)."""
+    sheets = _read_excel(source, None, engine)
+    return {name: df for name, df in sheets.items() if len(df.columns)} or dict(islice(sheets.items(), 1))
+
+
+def read_dataframe(source: Source, sheet: Sheet = 0, engine: str = 'auto') -> pd.DataFrame:
+    """Fully parse one sheet of a workbook, the first by default."""
+    return _read_excel(source, sheet, engine)
+
+
+def _background_executor() -> ThreadPoolExecutor:
+    """Thread pool running deferred parses, created on first use."""
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='excel-parse')
+    return _parse_executor
+
+
+def _timed(mode: str, parse, *args) -> pd.DataFrame:
+    """Run a parse while recording its duration and in-flight count."""
+    with ACTIVE_JOBS.track_inprogress(job='parse'), PARSE_DURATION.time(mode=mode):
+        return parse(*args)
+
+
+def _submit(*args) -> Future:
+    """Queue a timed parse, counting it until it finishes."""
+    global _pending
+    with _pending_lock:
+        _pending += 1
+    future = _background_executor().submit(_timed, *args)
+    future.add_done_callback(_parse_done)
+    return future
+
+
+def _parse_done(_future: Future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def pending_parses() -> int:
+    """Background parses queued or running."""
+    return _pending
+
+
+def submit_parse(source: Source, sheet: Sheet = 0, engine: str = 'auto') -> Future:
+    """Start a full parse of one sheet of ``source`` in the background."""
+    return _submit('single', read_dataframe, source, sheet, engine)
+
+
+def merge_frames(frames: List[pd.DataFrame], subset: Optional[List[str]] = None) -> pd.DataFrame:
+    """Concatenate frames and drop repeated rows, keeping the first occurrence."""
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.drop_duplicates(subset=subset, keep='first').reset_index(drop=True)
+
+
+@contextmanager
+def _shared_sources(sources: List[Source]) -> Iterator[List[Source]]:
+    """
+    Write workbook bytes that several parts read to one temporary file each.
+    
+    Parser processes then open the file instead of each receiving its own
+    pickled copy of the workbook.
+    """
+    counts = Counter(id(source) for source in sources if isinstance(source, (bytes, bytearray)))
+    paths: Dict[int, str] = {}
+    try:
+        for source in sources:
+            if counts.get(id(source), 0) > 1 and id(source) not in paths:
+                fd, path = tempfile.mkstemp(prefix='talkguest-sheets-')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(source)
+                paths[id(source)] = path
+        yield [paths.get(id(source), source) for source in sources]
+    finally:
+        for path in paths.values():
+            os.remove(path)
+
+
+def read_many(
+    sources: List[Source],
+    max_workers: int = 1,
+    subset: Optional[List[str]] = None,
+    sheets: Optional[List[Sheet]] = None,
+    engine: str = 'auto'
+) -> pd.DataFrame:
+    """
+    Parse several workbooks or sheets and concatenate them into one DataFrame.
+    
+    Parts are parsed in parallel on the shared worker pool (see
+    ``services.worker_pool``) when ``max_workers`` is above 1. Rows repeated across parts (overlapping export periods) are
+    dropped, keeping the first occurrence.
+    
+    Args:
+        sources: Workbook bytes or paths, in upload order; the same
+            workbook appears once per sheet read from it
+        max_workers: Maximum number of parser processes
+        subset: Columns identifying a duplicate row; all columns if None
+        sheets: Sheet to read from each source; the first sheet if None
+        engine: Excel engine, see ``select_engines``
+    
+    Returns:
+        Concatenated, deduplicated DataFrame
+    """
+    sheets = sheets or [0] * len(sources)
+    workers = min(max_workers, len(sources))
+    if workers > 1:
+        # Called from request and background threads, so never a forked pool
+        pool = shared_pool(workers)
+        with _shared_sources(sources) as shared:
+            try:
+                frames = list(pool.map(read_dataframe, shared, sheets, [engine] * len(sources)))
+            except BrokenProcessPool:
+                discard_pool(pool)
+                raise
+    else:
+        frames = [read_dataframe(source, sheet, engine) for source, sheet in zip(sources, sheets)]
+    
+    return merge_frames(frames, subset)
+
+
+def submit_parse_many(
+    sources: List[Source],
+    max_workers: int = 1,
+    subset: Optional[List[str]] = None,
+    sheets: Optional[List[Sheet]] = None,
+    engine: str = 'auto'
+) -> Future:
+    """Start ``read_many`` in the background."""
+    return _submit('many', read_many, sources, max_workers, subset, sheets, engine)
+
+
+def read_sheets(
+    source: Source,
+    sheets: List[Sheet],
+    max_workers: int = 1,
+    subset: Optional[List[str]] = None,
+    engine: str = 'auto'
+) -> pd.DataFrame:
+    """Parse the given sheets of one workbook; several sheets are merged as in ``read_many``."""
+    if len(sheets) == 1:
+        return read_dataframe(source, sheets[0], engine)
+    return read_many([source] * len(sheets), max_workers, subset, sheets, engine)
+
+
+def submit_parse_sheets(
+    source: Source,
+    sheets: List[Sheet],
+    max_workers: int = 1,
+    subset: Optional[List[str]] = None,
+    engine: str = 'auto'
+) -> Future:
+    """Start ``read_sheets`` in the background."""
+    return _submit('single' if len(sheets) == 1 else 'many', read_sheets, source, sheets, max_workers, subset, engine)
+
+
+def get_dataframe(entry: Dict, reload: Optional[Callable[[], Dict]] = None) -> pd.DataFrame:
+    """
+    Return the parsed DataFrame for an upload entry, waiting for it if needed.
+    
+    Once the background parse finishes, the entry keeps the DataFrame and its
+    exact row count. An entry whose parse runs in another worker process
+    (read back from the dataset store with ``parsing_since`` set) is
+    reloaded through ``reload`` until that worker stores the DataFrame.
+    Entries whose parse was cut short by a restart, or has not finished
+    within ``PARSE_WAIT_TIMEOUT``, are parsed on the spot from their raw
+    workbooks with the engine they were uploaded with.
+    
+    Args:
+        entry: Upload entry
+        reload: Returns the entry as currently stored, if it can change
+    
+    Raises:
+        Exception: Whatever the background parse raised
+    """
+    future = entry.get('dataframe_future')
+    ready = 'dataframe' in entry or (future is not None and future.done())
+    CACHE_REQUESTS.inc(cache='parsed_upload', result='hit' if ready else 'miss')
+    
+    if 'dataframe' not in entry:
+        if future is not None:
+            df = future.result()
+        else:
+            stored = _await_parse(entry, reload)
+            if 'dataframe' in stored:
+                df = stored['dataframe']
+            elif 'parse_error' in stored:
+                raise ValueError(stored['parse_error'])
+            elif 'data' in stored:
+                df = _reparse(stored)
+            else:
+                raise ValueError(f"Upload of {entry['filename']} was interrupted before parsing finished. Please upload it again.")
+        entry['dataframe'] = df
+        entry['row_count'] = len(df)
+        entry.pop('dataframe_future', None)
+        entry.pop('data', None)
+    return entry['dataframe']
+
+
+def _await_parse(entry: Dict, reload: Optional[Callable[[], Dict]]) -> Dict:
+    """Reload ``entry`` while another worker is still parsing it."""
+    while (
+        reload is not None and 'dataframe' not in entry and 'parsing_since' in entry
+        and time.time() - entry['parsing_since'] < PARSE_WAIT_TIMEOUT
+    ):
+        time.sleep(PARSE_POLL_INTERVAL)
+        entry = reload()
+    return entry
+
+
+def _reparse(entry: Dict) -> pd.DataFrame:
+    """Parse the raw workbooks kept in an upload entry."""
+    engine = entry.get('engine', 'auto')
+    if isinstance(entry['data'], list):
+        return _timed('many', read_many, entry['data'], 1, entry.get('subset'), entry.get('sheets'), engine)
+    sheets = entry.get('sheets', [0])
+    return _timed('single' if len(sheets) == 1 else 'many', read_sheets, entry['data'], sheets, 1, entry.get('subset'), engine)
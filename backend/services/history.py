@@ -0,0 +1,293 @@
+"""
+History
+=======
+Monthly aggregates kept from past processing runs, for period-over-period
+comparisons.
+
+Every successful run contributes small tables of totals per property and
+check-in month (occupancy per nationality, reservation revenue) plus the
+hashed names of the guests per property, month and nationality. They are merged into
+the history of the run's dataset, which outlives the run's results: a later
+run of the same dataset covering the same property and month replaces
+those rows, other rows are kept. Comparing this year's figures with last
+year's then only sums and diffs these tables; the older raw data is not
+needed again.
+
+Guest totals, overall and per property and nationality, count distinct name
+hashes over the whole period, so a guest staying in several months or
+properties is counted once.
+"""
+
+import re
+import threading
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.dataset_store import PersistentStorage
+
+
+# Storage key prefix of the histories, one per dataset; kept when uploads and
+# results are cleared
+HISTORY_KEY = 'history'
+DEFAULT_DATASET = 'default'
+
+OCCUPANCY_KEYS = ['property', 'month', 'nationality']
+OCCUPANCY_METRICS = ['unique_guests', 'total_people', 'total_nights', 'person_nights', 'reservations']
+REVENUE_KEYS = ['property', 'month']
+REVENUE_METRICS = ['gross_value', 'commission', 'iva_amount', 'net_value', 'reservation_count']
+# Table -> key columns
+TABLE_KEYS = {
+    'occupancy': OCCUPANCY_KEYS,
+    'revenue': REVENUE_KEYS,
+    'guests': ['property', 'month', 'nationality', 'guest']
+}
+# A run replaces the stored rows of every table for the property and month
+# combinations it covers
+REPLACE_SCOPE = ['property', 'month']
+
+# Occupancy property groups left out of the per-property tables, as in the occupancy report
+UNGROUPED_PROPERTY = 'Unknown'
+
+MONTH_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+# (first month, last month), both 'YYYY-MM'
+Period = Tuple[str, str]
+
+# Serializes history updates in this process when storage is a plain dict
+_update_lock = threading.Lock()
+
+
+def history_key(dataset: Optional[str] = None) -> str:
+    """Storage key of the history of ``dataset``."""
+    return f'{HISTORY_KEY}:{dataset or DEFAULT_DATASET}'
+
+
+def is_history_key(key: str) -> bool:
+    """Whether ``key`` holds a dataset history."""
+    return key.startswith(f'{HISTORY_KEY}:')
+
+
+def record_run(storage, dataset: Optional[str], aggregates: Mapping[str, pd.DataFrame]) -> Dict:
+    """
+    Merge one run's aggregates into the stored history of ``dataset``.
+    
+    The read and write happen as one update: in a SQLite transaction for
+    ``PersistentStorage``, so runs finishing at once on different worker
+    processes do not lose each other's rows, and under a lock otherwise.
+    
+    Returns:
+        The new history
+    """
+    key = history_key(dataset)
+    if isinstance(storage, PersistentStorage):
+        return storage.modify(key, lambda stored: merge_history(stored, aggregates))
+    with _update_lock:
+        storage[key] = merge_history(storage.get(key), aggregates)
+        return storage[key]
+
+
+def merge_history(history: Optional[Dict], aggregates: Mapping[str, pd.DataFrame]) -> Dict:
+    """
+    Fold one run's aggregates into the history.
+    
+    Args:
+        history: Stored history, or None for the first run
+        aggregates: ``occupancy``, ``revenue`` and ``guests`` tables of one run
+    
+    Returns:
+        New history; rows for each (property, month) in a table of
+        ``aggregates`` replace the stored ones, and ``latest`` is the period
+        of this run
+    """
+    merged = {}
+    for table, keys in TABLE_KEYS.items():
+        new = aggregates[table]
+        old = history[table] if history else None
+        if old is not None and len(old):
+            replaced = pd.MultiIndex.from_frame(old[REPLACE_SCOPE]).isin(pd.MultiIndex.from_frame(new[REPLACE_SCOPE]))
+            new = pd.concat([old[~replaced], new], ignore_index=True)
+        merged[table] = new.sort_values(keys, ignore_index=True)
+    
+    months = aggregates['occupancy']['month']
+    merged['latest'] = (months.min(), months.max()) if len(months) else (history or {}).get('latest')
+    return merged
+
+
+def months_in(period: Period) -> List[str]:
+    """Every month of ``period`` as 'YYYY-MM'."""
+    start, end = (np.datetime64(month, 'M') for month in period)
+    return [str(month) for month in np.arange(start, end + 1)]
+
+
+def shift_period(period: Period, months: int) -> Period:
+    """``period`` moved by ``months`` (negative for earlier)."""
+    return tuple(str(np.datetime64(month, 'M') + months) for month in period)
+
+
+def parse_period(text: str) -> Period:
+    """
+    Parse 'YYYY-MM' or 'YYYY-MM:YYYY-MM'.
+    
+    Raises:
+        ValueError: If the text is not a month or month range
+    """
+    parts = [part.strip() for part in text.split(':')]
+    if len(parts) not in (1, 2) or not all(MONTH_PATTERN.match(part) for part in parts):
+        raise ValueError(f"Invalid period '{text}'. Use YYYY-MM or YYYY-MM:YYYY-MM")
+    start, end = parts[0], parts[-1]
+    if end < start:
+        raise ValueError(f"Invalid period '{text}': the end month is before the start month")
+    return start, end
+
+
+def resolve_periods(history: Optional[Dict], period: Optional[str], against: Optional[str]) -> Tuple[Period, Period]:
+    """
+    Periods to compare from the ``period`` and ``against`` request arguments.
+    
+    Args:
+        history: Stored history
+        period: Month or month range; the months of the latest run if None
+        against: 'last_year' (default), 'previous' for the period of the same
+            length just before, or a month range
+    
+    Returns:
+        tuple: (period, period compared against)
+    
+    Raises:
+        ValueError: If an argument is malformed
+        LookupError: If no period is given and nothing was processed yet
+    """
+    if period:
+        current = parse_period(period)
+    elif history and history.get('latest'):
+        current = tuple(history['latest'])
+    else:
+        raise LookupError('No processed data to compare. Please run processing first.')
+    
+    if not against or against == 'last_year':
+        return current, shift_period(current, -12)
+    if against == 'previous':
+        return current, shift_period(current, -len(months_in(current)))
+    return current, parse_period(against)
+
+
+def _change_rate(current: pd.Series, previous: pd.Series) -> pd.Series:
+    """Relative change, None where the previous value is 0."""
+    rate = (current - previous) / previous.where(previous != 0)
+    return rate.round(4).astype(object).where(rate.notna(), None)
+
+
+def _compare_tables(current: pd.DataFrame, previous: pd.DataFrame, metrics: List[str]) -> pd.DataFrame:
+    """Metrics side by side with their change; rows missing on one side count as 0."""
+    current, previous = current.align(previous, join='outer', fill_value=0)
+    table = pd.DataFrame(index=current.index)
+    for metric in metrics:
+        table[metric] = current[metric].round(2)
+        table[f'{metric}_previous'] = previous[metric].round(2)
+        table[f'{metric}_change'] = (current[metric] - previous[metric]).round(2)
+        table[f'{metric}_change_rate'] = _change_rate(current[metric], previous[metric])
+    return table
+
+
+def _period_rows(table: pd.DataFrame, period: Period) -> pd.DataFrame:
+    return table[table['month'].isin(months_in(period))]
+
+
+def _occupancy_table(occupancy: pd.DataFrame, guests: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """Occupancy metrics per ``keys``, with guests counted once over all the months."""
+    table = occupancy.groupby(keys)[OCCUPANCY_METRICS].sum()
+    table['unique_guests'] = guests.groupby(keys)['guest'].nunique().reindex(table.index, fill_value=0)
+    return table
+
+
+def compare_periods(history: Optional[Dict], period: Period, against: Period) -> Dict:
+    """
+    Compare two periods from the stored aggregates.
+    
+    Args:
+        history: Stored history
+        period: Period to report on
+        against: Period to compare with
+    
+    Returns:
+        Dictionary with both periods (and their months without data), general
+        stats, revenue per property and nationality tables per property; every
+        metric comes with ``_previous``, ``_change`` and ``_change_rate`` values
+    
+    Raises:
+        LookupError: If either period has no stored aggregates
+    """
+    if not history:
+        raise LookupError('No processed data to compare. Please run processing first.')
+    
+    occupancy, revenue = history['occupancy'], history['revenue']
+    periods = {}
+    for name, months in (('period', period), ('against', against)):
+        covered = set(_period_rows(occupancy, months)['month'])
+        if not covered:
+            raise LookupError(
+                f'No stored data for {months[0]} to {months[1]}. Process data for that period once to compare with it.'
+            )
+        periods[name] = {
+            'start': months[0],
+            'end': months[1],
+            'months_without_data': [month for month in months_in(months) if month not in covered]
+        }
+    
+    current_occupancy = _period_rows(occupancy, period)
+    previous_occupancy = _period_rows(occupancy, against)
+    current_revenue = _period_rows(revenue, period)
+    previous_revenue = _period_rows(revenue, against)
+    
+    current_guests = _period_rows(history['guests'], period)
+    previous_guests = _period_rows(history['guests'], against)
+    totals = {
+        'total_guests': (current_guests['guest'].nunique(), previous_guests['guest'].nunique()),
+        'total_nights': (current_occupancy['total_nights'].sum(), previous_occupancy['total_nights'].sum()),
+        'total_reservations': (current_occupancy['reservations'].sum(), previous_occupancy['reservations'].sum()),
+        'total_gross_value': (current_revenue['gross_value'].sum(), previous_revenue['gross_value'].sum()),
+        'total_net_value': (current_revenue['net_value'].sum(), previous_revenue['net_value'].sum())
+    }
+    general_stats = {}
+    for name, (now, before) in totals.items():
+        now, before = np.asarray(now).item(), np.asarray(before).item()
+        general_stats[name] = {
+            'current': round(now, 2),
+            'previous': round(before, 2),
+            'change': round(now - before, 2),
+            'change_rate': round((now - before) / before, 4) if before else None
+        }
+    
+    by_property = _compare_tables(
+        current_revenue.groupby('property')[REVENUE_METRICS].sum(),
+        previous_revenue.groupby('property')[REVENUE_METRICS].sum(),
+        REVENUE_METRICS
+    )
+    
+    nationalities = _compare_tables(
+        _occupancy_table(current_occupancy, current_guests, ['property', 'nationality']),
+        _occupancy_table(previous_occupancy, previous_guests, ['property', 'nationality']),
+        OCCUPANCY_METRICS
+    )
+    property_totals = _compare_tables(
+        _occupancy_table(current_occupancy, current_guests, ['property']),
+        _occupancy_table(previous_occupancy, previous_guests, ['property']),
+        OCCUPANCY_METRICS
+    )
+    occupancy_by_property = {}
+    for property_name, table in nationalities.groupby(level='property', sort=True):
+        if property_name == UNGROUPED_PROPERTY:
+            continue
+        table = table.droplevel('property').sort_values('total_nights', ascending=False)
+        total = property_totals.loc[[property_name]].rename(index={property_name: 'TOTAL'})
+        table = pd.concat([table, total]).rename_axis('nationality').reset_index()
+        occupancy_by_property[property_name] = table.to_dict(orient='records')
+    
+    return {
+        **periods,
+        'general_stats': general_stats,
+        'reservations_by_property': by_property.rename_axis('property').reset_index().to_dict(orient='records'),
+        'occupancy_by_property': occupancy_by_property
+    }
@@ -0,0 +1,70 @@
+"""
+Lazy Import
+===========
+Deferred imports for modules that are slow to load.
+
+pandas, numpy, openpyxl and pyarrow together take seconds to import on a
+small container, and most of that would otherwise happen before the app
+can answer its first health check. Routers refer to these modules through
+``lazy_module`` proxies that import the real module on first attribute
+access, so the cost moves to the first upload, process or download request,
+or to a background warm-up started once the worker is serving.
+"""
+
+import importlib
+import threading
+import types
+from typing import Iterable
+
+
+# Modules worth importing ahead of the first heavy request
+HEAVY_MODULES = (
+    'pandas',
+    'numpy',
+    'openpyxl',
+    'services.excel_reader',
+    'services.etl_service',
+)
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the named module on first attribute access."""
+    
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module = None
+    
+    def _load(self) -> types.ModuleType:
+        if self._module is None:
+            # import_module is thread-safe and returns the cached module after
+            # the first import
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+    
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+    
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_module(name: str) -> LazyModule:
+    """Proxy for module ``name`` that is imported when first used."""
+    return LazyModule(name)
+
+
+def warm_up(modules: Iterable[str] = HEAVY_MODULES) -> threading.Thread:
+    """
+    Import ``modules`` on a daemon thread.
+    
+    Call after the server process is serving (after fork when preloading),
+    so health checks are answered while the imports run. Requests that need
+    a module before the thread gets to it wait on the import lock.
+    """
+    def run():
+        for name in modules:
+            importlib.import_module(name)
+    
+    thread = threading.Thread(target=run, name='import-warm-up', daemon=True)
+    thread.start()
+    return thread
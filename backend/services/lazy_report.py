@@ -0,0 +1,132 @@
+"""
+Lazy Report
+===========
+Report sections computed on first access.
+
+``/api/process`` only cleans and merges the input data; each report section
+(occupancy statistics, per-property tables, revenue breakdowns, detailed
+calculations ...) is built the first time a results or download endpoint
+reads it, then kept for later requests. A report kept in the dataset store
+is given a ``SectionStore``, through which sections built by one worker
+process are saved for the others.
+"""
+
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
+
+from services.metrics import CACHE_REQUESTS, PIPELINE_STAGE_DURATION, approximate_size
+
+
+class LazyReport(Mapping):
+    """Read-only mapping whose values are built on first access and memoized."""
+    
+    def __init__(
+        self,
+        builders: Dict[str, Callable[[], Any]],
+        name: str = 'report',
+        retained: Optional[Callable[[], List[Any]]] = None
+    ):
+        """
+        Args:
+            builders: Section name -> zero-argument callable building it, in
+                the order sections should be listed
+            name: Report name used to label section build metrics
+            retained: Returns the frames the builders read from, which the
+                report keeps alive; counted in its storage footprint
+        """
+        self.name = name
+        self._builders = builders
+        self._retained = retained
+        self._values: Dict[str, Any] = {}
+        self._section_bytes = 0
+        self._lock = threading.RLock()
+        self._store: Optional['SectionStore'] = None
+    
+    def attach_store(self, store: Optional['SectionStore']):
+        """Read sections from, and save newly built sections to, ``store``."""
+        self._store = store
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._values:
+            builder = self._builders[key]
+            with self._lock:
+                if key not in self._values:
+                    CACHE_REQUESTS.inc(cache='report_section', result='miss')
+                    found, value = self._store.load(key) if self._store else (False, None)
+                    if not found:
+                        with PIPELINE_STAGE_DURATION.time(stage=f'{self.name}.{key}'):
+                            value = builder()
+                        if self._store:
+                            self._store.save(key, value)
+                    # Measured once here, so metrics scrapes only read the total
+                    self._section_bytes += approximate_size(value)
+                    self._values[key] = value
+                    return value
+        CACHE_REQUESTS.inc(cache='report_section', result='hit')
+        return self._values[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._builders)
+    
+    def __len__(self) -> int:
+        return len(self._builders)
+    
+    def is_built(self, key: str) -> bool:
+        """Whether ``key`` has already been computed."""
+        return key in self._values
+    
+    def footprint(self) -> Tuple[int, List[Any]]:
+        """Bytes of the sections built so far, and the frames the builders read from."""
+        return self._section_bytes, self._retained() if self._retained else []
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        del state['_store']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._store = None
+
+
+class SectionStore(Protocol):
+    """Where a report's sections are kept once built, shared between processes."""
+    
+    def load(self, section: str) -> Tuple[bool, Any]:
+        """(True, value) if ``section`` has been saved, else (False, None)."""
+    
+    def save(self, section: str, value: Any):
+        """Keep the built ``section``."""
+
+
+def materialize(value: Any, sections: Optional[Iterable[str]] = None) -> Any:
+    """
+    Turn (possibly nested) lazy reports into plain dicts for serialization.
+    
+    Args:
+        value: Report, dict or plain value
+        sections: Keys to keep, all if None. Dotted keys such as
+            ``revenue.reservations_summary`` select nested sections; unknown
+            keys are ignored.
+    
+    Returns:
+        Plain value with every selected section computed
+    """
+    if not isinstance(value, Mapping):
+        return value
+    if sections is None:
+        return {key: materialize(item) for key, item in value.items()}
+    
+    # Section name -> nested selection, or None to keep the whole section
+    selected: Dict[str, Optional[list]] = {}
+    for section in sections:
+        key, _, rest = section.partition('.')
+        if not rest:
+            selected[key] = None
+        elif selected.get(key, []) is not None:
+            selected.setdefault(key, []).append(rest)
+    
+    return {key: materialize(value[key], nested) for key, nested in selected.items() if key in value}
@@ -0,0 +1,178 @@
+"""
+Load Control
+============
+Admission control and readiness for the single-worker deployment.
+
+Heavy requests (pipeline runs and Excel renders) hold a slot while they run.
+Slots are capped below the worker thread count so one thread always stays
+free to answer health checks. When the slots are taken, or memory is near
+its limit, new heavy work is turned away with 503 and ``Retry-After``
+instead of queueing behind requests that are already timing out.
+"""
+
+import os
+import sys
+import threading
+from functools import wraps
+from typing import Dict, Optional
+
+from flask import current_app, jsonify
+
+
+CGROUP_MEMORY_LIMIT_FILES = [
+    '/sys/fs/cgroup/memory.max',                    # cgroup v2
+    '/sys/fs/cgroup/memory/memory.limit_in_bytes',  # cgroup v1
+]
+# cgroup v1 reports "no limit" as a huge number near the max page-aligned int64
+UNLIMITED_THRESHOLD = 1 << 60
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def memory_usage() -> Optional[int]:
+    """Resident set size of this process in bytes, or None if unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def memory_limit() -> Optional[int]:
+    """Container memory limit in bytes from cgroups, or None if unlimited."""
+    for path in CGROUP_MEMORY_LIMIT_FILES:
+        limit = _read_int(path)
+        if limit is not None and limit < UNLIMITED_THRESHOLD:
+            return limit
+    return None
+
+
+def pending_parses() -> int:
+    """Background parses queued or running; none before the Excel reader is first used."""
+    excel_reader = sys.modules.get('services.excel_reader')
+    return excel_reader.pending_parses() if excel_reader is not None else 0
+
+
+class LoadController:
+    """Tracks in-flight requests and heavy-work slots for one worker process."""
+    
+    def __init__(
+        self,
+        threads: int,
+        max_heavy: int,
+        max_pending_parses: int,
+        memory_limit_bytes: Optional[int] = None,
+        memory_high_watermark: float = 0.9
+    ):
+        """
+        Args:
+            threads: Request threads in this worker
+            max_heavy: Concurrent heavy requests admitted
+            max_pending_parses: Background parses queued or running before
+                the worker reports not ready
+            memory_limit_bytes: Memory limit; detected from cgroups if None
+            memory_high_watermark: Fraction of the limit treated as pressure
+        """
+        self.threads = threads
+        self.max_heavy = max_heavy
+        self.max_pending_parses = max_pending_parses
+        self.memory_limit_bytes = memory_limit_bytes or memory_limit()
+        self.memory_high_watermark = memory_high_watermark
+        self.in_flight = 0
+        self.heavy_in_flight = 0
+        self._lock = threading.Lock()
+    
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+    
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+    
+    def memory_pressure(self) -> bool:
+        """Whether resident memory is above the high watermark of the limit."""
+        if not self.memory_limit_bytes:
+            return False
+        usage = memory_usage()
+        return usage is not None and usage >= self.memory_limit_bytes * self.memory_high_watermark
+    
+    def try_acquire(self) -> Optional[str]:
+        """
+        Take a heavy-work slot.
+        
+        Returns:
+            None if admitted, otherwise the reason for rejecting the request
+        """
+        if self.memory_pressure():
+            return 'memory pressure'
+        with self._lock:
+            if self.heavy_in_flight >= self.max_heavy:
+                return 'all workers busy'
+            self.heavy_in_flight += 1
+        return None
+    
+    def release(self):
+        with self._lock:
+            self.heavy_in_flight -= 1
+    
+    def status(self) -> Dict:
+        """Readiness and the load figures behind it."""
+        queued = pending_parses()
+        reasons = []
+        if self.heavy_in_flight >= self.max_heavy:
+            reasons.append('all workers busy')
+        if queued >= self.max_pending_parses:
+            reasons.append('parse queue full')
+        if self.memory_pressure():
+            reasons.append('memory pressure')
+        
+        return {
+            'ready': not reasons,
+            'reasons': reasons,
+            'threads': self.threads,
+            'in_flight': self.in_flight,
+            'heavy_in_flight': self.heavy_in_flight,
+            'max_heavy': self.max_heavy,
+            'pending_parses': queued,
+            'memory_bytes': memory_usage(),
+            'memory_limit_bytes': self.memory_limit_bytes
+        }
+
+
+def admission_controlled(view):
+    """
+    Reject a heavy request with 503 and ``Retry-After`` when the worker is saturated.
+    
+    The slot is held until the view returns. Streaming responses should not
+    use this decorator, since their work continues after the view returns.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = current_app.extensions.get('load_controller')
+        if controller is None:
+            return view(*args, **kwargs)
+        
+        reason = controller.try_acquire()
+        if reason:
+            response = jsonify({
+                'success': False,
+                'error': f'Server is busy ({reason}). Please retry shortly.'
+            })
+            response.headers['Retry-After'] = str(current_app.config['RETRY_AFTER_SECONDS'])
+            return response, 503
+        
+        try:
+            return view(*args, **kwargs)
+        finally:
+            controller.release()
+    
+    return wrapper
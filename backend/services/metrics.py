@@ -0,0 +1,264 @@
+"""
+Metrics
+=======
+In-process counters, gauges and histograms rendered in the Prometheus text
+exposition format for ``/api/metrics``.
+
+Metrics live in module-level objects so any service can record to them
+without threading a registry through call sites. Values are per process;
+work done inside worker processes (batch runs, multi-file parses) is timed
+from the parent.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Seconds; covers fast JSON endpoints up to long pipeline runs
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Bytes; 16KB up to the 1GB chunked upload limit
+SIZE_BUCKETS = tuple(16 * 1024 * 4 ** i for i in range(9))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base class holding one value per label combination."""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+    
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    
+    kind = 'counter'
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def _samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    
+    kind = 'gauge'
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    
+    def clear(self):
+        """Drop all label combinations."""
+        with self._lock:
+            self._values.clear()
+    
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Increment for the duration of a block."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations with sum and count."""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[0][-1] if entry else 0
+    
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.label_names, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+REQUEST_LATENCY = Histogram(
+    'talkguest_request_duration_seconds', 'HTTP request latency by route.', ['method', 'route', 'status']
+)
+UPLOAD_SIZE = Histogram(
+    'talkguest_upload_size_bytes', 'Size of uploaded workbooks.', ['file_type'], buckets=SIZE_BUCKETS
+)
+PARSE_DURATION = Histogram(
+    'talkguest_parse_duration_seconds', 'Full workbook parse duration.', ['mode']
+)
+PARSE_ENGINE_RESULTS = Counter(
+    'talkguest_parse_engine_total', 'Full workbook parses by Excel engine and outcome.', ['engine', 'result']
+)
+PIPELINE_STAGE_DURATION = Histogram(
+    'talkguest_pipeline_stage_duration_seconds', 'ETL pipeline stage and report section durations.', ['stage']
+)
+EXPORT_RENDER_DURATION = Histogram(
+    'talkguest_export_render_duration_seconds', 'Excel export render duration.', ['report']
+)
+ACTIVE_JOBS = Gauge(
+    'talkguest_active_jobs', 'Jobs currently running.', ['job']
+)
+PIPELINE_RUNS_STOPPED = Counter(
+    'talkguest_pipeline_runs_stopped_total', 'Pipeline runs stopped before completion.', ['reason']
+)
+CACHE_REQUESTS = Counter(
+    'talkguest_cache_requests_total', 'Cache lookups by outcome.', ['cache', 'result']
+)
+DATA_STORAGE_BYTES = Gauge(
+    'talkguest_data_storage_bytes', 'Approximate in-memory size of DATA_STORAGE entries.', ['entry']
+)
+
+
+def approximate_size(value) -> int:
+    """
+    Rough memory footprint of a report value: DataFrames, raw bytes and
+    nested dicts and lists of plain records.
+    
+    Walks every item, so callers measure a value once and keep the number.
+    """
+    # No DataFrame can exist before pandas is imported, so don't import it here
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(key) + approximate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+# id -> (value, bytes) for the frames and record lists held in storage at the
+# last scrape; each is measured once, when first seen, and the entry is
+# dropped once the value leaves storage
+_measured: Dict[int, Tuple[object, int]] = {}
+_measured_lock = threading.Lock()
+
+
+def _entry_size(value, measured: Dict[int, Tuple[object, int]], seen: set) -> int:
+    """
+    Size of a storage value, reusing the sizes of frames and lists measured
+    before; objects in ``seen`` were already counted for this entry.
+    """
+    pd = sys.modules.get('pandas')
+    if (pd is not None and isinstance(value, pd.DataFrame)) or isinstance(value, list):
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        if id(value) not in measured:
+            cached = _measured.get(id(value))
+            size = cached[1] if cached is not None and cached[0] is value else approximate_size(value)
+            measured[id(value)] = (value, size)
+        return measured[id(value)][1]
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, 'footprint'):
+        # Lazy reports measure each section as it is built
+        section_bytes, frames = value.footprint()
+        return section_bytes + sum(_entry_size(frame, measured, seen) for frame in frames)
+    if isinstance(value, dict):
+        return sum(_entry_size(item, measured, seen) for item in value.values())
+    return 0
+
+
+def update_storage_footprint(entries: Dict[str, object]):
+    """
+    Refresh the storage gauge from the entries currently held in memory.
+    
+    A frame shared by several entries is counted in each of them.
+    """
+    global _measured
+    with _measured_lock:
+        measured: Dict[int, Tuple[object, int]] = {}
+        DATA_STORAGE_BYTES.clear()
+        for key, value in entries.items():
+            DATA_STORAGE_BYTES.set(_entry_size(value, measured, set()), entry=key)
+        _measured = measured
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
@@ -0,0 +1,183 @@
+"""
+Name Matching
+=============
+Fuzzy matching of reservation guest names to the guests file.
+
+Names are first compared after normalization (accents, case, punctuation
+and spacing removed), which resolves most mismatches. The remaining names
+are compared only against guests sharing a blocking key. Each token gets
+three signatures (phonetic code, first and last three letters), and a
+name's keys are the pairs of first-token and last-token signatures, so a
+typo in one token still leaves a shared key. Keys too common to narrow
+anything down are skipped, which keeps the number of comparisons close to
+linear in the number of names.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+DEFAULT_THRESHOLD = 0.88
+# Blocks larger than this are too common to narrow anything down
+MAX_BLOCK_SIZE = 500
+RESOLVED_CACHE_SIZE = 100_000
+# Names compared between calls to the caller's checkpoint
+CHECKPOINT_EVERY = 256
+
+_NON_ALPHA = re.compile(r'[^a-z0-9]+')
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'),
+    'l': '4', **dict.fromkeys('mn', '5'), 'r': '6'
+}
+
+# (guest list fingerprint, reservation name) -> (guest name, confidence), kept
+# across pipeline runs. A fuzzy match is only the best one for the guest list
+# it was found in, so runs with other guest lists never reuse it.
+_resolved: 'OrderedDict[Tuple[int, str], Tuple[str, float]]' = OrderedDict()
+_resolved_lock = threading.Lock()
+
+
+@lru_cache(maxsize=RESOLVED_CACHE_SIZE)
+def normalize_name(name: str) -> str:
+    """Lower-case ASCII name with single spaces between tokens."""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALPHA.sub(' ', text.casefold()).strip()
+
+
+def _soundex(token: str) -> str:
+    """Four-character Soundex code of a normalized token."""
+    code = token[0]
+    previous = _SOUNDEX_CODES.get(token[0], '')
+    for char in token[1:]:
+        digit = _SOUNDEX_CODES.get(char, '')
+        if digit and digit != previous:
+            code += digit
+        if char not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def _signatures(token: str) -> Set[str]:
+    return {_soundex(token), f'<{token[:3]}', f'>{token[-3:]}'}
+
+
+def blocking_keys(normalized: str) -> Set[str]:
+    """Pairs of first- and last-token signatures; token signatures for one-token names."""
+    tokens = [token for token in normalized.split() if len(token) > 1]
+    if not tokens:
+        return set()
+    first = _signatures(tokens[0])
+    if len(tokens) == 1:
+        return first
+    last = _signatures(tokens[-1])
+    return {f'{a}|{b}' for a in first for b in last}
+
+
+def similarity(a: str, b: str) -> float:
+    """Similarity of two normalized names, ignoring token order."""
+    return SequenceMatcher(None, _sorted_tokens(a), _sorted_tokens(b)).ratio()
+
+
+@lru_cache(maxsize=RESOLVED_CACHE_SIZE)
+def _sorted_tokens(name: str) -> str:
+    return ' '.join(sorted(name.split()))
+
+
+def _recall(key: Tuple[int, str]) -> Optional[Tuple[str, float]]:
+    with _resolved_lock:
+        cached = _resolved.get(key)
+        if cached is not None:
+            _resolved.move_to_end(key)
+        return cached
+
+
+def _remember(key: Tuple[int, str], guest: str, confidence: float):
+    with _resolved_lock:
+        _resolved[key] = (guest, confidence)
+        _resolved.move_to_end(key)
+        if len(_resolved) > RESOLVED_CACHE_SIZE:
+            _resolved.popitem(last=False)
+
+
+def match_names(
+    reservation_names: Iterable[str],
+    guest_names: Iterable[str],
+    threshold: float = DEFAULT_THRESHOLD,
+    checkpoint: Optional[Callable[[], None]] = None
+) -> Dict[str, Tuple[Optional[str], float, str]]:
+    """
+    Match each distinct reservation name to a guest name.
+    
+    Args:
+        reservation_names: Distinct guest names from the reservations file
+        guest_names: Distinct names from the guests file
+        threshold: Minimum similarity for a fuzzy match (0-1)
+        checkpoint: Called every ``CHECKPOINT_EVERY`` names; raising from it
+            stops matching (used for pipeline cancellation)
+    
+    Returns:
+        Dictionary mapping each reservation name to
+        ``(guest name or None, confidence, method)`` where method is
+        'exact', 'normalized', 'fuzzy' or 'unmatched'
+    """
+    guest_names = list(dict.fromkeys(guest_names))
+    exact = set(guest_names)
+    by_normalized: Dict[str, str] = {}
+    for name in guest_names:
+        by_normalized.setdefault(normalize_name(name), name)
+    
+    guest_list = hash(frozenset(by_normalized))
+    
+    index: Dict[str, List[str]] = defaultdict(list)
+    for normalized in by_normalized:
+        for key in blocking_keys(normalized):
+            index[key].append(normalized)
+    
+    matches = {}
+    for position, name in enumerate(reservation_names):
+        if checkpoint is not None and position % CHECKPOINT_EVERY == 0:
+            checkpoint()
+        
+        if name in exact:
+            matches[name] = (name, 1.0, 'exact')
+            continue
+        
+        normalized = normalize_name(name)
+        if normalized in by_normalized:
+            matches[name] = (by_normalized[normalized], 1.0, 'normalized')
+            continue
+        
+        cached = _recall((guest_list, normalized))
+        if cached and cached[1] >= threshold:
+            matches[name] = (by_normalized[cached[0]], round(cached[1], 4), 'fuzzy')
+            continue
+        
+        candidates = set()
+        for key in blocking_keys(normalized):
+            block = index.get(key, ())
+            if len(block) <= MAX_BLOCK_SIZE:
+                candidates.update(block)
+        
+        best, best_score = None, 0.0
+        matcher = SequenceMatcher(None, b=_sorted_tokens(normalized))
+        for candidate in candidates:
+            matcher.set_seq1(_sorted_tokens(candidate))
+            # Cheap upper bounds first; ratio() is the expensive part
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best, best_score = candidate, score
+        
+        if best is not None and best_score >= threshold:
+            _remember((guest_list, normalized), best, best_score)
+            matches[name] = (by_normalized[best], round(best_score, 4), 'fuzzy')
+        else:
+            matches[name] = (None, round(best_score, 4), 'unmatched')
+    
+    return matches
@@ -0,0 +1,123 @@
+"""
+Pace
+====
+Booking pace (pickup) per stay month.
+
+For every stay month the report shows what was on the books a given number
+of days before arrival: reservations, room-nights and revenue booked at
+least that far ahead, the pickup since the previous point and the same
+figures for the same month one year earlier.
+
+Reservations are accumulated once into a grid of stay month x days before
+arrival with ``np.bincount``; a reversed cumulative sum along the lead-time
+axis turns bookings per lead day into on-the-books totals. The cost is one
+pass over the reservations plus a grid of a few hundred cells per month,
+regardless of how many years of bookings are loaded.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+from services.analytics_service import cancelled_mask
+
+
+# Days before arrival reported, furthest first
+PACE_POINTS = [365, 180, 90, 60, 30, 14, 7, 0]
+
+# Bookings made further ahead are counted at this lead time
+MAX_LEAD_DAYS = max(PACE_POINTS)
+
+
+def pace_grid(month_codes: np.ndarray, lead_days: np.ndarray, weights: Optional[np.ndarray], n_months: int) -> np.ndarray:
+    """
+    On-the-books totals per stay month and days before arrival.
+
+    Args:
+        month_codes: Stay month of each reservation, 0 for the first month
+        lead_days: Whole days between booking and check-in
+        weights: Value to total per reservation; None to count reservations
+        n_months: Number of stay months
+
+    Returns:
+        Array of shape (n_months, MAX_LEAD_DAYS + 1); cell [m, d] totals the
+        reservations for month m booked at least d days before arrival
+    """
+    width = MAX_LEAD_DAYS + 1
+    lead = np.clip(lead_days, 0, MAX_LEAD_DAYS).astype(np.int64)
+    booked = np.bincount(month_codes * width + lead, weights=weights, minlength=n_months * width)
+    booked = booked.reshape(n_months, width)
+    return booked[:, ::-1].cumsum(axis=1)[:, ::-1]
+
+
+def compute_pace_report(df: pd.DataFrame, cols) -> Dict:
+    """
+    Compute on-the-books pace per stay month at ``PACE_POINTS``.
+
+    Cancelled reservations are left out. Reservations are assigned to the
+    month of their check-in, with all their nights and revenue. Last-year
+    figures are None for months whose prior-year month precedes the data.
+
+    Args:
+        df: Reservations after test-entry removal
+        cols: ColumnMapper for the reservation language
+
+    Returns:
+        Dictionary with the reported points, the latest booking date, the
+        number of reservations without a booking date and one record per
+        stay month and point
+    """
+    col_checkin = cols.res('checkin')
+    col_booked_at = cols.res('booked_at')
+    empty = {'points': PACE_POINTS, 'as_of': None, 'missing_booking_date': 0, 'by_stay_month': []}
+    if col_booked_at not in df.columns or df.empty:
+        return {**empty, 'missing_booking_date': len(df)}
+
+    checkin = df[col_checkin].to_numpy(dtype='datetime64[ns]')
+    booked_at = df[col_booked_at].to_numpy(dtype='datetime64[ns]')
+    active = ~cancelled_mask(df, cols) & ~np.isnat(checkin)
+    has_booking = active & ~np.isnat(booked_at)
+    if not has_booking.any():
+        return {**empty, 'missing_booking_date': int(active.sum())}
+
+    months = checkin[has_booking].astype('datetime64[M]')
+    first_month = months.min()
+    month_codes = (months - first_month).astype(np.int64)
+    n_months = int(month_codes.max()) + 1
+    lead_days = np.floor((checkin[has_booking] - booked_at[has_booking]) / np.timedelta64(1, 'D'))
+
+    point_index = np.array(PACE_POINTS)
+    on_books = {
+        'reservations': pace_grid(month_codes, lead_days, None, n_months),
+        'room_nights': pace_grid(month_codes, lead_days, df[cols.res('nights')].to_numpy(dtype=float)[has_booking], n_months),
+        'revenue': pace_grid(month_codes, lead_days, df[cols.res('reservation_value')].to_numpy(dtype=float)[has_booking], n_months)
+    }
+    on_books = {name: grid[:, point_index] for name, grid in on_books.items()}
+
+    n_points = len(PACE_POINTS)
+    stay_months = np.arange(first_month, first_month + n_months)
+    table = pd.DataFrame({
+        'stay_month': np.repeat(stay_months.astype(str), n_points),
+        'days_before_arrival': np.tile(point_index, n_months)
+    })
+    for name, values in on_books.items():
+        table[name] = values.ravel()
+    for name in ('room_nights', 'revenue'):
+        values = on_books[name]
+        pickup = np.diff(values, axis=1, prepend=0)
+        last_year = np.full(values.shape, np.nan)
+        last_year[12:] = values[:-12]
+        table[f'pickup_{name}'] = pickup.ravel()
+        table[f'last_year_{name}'] = last_year.ravel()
+        table[f'{name}_vs_last_year'] = (values - last_year).ravel()
+
+    # Months without any booking carry no information
+    table = table[np.repeat(on_books['reservations'][:, -1] > 0, n_points)]
+    table = table.astype({'reservations': int, 'room_nights': int, 'pickup_room_nights': int}).round(2)
+
+    return {
+        'points': PACE_POINTS,
+        'as_of': pd.Timestamp(booked_at[has_booking].max()).strftime('%Y-%m-%d'),
+        'missing_booking_date': int((active & ~has_booking).sum()),
+        'by_stay_month': table.astype(object).where(table.notna(), None).to_dict(orient='records')
+    }
@@ -0,0 +1,188 @@
+"""
+Schema Coercion
+===============
+Typed schemas for the reservations and invoices files.
+
+Every typed column is coerced exactly once, right after ingestion, so the
+pipeline stages can work on clean numeric, datetime and boolean arrays.
+Parsing is vectorized and understands European number formats
+("1.234,56 €") as well as English ones ("€1,234.56").
+"""
+
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+from typing import Dict, Optional, Tuple
+
+
+# Decimal separator per export language; English exports may group
+# thousands with commas
+DECIMAL_SEPARATORS = {'pt': ',', 'en': '.'}
+
+# Logical column key -> target type. Keys match RESERVATIONS_COLUMNS / FATURACAO_COLUMNS.
+RESERVATIONS_SCHEMA = {
+    'nights': 'int',
+    'adults': 'int',
+    'children_no_tmt': 'int',
+    'children_tmt': 'int',
+    'channel_commission': 'float',
+    'reservation_value': 'float',
+    'cleaning_fee': 'float',
+    'booked_at': 'datetime',
+    'checkin': 'datetime',
+    'checkout': 'datetime',
+    'canceled_at': 'datetime',
+}
+
+FATURACAO_SCHEMA = {
+    'total_document': 'float',
+    'base_amount': 'float',
+    'vat_amount': 'float',
+    'cancelled': 'bool',
+    'document_date': 'datetime',
+}
+
+TRUE_VALUES = {'true', 'sim', 'yes', 's', 'y', '1', 'x', 'verdadeiro'}
+FALSE_VALUES = {'false', 'não', 'nao', 'no', 'n', '0', 'falso', ''}
+
+# Currency symbols, codes and any whitespace (including non-breaking spaces)
+CURRENCY_PATTERN = r'[€$£\s ]|EUR|USD|GBP'
+# A comma grouping thousands: "1,234", "-12,345,678"
+THOUSANDS_PATTERN = r'[+-]?[1-9]\d{0,2}(?:,\d{3})+'
+
+# Explicit day-first formats tried, vectorized, after ISO dates
+DATE_FORMATS = ['%d/%m/%Y', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d-%m-%Y', '%d-%m-%Y %H:%M', '%d.%m.%Y']
+
+
+def parse_numeric(series: pd.Series, decimal: Optional[str] = None) -> Tuple[pd.Series, pd.Series]:
+    """
+    Parse a column of numbers that may be stored as text.
+
+    When a value contains both separators, whichever comes last is the
+    decimal separator. A lone comma is a decimal comma, unless it groups
+    thousands ("1,234" or "12,345,678": one to three digits, then groups of
+    exactly three) and the export does not use decimal commas.
+
+    Args:
+        series: Raw column
+        decimal: Decimal separator of the export's language (',' for
+            Portuguese exports), or None if not known
+
+    Returns:
+        tuple: (float values with NaN for missing/invalid, boolean mask of
+        non-empty values that could not be parsed)
+    """
+    if is_numeric_dtype(series) and not is_bool_dtype(series):
+        values = series.astype('float64')
+        return values, pd.Series(False, index=series.index)
+
+    text = series.astype('string').str.replace(CURRENCY_PATTERN, '', regex=True)
+    last_dot = text.str.rfind('.')
+    comma_decimal = text.str.rfind(',') > last_dot
+    if decimal != ',':
+        thousands = (last_dot < 0) & text.str.fullmatch(THOUSANDS_PATTERN)
+        comma_decimal &= ~thousands.fillna(False)
+
+    european = text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    english = text.str.replace(',', '', regex=False)
+    normalized = european.where(comma_decimal.fillna(False), english)
+
+    values = pd.to_numeric(normalized, errors='coerce').astype('float64')
+    failed = values.isna() & normalized.notna() & (normalized != '')
+    return values, failed.fillna(False).astype(bool)
+
+
+def parse_datetime(series: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Parse a date column.
+
+    ISO dates (and dates the workbook already stored as dates) are parsed
+    first, then the explicit day-first formats in ``DATE_FORMATS``, each as
+    one vectorized pass. Only values matching none of them go through
+    pandas' per-value parser, reading ambiguous dates day-first.
+
+    Returns:
+        tuple: (datetime64 values with NaT for missing/invalid, failure mask)
+    """
+    if is_datetime64_any_dtype(series):
+        return series, pd.Series(False, index=series.index)
+
+    text = series.astype('string').str.strip()
+    pending = text.notna() & (text != '')
+    values = pd.to_datetime(text.where(pending), errors='coerce', format='ISO8601')
+    for date_format in DATE_FORMATS:
+        remaining = pending & values.isna()
+        if not remaining.any():
+            break
+        values = values.fillna(pd.to_datetime(text[remaining], errors='coerce', format=date_format))
+
+    remaining = pending & values.isna()
+    if remaining.any():
+        values = values.fillna(pd.to_datetime(text[remaining], errors='coerce', dayfirst=True, format='mixed'))
+    failed = pending & values.isna()
+    return values, failed.fillna(False).astype(bool)
+
+
+def parse_bool(series: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Parse a yes/no column (``True``/``Sim``/``1`` ...). Missing values are False.
+
+    Returns:
+        tuple: (boolean values, failure mask)
+    """
+    if is_bool_dtype(series):
+        return series.fillna(False).astype(bool), pd.Series(False, index=series.index)
+
+    text = series.astype('string').str.strip().str.lower().fillna('')
+    is_true = text.isin(TRUE_VALUES)
+    failed = ~is_true & ~text.isin(FALSE_VALUES)
+    return is_true.astype(bool), failed.astype(bool)
+
+
+def coerce_frame(
+    df: pd.DataFrame,
+    schema: Dict[str, str],
+    columns: Dict[str, str],
+    decimal: Optional[str] = None
+) -> Tuple[pd.DataFrame, Dict[str, Dict]]:
+    """
+    Coerce the typed columns of a DataFrame in place.
+
+    Numeric columns have missing or invalid values replaced by 0 so that
+    downstream arithmetic needs no further cleaning. Columns missing from
+    the frame are skipped.
+
+    Args:
+        df: DataFrame to coerce (modified in place)
+        schema: Logical column key -> 'int', 'float', 'datetime' or 'bool'
+        columns: Logical column key -> actual column name
+        decimal: Decimal separator of the export's language, see ``parse_numeric``
+
+    Returns:
+        tuple: (df, report) where report maps column name to
+        ``{'failed': count, 'examples': [...]}`` for columns with failures
+    """
+    report = {}
+
+    for key, kind in schema.items():
+        column = columns.get(key)
+        if column is None or column not in df.columns:
+            continue
+
+        raw = df[column]
+        if kind in ('int', 'float'):
+            values, failed = parse_numeric(raw, decimal)
+            values = values.fillna(0)
+            df[column] = values.round().astype('int64') if kind == 'int' else values
+        elif kind == 'datetime':
+            df[column], failed = parse_datetime(raw)
+        else:
+            df[column], failed = parse_bool(raw)
+
+        failed_count = int(failed.sum())
+        if failed_count:
+            report[column] = {
+                'failed': failed_count,
+                'examples': raw[failed].astype(str).unique()[:3].tolist()
+            }
+
+    return df, report
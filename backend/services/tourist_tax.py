@@ -0,0 +1,191 @@
+"""
+Tourist Tax
+===========
+Municipal tourist tax (Taxa Municipal Turística, TMT) due on reservations.
+
+Each property is assigned to a municipality with its own rate per person
+per night, a cap on taxable nights per stay and whether children marked as
+subject to TMT are charged. Children under the municipal age limit are
+already split out by the reservation system into the "not subject to TMT"
+column and are never charged.
+
+Tax is computed for all reservations at once with array arithmetic over
+nights x taxable people, then summed per property and check-in month with
+one ``bincount`` per figure. A stay is attributed to its check-in month,
+which is when the tax is collected.
+
+The rates shipped in ``DEFAULT_TOURIST_TAX`` are examples and the section is
+off unless a run's config enables it. Overrides are merged into the defaults
+per municipality, so changing one rate keeps the other settings.
+"""
+
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_TOURIST_TAX = {
+    'enabled': False,
+    # Municipality -> rate per person per night (EUR), taxable nights cap per
+    # stay (0 for no cap) and whether children subject to TMT are exempt
+    'municipalities': {
+        'angra_do_heroismo': {'rate': 1.00, 'max_nights': 7, 'children_exempt': False},
+        'olhao': {'rate': 1.50, 'max_nights': 7, 'children_exempt': False}
+    },
+    # Lower-case text found in the property name -> municipality, first match wins
+    'properties': {
+        'fuzeta': 'olhao'
+    },
+    # Municipality of every other property; None leaves them untaxed
+    'default_municipality': 'angra_do_heroismo'
+}
+
+
+def resolve_tourist_tax(overrides: Optional[Mapping] = None) -> Dict:
+    """
+    Tourist tax settings with ``overrides`` merged into ``DEFAULT_TOURIST_TAX``.
+    
+    Municipalities are merged one by one, so an override of one rate keeps
+    the municipality's other parameters and the other municipalities;
+    property mappings are added to the default ones.
+    
+    Raises:
+        ValueError: If a municipality has no rate, or the default
+            municipality or a property maps to one that is not configured
+    """
+    overrides = overrides or {}
+    settings = {**DEFAULT_TOURIST_TAX, **overrides}
+    municipalities = {name: dict(parameters) for name, parameters in DEFAULT_TOURIST_TAX['municipalities'].items()}
+    for name, parameters in overrides.get('municipalities', {}).items():
+        municipalities[name] = {**municipalities.get(name, {}), **parameters}
+    settings['municipalities'] = municipalities
+    settings['properties'] = {**DEFAULT_TOURIST_TAX['properties'], **overrides.get('properties', {})}
+    
+    configured = settings['municipalities']
+    for name, parameters in configured.items():
+        if 'rate' not in parameters:
+            raise ValueError(f"Tourist tax municipality '{name}' has no rate")
+    default = settings.get('default_municipality')
+    if default is not None and default not in configured:
+        raise ValueError(f"Tourist tax default municipality '{default}' is not among the configured municipalities")
+    for fragment, municipality in settings['properties'].items():
+        if municipality not in configured:
+            raise ValueError(f"Tourist tax municipality '{municipality}' of properties matching '{fragment}' is not configured")
+    return settings
+
+
+def municipality_for(property_name, settings: Dict) -> Optional[str]:
+    """Municipality a property belongs to, or None if it has no tourist tax."""
+    if pd.isna(property_name):
+        return None
+    name = str(property_name).lower()
+    for fragment, municipality in settings['properties'].items():
+        if fragment.lower() in name:
+            return municipality
+    return settings.get('default_municipality')
+
+
+def compute_tourist_tax(
+    df: pd.DataFrame,
+    cols,
+    settings: Optional[Dict] = None,
+    property_column: Optional[str] = None
+) -> Dict:
+    """
+    Compute tourist tax per reservation and aggregate it per property and month.
+    
+    Args:
+        df: Cleaned reservations (one row per stay)
+        cols: ColumnMapper for the reservation language
+        settings: Tourist tax settings from ``resolve_tourist_tax``; ``DEFAULT_TOURIST_TAX`` if None
+        property_column: Column to group by, the reservation property if None
+    
+    Returns:
+        Dictionary with overall totals, per-property/per-month table records
+        and per-municipality totals
+    """
+    settings = settings or DEFAULT_TOURIST_TAX
+    municipalities = list(settings['municipalities'])
+    col_property = property_column or cols.res('property')
+    
+    property_codes, properties = pd.factorize(df[col_property].fillna('Unknown').astype(str).str.strip(), sort=True)
+    
+    # Municipality index per property; -1 for properties without tax
+    property_municipality = np.array([
+        municipalities.index(municipality) if municipality in settings['municipalities'] else -1
+        for municipality in (municipality_for(name, settings) for name in properties)
+    ], dtype=np.int64)
+    municipality_index = property_municipality[property_codes]
+    taxed = municipality_index >= 0
+    
+    # Per-municipality parameters, with a trailing zero-rate entry that
+    # untaxed rows index through -1
+    parameters = [settings['municipalities'][name] for name in municipalities]
+    rates = np.array([float(p['rate']) for p in parameters] + [0.0])
+    caps = np.array([int(p.get('max_nights') or 0) for p in parameters] + [0])
+    children_exempt = np.array([bool(p.get('children_exempt', False)) for p in parameters] + [True])
+    
+    nights = np.nan_to_num(df[cols.res('nights')].to_numpy(dtype=float)).clip(min=0)
+    adults = np.nan_to_num(df[cols.res('adults')].to_numpy(dtype=float)).clip(min=0)
+    children_tmt = np.nan_to_num(df[cols.res('children_tmt')].to_numpy(dtype=float)).clip(min=0)
+    children_no_tmt = np.nan_to_num(df[cols.res('children_no_tmt')].to_numpy(dtype=float)).clip(min=0)
+    
+    cap = caps[municipality_index]
+    taxable_nights = np.where(cap > 0, np.minimum(nights, cap), nights)
+    taxable_people = adults + np.where(children_exempt[municipality_index], 0, children_tmt)
+    rate = rates[municipality_index]
+    
+    taxable_person_nights = np.where(taxed, taxable_nights * taxable_people, 0)
+    person_nights = nights * (adults + children_tmt + children_no_tmt)
+    exempt_person_nights = person_nights - taxable_person_nights
+    tax = taxable_person_nights * rate
+    
+    # Group by (property, check-in month) with one bincount per figure
+    months = df[cols.res('checkin')].dt.strftime('%Y-%m')
+    month_codes, month_labels = pd.factorize(months, sort=True)
+    valid = month_codes >= 0
+    n_groups = len(properties) * len(month_labels)
+    groups = property_codes[valid] * len(month_labels) + month_codes[valid]
+    
+    def per_group(values: np.ndarray) -> np.ndarray:
+        return np.bincount(groups, weights=values[valid], minlength=n_groups)
+    
+    reservations = np.bincount(groups, minlength=n_groups)
+    grid = pd.DataFrame({
+        'property': np.repeat(np.asarray(properties, dtype=object), len(month_labels)),
+        'municipality': np.repeat(
+            np.array([municipalities[i] if i >= 0 else None for i in property_municipality], dtype=object),
+            len(month_labels)
+        ),
+        'month': np.tile(np.asarray(month_labels, dtype=object), len(properties)),
+        'reservations': reservations,
+        'nights': per_group(nights).astype(int),
+        'taxable_person_nights': per_group(taxable_person_nights).astype(int),
+        'exempt_person_nights': per_group(exempt_person_nights).astype(int),
+        'tax': per_group(tax).round(2)
+    })
+    by_property_month = grid[grid['reservations'] > 0].reset_index(drop=True)
+    
+    municipality_tax = np.bincount(municipality_index[taxed], weights=tax[taxed], minlength=len(municipalities))
+    by_municipality = [
+        {
+            'municipality': name,
+            'rate': float(rates[i]),
+            'max_nights': int(caps[i]),
+            'tax': round(float(municipality_tax[i]), 2)
+        }
+        for i, name in enumerate(municipalities)
+    ]
+    
+    return {
+        'summary': {
+            'total_tax': round(float(tax.sum()), 2),
+            'taxable_person_nights': int(taxable_person_nights.sum()),
+            'exempt_person_nights': int(exempt_person_nights.sum()),
+            'taxed_reservations': int((tax > 0).sum()),
+            'total_reservations': len(df)
+        },
+        'by_property_month': by_property_month.to_dict(orient='records'),
+        'by_municipality': by_municipality
+    }
@@ -0,0 +1,111 @@
+"""
+Worker Pool
+===========
+Process pools for CPU-bound work started from request threads.
+
+Requests are handled on gunicorn threads, uploads are parsed on background
+threads and the import warm-up runs on its own thread, so pools never use
+the ``fork`` start method: a fork copies locks held by other threads in
+their locked state, which can deadlock the child. ``forkserver`` is used
+where available, with pandas preloaded in the server so new workers start
+without importing it again; ``spawn`` elsewhere.
+
+``shared_pool`` keeps one long-lived pool per size for per-run report work
+and multi-sheet parses, so requests do not pay for starting processes. ``frame_files`` hands
+DataFrames to those workers as Arrow IPC files in shared memory, which the
+workers memory-map instead of unpickling their own copies.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, Union
+
+from services.dataset_store import ARROW_AVAILABLE, read_frame, write_frame
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Imported once in the fork server, inherited by every worker it starts
+PRELOAD_MODULES = ['numpy', 'pandas']
+# tmpfs on Linux; frame files there never touch the disk
+SHARED_MEMORY_DIR = '/dev/shm'
+
+# A DataFrame handed to a worker: Arrow IPC file path, or the frame itself
+FrameHandle = Union[str, 'pd.DataFrame']
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def pool_context():
+    """Multiprocessing context for pools started by threaded processes."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Ignored once the server is running
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def shared_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Long-lived pool of ``max_workers`` processes, started on first use.
+    
+    Shared by every run in this process; tasks of concurrent runs are
+    queued on the same workers.
+    """
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            pool = _pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers, mp_context=pool_context())
+        return pool
+
+
+def discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken shared pool, so the next ``shared_pool`` call starts a new one."""
+    with _pools_lock:
+        for size, existing in list(_pools.items()):
+            if existing is pool:
+                del _pools[size]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def frame_files(frames: Dict[str, 'pd.DataFrame']) -> Iterator[Dict[str, FrameHandle]]:
+    """
+    Write DataFrames as Arrow IPC files for pool workers to read.
+    
+    The files are removed on exit; workers still reading one keep their
+    mapping. Frames Arrow cannot represent, or every frame without pyarrow,
+    are handed over as they are and pickled to the worker.
+    
+    Yields:
+        Name -> handle for ``load_frame``
+    """
+    if not ARROW_AVAILABLE:
+        yield dict(frames)
+        return
+    
+    directory = tempfile.mkdtemp(
+        prefix='talkguest-frames-',
+        dir=SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+    )
+    try:
+        handles = {}
+        for name, frame in frames.items():
+            file_name = write_frame(frame, directory)
+            handles[name] = os.path.join(directory, file_name) if file_name else frame
+        yield handles
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_frame(handle: FrameHandle) -> 'pd.DataFrame':
+    """DataFrame for a handle from ``frame_files``, memory-mapped where it is a file."""
+    return read_frame(handle) if isinstance(handle, str) else handle
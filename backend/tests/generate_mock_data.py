@@ -39,6 +39,9 @@ RESERVATION_COLUMNS = {
         'adults': 'Adultos',
         'children_no_tmt': 'Crianças não sujeitas TMT',
         'children_tmt': 'Crianças sujeitas TMT',
+        'booked_at': 'Reservado em',
+        'canceled_at': 'Cancelado em',
+        'cleaning_fee': 'Taxa de Limpeza',
     },
     'en': {
         'reservation_id': 'Reservation',
@@ -54,6 +57,9 @@ RESERVATION_COLUMNS = {
         'adults': 'Adults',
         'children_no_tmt': 'Children not subject to TMT',
         'children_tmt': 'Children subject to TMT',
+        'booked_at': 'Booked at',
+        'canceled_at': 'Canceled At',
+        'cleaning_fee': 'Cleaning Fee',
     }
 }
 
@@ -183,6 +189,9 @@ class MockDataGenerator:
             adults = random.choices([1, 2, 3, 4], weights=[0.2, 0.5, 0.2, 0.1])[0]
             children_no_tmt = random.choices([0, 1, 2], weights=[0.7, 0.2, 0.1])[0]
             children_tmt = random.choices([0, 1, 2], weights=[0.8, 0.15, 0.05])[0]
+            status = random.choices(['Confirmada', 'Check-in', 'Check-out', 'Cancelada'], weights=[0.7, 0.1, 0.15, 0.05])[0]
+            booked_at = checkin - timedelta(days=random.randint(0, 180))
+            canceled_at = booked_at + (checkin - booked_at) / 2 if status == 'Cancelada' else None
             
             reservation = {
                 cols['reservation_id']: f"RES{random.randint(100000, 999999)}",
@@ -194,10 +203,13 @@ class MockDataGenerator:
                 cols['reservation_value']: total_value,
                 cols['channel']: channel,
                 cols['channel_commission']: commission,
-                cols['status']: random.choices(['Confirmada', 'Check-in', 'Check-out', 'Cancelada'], weights=[0.7, 0.1, 0.15, 0.05])[0],
+                cols['status']: status,
                 cols['adults']: adults,
                 cols['children_no_tmt']: children_no_tmt,
                 cols['children_tmt']: children_tmt,
+                cols['booked_at']: booked_at,
+                cols['canceled_at']: canceled_at,
+                cols['cleaning_fee']: random.choice([0, 25, 40, 60]),
             }
             reservations.append(reservation)
         
@@ -217,6 +229,9 @@ class MockDataGenerator:
                 cols['adults']: 2,
                 cols['children_no_tmt']: 0,
                 cols['children_tmt']: 0,
+                cols['booked_at']: datetime(2024, 12, 20),
+                cols['canceled_at']: datetime(2025, 1, 2),
+                cols['cleaning_fee']: 0,
             }
         ]
         reservations.extend(zero_value_reservations)
@@ -294,11 +309,18 @@ class MockDataGenerator:
         rate = commission_rates.get(channel, 0.10)
         return round(total_value * rate, 2)
     
-    def generate_all_data(self) -> dict:
-        """Generate all mock data as DataFrames."""
-        guests_df = self.generate_guests_data()
-        reservations_df = self.generate_reservations_data(guests_df)
-        invoices_df = self.generate_invoices_data(reservations_df)
+    def generate_all_data(self, num_guests: int = 50, num_reservations: int = 100, num_invoices: int = 80) -> dict:
+        """
+        Generate all mock data as DataFrames.
+        
+        Args:
+            num_guests: Guests to generate (test entries are added on top)
+            num_reservations: Reservations to generate
+            num_invoices: Maximum invoices, one per confirmed reservation
+        """
+        guests_df = self.generate_guests_data(num_guests)
+        reservations_df = self.generate_reservations_data(guests_df, num_reservations)
+        invoices_df = self.generate_invoices_data(reservations_df, num_invoices)
         
         return {
             'guests': guests_df,
@@ -6,18 +6,40 @@ Tests for the Flask API routers.
 """
 
 import unittest
+import tempfile
+import shutil
+import threading
+import zipfile
+import hashlib
 import json
 import io
 import sys
 import os
+import pandas as pd
 
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from unittest import mock
+
 from app import create_app
+from routers import batch
+from services.chunked_upload import ChunkedUploadStore
+from services.etl_service import DEFAULT_CONFIG
+from services.excel_reader import get_dataframe
 from tests.generate_mock_data import MockDataGenerator
 
 
+_run_dataset = batch._run_dataset
+
+
+def _run_dataset_or_crash(name, *args):
+    """Batch worker that crashes for the dataset named 'broken'."""
+    if name == 'broken':
+        raise RuntimeError('worker crashed')
+    return _run_dataset(name, *args)
+
+
 class TestAPIBase(unittest.TestCase):
     """Base test class for API tests."""
     
@@ -55,6 +77,36 @@ class TestHealthEndpoint(TestAPIBase):
         data = json.loads(response.data)
         self.assertEqual(data['status'], 'healthy')
         self.assertEqual(data['service'], 'talkguest-api')
+    
+    def test_readiness(self):
+        """Test readiness turns 503 once every heavy-work slot is taken."""
+        controller = self.app.extensions['load_controller']
+        
+        response = self.client.get('/api/health/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['max_heavy'], 3)
+        
+        for _ in range(controller.max_heavy):
+            controller.try_acquire()
+        response = self.client.get('/api/health/ready')
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('all workers busy', json.loads(response.data)['reasons'])
+        self.assertEqual(self.client.get('/api/health/live').status_code, 200)
+    
+    def test_heavy_requests_shed_when_saturated(self):
+        """Test process and download return 503 with Retry-After when saturated."""
+        controller = self.app.extensions['load_controller']
+        for _ in range(controller.max_heavy):
+            controller.try_acquire()
+        
+        for response in (self.client.post('/api/process'), self.client.get('/api/download/occupancy')):
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '10')
+        
+        controller.release()
+        self.assertEqual(self.client.post('/api/process').status_code, 400)
+        self.assertEqual(controller.heavy_in_flight, controller.max_heavy - 1)
 
 
 class TestUploadEndpoints(TestAPIBase):
@@ -220,8 +272,261 @@ class TestUploadEndpoints(TestAPIBase):
         self.assertFalse(data['success'])
         self.assertEqual(data['error'], 'FILE_SWAP_RESERVATIONS_HAS_GUESTS')
         self.assertEqual(data['error_type'], 'file_swap')
+    
+    
+    def test_upload_preview_and_background_parse(self):
+        """Test upload answers from a preview and parses the full file in the background."""
+        excel_file = self._create_excel_file(self.mock_data['reservations'])
+        
+        response = self.client.post(
+            '/api/upload/reservations',
+            data={'file': (excel_file, 'reservations.xlsx')},
+            content_type='multipart/form-data'
+        )
+        
+        data = json.loads(response.data)
+        self.assertEqual(data['row_count'], len(self.mock_data['reservations']))
+        self.assertEqual(data['columns'], self.mock_data['reservations'].columns.tolist())
+        self.assertEqual(len(data['preview']), 5)
+        
+        entry = self.app.config['DATA_STORAGE']['reservations']
+        df = get_dataframe(entry)
+        self.assertEqual(len(df), len(self.mock_data['reservations']))
+        self.assertNotIn('dataframe_future', entry)
+    
+    def test_file_swap_rejected_before_parse(self):
+        """Test a swapped file is rejected without storing or parsing it."""
+        res_file = self._create_excel_file(self.mock_data['reservations'])
+        
+        self.client.post(
+            '/api/upload/guests',
+            data={'file': (res_file, 'guests.xlsx')},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertNotIn('guests', self.app.config['DATA_STORAGE'])
+    
+    def test_upload_multiple_reservation_files(self):
+        """Test several reservation exports are merged and deduplicated."""
+        reservations = self.mock_data['reservations']
+        first = self._create_excel_file(reservations.iloc[:60])
+        second = self._create_excel_file(reservations.iloc[50:])
+        
+        response = self.client.post(
+            '/api/upload/reservations',
+            data={'file': [(first, 'jan.xlsx'), (second, 'feb.xlsx')]},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['files'], ['jan.xlsx', 'feb.xlsx'])
+        
+        df = get_dataframe(self.app.config['DATA_STORAGE']['reservations'])
+        expected = reservations.drop_duplicates(subset=['Hóspede', 'Checkin', 'Checkout', 'Alojamento'])
+        self.assertEqual(len(df), len(expected))
+    
+    def test_upload_reservations_zip_mixed_languages(self):
+        """Test a zip mixing Portuguese and English exports is rejected."""
+        english = MockDataGenerator(seed=1, language='en').generate_all_data()['reservations']
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('pt.xlsx', self._create_excel_file(self.mock_data['reservations']).getvalue())
+            zf.writestr('en.xlsx', self._create_excel_file(english).getvalue())
+        archive.seek(0)
+        
+        response = self.client.post(
+            '/api/upload/reservations',
+            data={'file': (archive, 'exports.zip')},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('reservations', self.app.config['DATA_STORAGE'])
+    
+    def test_upload_zip_too_large_once_extracted(self):
+        """Test a zip over the extracted size limit is rejected before any member is read."""
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('jan.xlsx', self._create_excel_file(self.mock_data['reservations']).getvalue())
+            zf.writestr('padding.xlsx', b'\0' * (4 * 1024 * 1024))
+        archive.seek(0)
+        self.app.config['UPLOAD_MAX_UNCOMPRESSED_SIZE'] = 1024 * 1024
+        
+        with mock.patch.object(zipfile.ZipFile, 'read', side_effect=AssertionError('member read')):
+            response = self.client.post(
+                '/api/upload/reservations',
+                data={'file': (archive, 'exports.zip')},
+                content_type='multipart/form-data'
+            )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('too large', json.loads(response.data)['error'])
+    
+    def _create_workbook(self, sheets):
+        """Create an in-memory Excel file with one sheet per DataFrame."""
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, sheet_name=name, index=False)
+        output.seek(0)
+        return output
+    
+    def test_upload_multi_sheet_workbook(self):
+        """Test sheets are classified, routed to their slots and monthly sheets merged."""
+        reservations = self.mock_data['reservations']
+        workbook = self._create_workbook({
+            'Guests': self.mock_data['guests'],
+            'Jan': reservations.iloc[:60],
+            'Feb': reservations.iloc[60:],
+            'Notes': pd.DataFrame({'Note': ['exported from PMS']})
+        })
+        
+        response = self.client.post(
+            '/api/upload/reservations',
+            data={'file': (workbook, 'export.xlsx')},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['sheets'], {'guests': ['Guests'], 'reservations': ['Jan', 'Feb']})
+        self.assertEqual(data['ignored_sheets'], ['Notes'])
+        self.assertEqual(data['row_count'], len(reservations))
+        
+        storage = self.app.config['DATA_STORAGE']
+        expected = reservations.drop_duplicates(subset=['Hóspede', 'Checkin', 'Checkout', 'Alojamento'])
+        # The stored workbook bytes restore the same sheets; they are dropped once parsed
+        restored = {'filename': 'export.xlsx', **{k: storage['reservations'][k] for k in ('data', 'sheets', 'subset', 'engine')}}
+        self.assertEqual(len(get_dataframe(storage['reservations'])), len(expected))
+        self.assertEqual(len(get_dataframe(storage['guests'])), len(self.mock_data['guests']))
+        self.assertNotIn('data', storage['reservations'])
+        self.assertEqual(len(get_dataframe(restored)), len(expected))
+    
+    def test_multi_sheet_workbook_without_requested_type(self):
+        """Test a multi-sheet workbook lacking the requested type stores nothing."""
+        workbook = self._create_workbook({
+            'Guests': self.mock_data['guests'],
+            'Reservations': self.mock_data['reservations']
+        })
+        
+        response = self.client.post(
+            '/api/upload/invoices',
+            data={'file': (workbook, 'export.xlsx')},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error_type'], 'missing_sheet')
+        self.assertNotIn('guests', self.app.config['DATA_STORAGE'])
+    
+    def test_upload_multiple_guests_files_rejected(self):
+        """Test guests uploads stay single-file."""
+        guests = self._create_excel_file(self.mock_data['guests'])
+        
+        response = self.client.post(
+            '/api/upload/guests',
+            data={'file': [(guests, 'a.xlsx'), (self._create_excel_file(self.mock_data['guests']), 'b.xlsx')]},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 400)
 
 
+class TestChunkedUploadEndpoints(TestAPIBase):
+    """Test resumable chunked upload endpoints."""
+    
+    def _start_session(self, content, file_type='reservations'):
+        """Open a chunked upload session for ``content``."""
+        response = self.client.post(f'/api/upload/{file_type}/sessions', json={
+            'filename': f'{file_type}.xlsx',
+            'size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest()
+        })
+        self.assertEqual(response.status_code, 201)
+        return json.loads(response.data)['upload_id']
+    
+    def test_chunked_upload_resume_and_finalize(self):
+        """Test chunks are appended in order, resumed from status and finalized."""
+        content = self._create_excel_file(self.mock_data['reservations']).getvalue()
+        upload_id = self._start_session(content)
+        half = len(content) // 2
+        
+        response = self.client.put(f'/api/upload/sessions/{upload_id}?offset=0', data=content[:half])
+        self.assertEqual(json.loads(response.data)['received'], half)
+        
+        # A retried chunk at a stale offset is refused
+        response = self.client.put(f'/api/upload/sessions/{upload_id}?offset=0', data=content[:half])
+        self.assertEqual(response.status_code, 409)
+        
+        received = json.loads(self.client.get(f'/api/upload/sessions/{upload_id}').data)['received']
+        self.client.put(
+            f'/api/upload/sessions/{upload_id}?offset={received}',
+            data=content[received:],
+            headers={'X-Chunk-SHA256': hashlib.sha256(content[received:]).hexdigest()}
+        )
+        
+        response = self.client.post(f'/api/upload/sessions/{upload_id}/finalize')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['row_count'], len(self.mock_data['reservations']))
+        df = get_dataframe(self.app.config['DATA_STORAGE']['reservations'])
+        self.assertEqual(len(df), len(self.mock_data['reservations']))
+    
+    def test_chunk_checksum_mismatch(self):
+        """Test a corrupted chunk is rejected and not kept."""
+        content = self._create_excel_file(self.mock_data['guests']).getvalue()
+        upload_id = self._start_session(content, 'guests')
+        
+        response = self.client.put(
+            f'/api/upload/sessions/{upload_id}?offset=0',
+            data=content,
+            headers={'X-Chunk-SHA256': '0' * 64}
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        status = json.loads(self.client.get(f'/api/upload/sessions/{upload_id}').data)
+        self.assertEqual(status['received'], 0)
+        self.client.delete(f'/api/upload/sessions/{upload_id}')
+    
+    def test_stalled_chunk_does_not_block_other_sessions(self):
+        """Test a chunk stuck reading its body leaves other sessions free to append."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store = ChunkedUploadStore(directory, max_size=1024)
+        stalled = store.create('guests', 'a.xlsx', 10)['upload_id']
+        other = store.create('guests', 'b.xlsx', 10)['upload_id']
+        release = threading.Event()
+        
+        class StalledStream:
+            def read(self, size):
+                release.wait(5)
+                return b''
+        
+        worker = threading.Thread(target=store.append, args=(stalled, 0, StalledStream()))
+        worker.start()
+        try:
+            finished = threading.Thread(target=store.append, args=(other, 0, io.BytesIO(b'0123456789')))
+            finished.start()
+            finished.join(2)
+            self.assertFalse(finished.is_alive())
+            self.assertEqual(store.status(other)['received'], 10)
+        finally:
+            release.set()
+            worker.join()
+    
+    def test_finalize_incomplete_upload(self):
+        """Test finalizing before all bytes arrived fails."""
+        content = self._create_excel_file(self.mock_data['guests']).getvalue()
+        upload_id = self._start_session(content, 'guests')
+        
+        response = self.client.post(f'/api/upload/sessions/{upload_id}/finalize')
+        
+        self.assertEqual(response.status_code, 409)
+        self.client.delete(f'/api/upload/sessions/{upload_id}')
+        self.assertEqual(self.client.get(f'/api/upload/sessions/{upload_id}').status_code, 404)
+
 class TestProcessEndpoints(TestAPIBase):
     """Test processing endpoints."""
     
@@ -365,13 +670,52 @@ class TestResultsEndpoints(TestAPIBase):
         self.assertTrue(data['success'])
         self.assertIn('reservations_summary', data['data'])
         self.assertIn('reservations_by_property', data['data'])
+    
+    def test_results_sections_computed_on_demand(self):
+        """Test only requested sections are built and returned."""
+        self._upload_and_process()
+        revenue = self.app.config['DATA_STORAGE']['results']['revenue']
+        self.assertFalse(revenue.is_built('reservations_summary'))
+        
+        response = self.client.get('/api/results?sections=summary,revenue.reservations_summary')
+        
+        data = json.loads(response.data)['data']
+        self.assertEqual(set(data), {'summary', 'revenue'})
+        self.assertEqual(set(data['revenue']), {'reservations_summary'})
+        self.assertTrue(revenue.is_built('reservations_summary'))
+        self.assertFalse(revenue.is_built('detailed_calculations'))
+    
+    def test_get_analytics_results(self):
+        """Test getting channel analytics results."""
+        self._upload_and_process()
+        
+        response = self.client.get('/api/results/analytics')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['success'])
+        self.assertIn('by_channel', data['data'])
+        self.assertIn('lead_time_histogram', data['data'])
+    
+    def test_get_pace_results(self):
+        """Test getting the booking pace report."""
+        self._upload_and_process()
+        
+        response = self.client.get('/api/results/pace')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['points'][-1], 0)
+        self.assertEqual(
+            {row['days_before_arrival'] for row in data['by_stay_month']}, set(data['points'])
+        )
 
 
 class TestDownloadEndpoints(TestAPIBase):
     """Test download endpoints."""
     
-    def _upload_and_process(self):
-        """Helper to upload files and process."""
+    def _upload_and_process(self, config=None):
+        """Helper to upload files and process, with an optional run config."""
         guests_file = self._create_excel_file(self.mock_data['guests'])
         self.client.post(
             '/api/upload/guests',
@@ -386,7 +730,7 @@ class TestDownloadEndpoints(TestAPIBase):
             content_type='multipart/form-data'
         )
         
-        self.client.post('/api/process')
+        self.client.post('/api/process', json={'config': config} if config else None)
     
     def test_download_occupancy(self):
         """Test downloading occupancy report."""
@@ -401,7 +745,7 @@ class TestDownloadEndpoints(TestAPIBase):
         )
     
     def test_download_revenue(self):
-        """Test downloading revenue report."""
+        """Test downloading revenue report, with a tourist tax sheet only when enabled."""
         self._upload_and_process()
         
         response = self.client.get('/api/download/revenue')
@@ -411,6 +755,11 @@ class TestDownloadEndpoints(TestAPIBase):
             response.content_type,
             'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
+        self.assertNotIn('Tourist Tax', pd.ExcelFile(io.BytesIO(response.data)).sheet_names)
+        
+        self._upload_and_process(config={**DEFAULT_CONFIG, 'tourist_tax': {'enabled': True}})
+        response = self.client.get('/api/download/revenue')
+        self.assertIn('Tourist Tax', pd.ExcelFile(io.BytesIO(response.data)).sheet_names)
     
     def test_download_all(self):
         """Test downloading all reports."""
@@ -424,6 +773,28 @@ class TestDownloadEndpoints(TestAPIBase):
             'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
     
+    def test_download_analytics(self):
+        """Test downloading channel analytics."""
+        self._upload_and_process()
+        
+        response = self.client.get('/api/download/analytics')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content_type,
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    def test_download_pace(self):
+        """Test downloading the booking pace report."""
+        self._upload_and_process()
+        
+        response = self.client.get('/api/download/pace')
+        
+        self.assertEqual(response.status_code, 200)
+        pace = pd.read_excel(io.BytesIO(response.data), sheet_name='Booking Pace')
+        self.assertIn('Room Nights vs LY', pace.columns)
+    
     def test_download_without_processing(self):
         """Test download before processing."""
         response = self.client.get('/api/download/occupancy')
@@ -431,5 +802,109 @@ class TestDownloadEndpoints(TestAPIBase):
         self.assertEqual(response.status_code, 404)
 
 
+
+class TestBatchEndpoints(TestAPIBase):
+    """Test multi-dataset batch endpoints."""
+    
+    def _create_archive(self, datasets):
+        """Create an in-memory zip with one folder per dataset."""
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            for dataset in datasets:
+                for file_type in ['guests', 'reservations', 'invoices']:
+                    zf.writestr(
+                        f'{dataset}/{file_type}.xlsx',
+                        self._create_excel_file(self.mock_data[file_type]).getvalue()
+                    )
+            zf.writestr(f'{datasets[0]}/config.json', json.dumps({
+                'iva_rates': {'azores': 0.16, 'fuzeta': 0.23},
+                'property_groups': {}
+            }))
+        output.seek(0)
+        return output
+    
+    def test_batch_archive(self):
+        """Test processing several datasets from one archive."""
+        response = self.client.post(
+            '/api/batch',
+            data={'archive': (self._create_archive(['client_a', 'client_b']), 'batch.zip')},
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['success'])
+        self.assertEqual([entry['dataset'] for entry in data['datasets']], ['client_a', 'client_b'])
+        
+        results = json.loads(self.client.get('/api/batch/results').data)['data']
+        iva_a = results['client_a']['revenue']['reservations_summary']['total_iva']
+        iva_b = results['client_b']['revenue']['reservations_summary']['total_iva']
+        self.assertGreater(iva_a, iva_b)
+    
+    def test_batch_fields_missing_reservations(self):
+        """Test per-dataset errors are reported without failing the batch."""
+        response = self.client.post(
+            '/api/batch',
+            data={
+                'ok/guests': (self._create_excel_file(self.mock_data['guests']), 'g.xlsx'),
+                'ok/reservations': (self._create_excel_file(self.mock_data['reservations']), 'r.xlsx'),
+                'broken/guests': (self._create_excel_file(self.mock_data['guests']), 'g.xlsx'),
+            },
+            content_type='multipart/form-data'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertFalse(data['success'])
+        by_name = {entry['dataset']: entry for entry in data['datasets']}
+        self.assertTrue(by_name['ok']['success'])
+        self.assertFalse(by_name['broken']['success'])
+    
+    def test_batch_stream_reports_crashed_dataset(self):
+        """Test a crashing dataset gets its own stream line and the others are still stored."""
+        with mock.patch.object(batch, '_run_dataset', _run_dataset_or_crash):
+            response = self.client.post(
+                '/api/batch?stream=true',
+                data={
+                    'ok/guests': (self._create_excel_file(self.mock_data['guests']), 'g.xlsx'),
+                    'ok/reservations': (self._create_excel_file(self.mock_data['reservations']), 'r.xlsx'),
+                    'broken/guests': (self._create_excel_file(self.mock_data['guests']), 'g.xlsx'),
+                },
+                content_type='multipart/form-data'
+            )
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        
+        by_name = {entry['dataset']: entry for entry in lines}
+        self.assertEqual(set(by_name), {'ok', 'broken'})
+        self.assertTrue(by_name['ok']['success'])
+        self.assertFalse(by_name['broken']['success'])
+        self.assertIn('worker crashed', by_name['broken']['errors'][0])
+        
+        results = json.loads(self.client.get('/api/batch/results').data)['data']
+        self.assertTrue(results['ok']['success'])
+        self.assertFalse(results['broken']['success'])
+    
+    def test_download_batch(self):
+        """Test downloading the combined batch workbook."""
+        self.client.post(
+            '/api/batch',
+            data={'archive': (self._create_archive(['client_a', 'client_b']), 'batch.zip')},
+            content_type='multipart/form-data'
+        )
+        
+        response = self.client.get('/api/download/batch')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content_type,
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    def test_batch_without_datasets(self):
+        """Test batch request with no datasets."""
+        response = self.client.post('/api/batch', data={}, content_type='multipart/form-data')
+        
+        self.assertEqual(response.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
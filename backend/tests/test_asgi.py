@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the ASGI Bridge
+==============================
+Tests for serving the Flask app from an event loop.
+"""
+
+import unittest
+import asyncio
+import json
+import io
+import sys
+import os
+from werkzeug.test import EnvironBuilder
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from asgi import AsyncWSGIBridge
+from tests.generate_mock_data import MockDataGenerator
+
+
+def _scope(method, path, headers=(), query_string=b''):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(name.encode(), value.encode()) for name, value in headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 50000)
+    }
+
+
+async def _request(bridge, scope, body_chunks=(b'',), delay=0.0):
+    """Send a request in pieces and collect the response messages."""
+    pieces = list(body_chunks)
+    messages = []
+    
+    async def receive():
+        if delay:
+            await asyncio.sleep(delay)
+        chunk = pieces.pop(0)
+        return {'type': 'http.request', 'body': chunk, 'more_body': bool(pieces)}
+    
+    async def send(message):
+        messages.append(message)
+    
+    await bridge(scope, receive, send)
+    status = messages[0]['status']
+    headers = {name.decode(): value.decode() for name, value in messages[0]['headers']}
+    return status, headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+
+class TestAsyncWSGIBridge(unittest.TestCase):
+    """Test cases for the ASGI bridge."""
+    
+    def setUp(self):
+        self.app = create_app({'TESTING': True})
+        self.bridge = AsyncWSGIBridge(self.app, threads=1, max_body_size=self.app.config['MAX_CONTENT_LENGTH'])
+    
+    def tearDown(self):
+        self.bridge.executor.shutdown()
+    
+    def test_json_endpoint(self):
+        """Test JSON responses match the WSGI app."""
+        status, headers, body = asyncio.run(_request(self.bridge, _scope('GET', '/api/upload/status')))
+        expected = self.app.test_client().get('/api/upload/status')
+        
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-type'], 'application/json')
+        self.assertEqual(json.loads(body), expected.get_json())
+    
+    def test_slow_upload_does_not_hold_thread(self):
+        """Test a trickling upload leaves the only thread free for other requests."""
+        buffer = io.BytesIO()
+        MockDataGenerator(seed=42).generate_guests_data(20).to_excel(buffer, index=False)
+        buffer.seek(0)
+        environ = EnvironBuilder(method='POST', data={'file': (buffer, 'guests.xlsx')}).get_environ()
+        data = environ['wsgi.input'].read()
+        upload_scope = _scope('POST', '/api/upload/guests', [
+            ('content-type', environ['CONTENT_TYPE']),
+            ('content-length', str(len(data)))
+        ])
+        pieces = [data[i:i + 1024] for i in range(0, len(data), 1024)]
+        
+        async def scenario():
+            upload = asyncio.ensure_future(_request(self.bridge, upload_scope, pieces, delay=0.01))
+            await asyncio.sleep(0.05)
+            health = await _request(self.bridge, _scope('GET', '/api/health/live'))
+            return health, upload.done(), await upload
+        
+        (health_status, _, _), upload_done, (status, _, body) = asyncio.run(scenario())
+        
+        self.assertEqual(health_status, 200)
+        self.assertFalse(upload_done)
+        self.assertEqual(status, 200, body)
+        self.assertIn('guests', self.app.config['DATA_STORAGE'])
+    
+    def test_body_too_large(self):
+        """Test bodies above the limit are rejected before reaching a thread."""
+        bridge = AsyncWSGIBridge(self.app, threads=1, max_body_size=10)
+        status, _, body = asyncio.run(_request(bridge, _scope('POST', '/api/process'), [b'x' * 8, b'x' * 8]))
+        bridge.executor.shutdown()
+        
+        self.assertEqual(status, 413)
+        self.assertFalse(json.loads(body)['success'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Pipeline Cancellation
+====================================
+Tests for cancellation tokens, pipeline checkpoints and DELETE /api/process.
+"""
+
+import unittest
+import json
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from services.cancellation import CancellationToken, PipelineCancelled
+from services.etl_service import ETLService
+from tests.generate_mock_data import MockDataGenerator
+
+
+class TestCancellationToken(unittest.TestCase):
+    """Test cases for the cancellation token and time budget."""
+    
+    def test_cancel_and_time_limit(self):
+        """Test check raises once cancelled or once the wall-time budget is spent."""
+        token = CancellationToken()
+        token.check()
+        token.cancel('wrong file')
+        with self.assertRaises(PipelineCancelled) as raised:
+            token.check()
+        self.assertEqual(raised.exception.reason, 'wrong file')
+        self.assertFalse(raised.exception.timed_out)
+        
+        token = CancellationToken(wall_time_limit=0.01)
+        time.sleep(0.02)
+        with self.assertRaises(PipelineCancelled) as raised:
+            token.check()
+        self.assertTrue(raised.exception.timed_out)
+
+
+class TestPipelineCancellation(unittest.TestCase):
+    """Test cases for checkpoints inside the ETL pipeline."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.data = MockDataGenerator(seed=42).generate_all_data()
+    
+    def test_cancel_mid_run_discards_state(self):
+        """Test a run cancelled between stages stops and drops its frames."""
+        checks = []
+        
+        def cancel_after_three():
+            checks.append(1)
+            return len(checks) >= 3
+        
+        token = CancellationToken(external_check=cancel_after_three, poll_interval=0)
+        etl = ETLService(cancel_token=token)
+        result = etl.run_pipeline(self.data['guests'], self.data['reservations'], self.data['invoices'])
+        
+        self.assertFalse(result['success'])
+        self.assertTrue(result['cancelled'])
+        self.assertFalse(result['timed_out'])
+        self.assertEqual(len(checks), 3)
+        self.assertIsNone(etl.reservations_df)
+        self.assertIsNone(etl.combined_df)
+        self.assertEqual(etl._memo, {})
+    
+    def test_completed_run_detaches_token(self):
+        """Test lazy sections computed after the run are not affected by its budget."""
+        token = CancellationToken(wall_time_limit=60)
+        etl = ETLService(cancel_token=token)
+        result = etl.run_pipeline(self.data['guests'], self.data['reservations'], lazy=True)
+        
+        self.assertTrue(result['success'])
+        token.cancel()
+        self.assertIn('by_property', dict(result['occupancy']))
+
+
+class TestCancelEndpoint(unittest.TestCase):
+    """Test cases for cancelling and time-limiting /api/process."""
+    
+    def setUp(self):
+        self.app = create_app({'TESTING': True})
+        self.client = self.app.test_client()
+        self.storage = self.app.config['DATA_STORAGE']
+        self.storage.clear()
+    
+    def test_cancel_without_run(self):
+        """Test DELETE returns 404 when nothing is running."""
+        response = self.client.delete('/api/process')
+        
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(json.loads(response.data)['success'])
+    
+    def test_cancel_local_and_remote_runs(self):
+        """Test DELETE cancels runs on this worker and flags runs on other workers."""
+        token = CancellationToken()
+        with self.app.extensions['pipeline_runs'].track(token):
+            self.storage['active_run'] = {'run_id': token.run_id, 'started_at': token.started_at}
+            self.assertEqual(json.loads(self.client.get('/api/process/status').data)['status'], 'running')
+            
+            response = self.client.delete('/api/process')
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)['run_ids'], [token.run_id])
+        self.assertTrue(token.cancelled)
+        self.assertNotIn('cancel_requested', self.storage)
+        
+        self.storage['active_run'] = {'run_id': 'other-worker', 'started_at': time.time()}
+        response = self.client.delete('/api/process')
+        
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.storage['cancel_requested'], 'other-worker')
+    
+    def test_time_limit_discards_results(self):
+        """Test a run over its time budget answers 422 and stores nothing."""
+        data = MockDataGenerator(seed=42).generate_all_data()
+        self.storage['guests'] = {'dataframe': data['guests']}
+        self.storage['reservations'] = {'dataframe': data['reservations']}
+        self.app.config['PIPELINE_TIME_LIMIT'] = 1e-9
+        
+        response = self.client.post('/api/process')
+        
+        self.assertEqual(response.status_code, 422)
+        body = json.loads(response.data)
+        self.assertTrue(body['cancelled'])
+        self.assertTrue(body['timed_out'])
+        self.assertNotIn('results', self.storage)
+        self.assertNotIn('active_run', self.storage)
+        self.assertEqual(json.loads(self.client.get('/api/process/status').data)['status'], 'not_started')
+
+
+if __name__ == '__main__':
+    unittest.main()
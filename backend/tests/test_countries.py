@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Country Normalization
+====================================
+Tests for resolving free-text countries to ISO codes.
+"""
+
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.countries import resolve_country, country_codes, country_name, UNKNOWN_CODE
+from services.etl_service import ETLService
+from tests.generate_mock_data import MockDataGenerator
+
+
+class TestCountryResolution(unittest.TestCase):
+    """Test cases for country lookups."""
+    
+    def test_spelling_variants(self):
+        """Test codes, names, demonyms and other languages resolve to one code."""
+        for value in ['Portugal', 'PT', 'portugal ', 'Portuguesa', 'PRT', 'Português']:
+            self.assertEqual(resolve_country(value), 'PT', value)
+        for value in ['Germany', 'Alemanha', 'Deutschland', 'Allemagne', 'Alemania']:
+            self.assertEqual(resolve_country(value), 'DE', value)
+        self.assertEqual(resolve_country('Reino  Unido'), 'GB')
+        self.assertIsNone(resolve_country('Atlantis'))
+    
+    def test_full_iso_list(self):
+        """Test any ISO 3166-1 country resolves by code or English name, with alias display names kept."""
+        for value in ['SG', 'SGP', 'Singapore', 'Republic of Singapore']:
+            self.assertEqual(resolve_country(value), 'SG', value)
+        self.assertEqual(resolve_country('Viet Nam'), 'VN')
+        self.assertEqual(resolve_country('Korea, Republic of'), 'KR')
+        self.assertEqual(country_name('SG'), 'Singapore')
+        self.assertEqual(country_name('RU'), 'Russia')
+    
+    def test_country_codes_categorical(self):
+        """Test missing values group as unknown and unresolved values pass through."""
+        codes, unresolved = country_codes(pd.Series(['Portugal', 'PT', None, 'Espanha', 'Atlantis', np.nan]))
+        
+        self.assertIsInstance(codes, pd.Categorical)
+        self.assertEqual(list(codes), ['PT', 'PT', UNKNOWN_CODE, 'ES', 'Atlantis', UNKNOWN_CODE])
+        self.assertEqual(unresolved, ['Atlantis'])
+    
+    def test_placeholders_unknown(self):
+        """Test placeholders for a missing country are unknown, not the country sharing their code."""
+        codes, unresolved = country_codes(pd.Series(['NA', 'N/A', 'n.a.', '-', 'Namibia', 'NAM']))
+        
+        self.assertEqual(list(codes), [UNKNOWN_CODE] * 4 + ['NA', 'NA'])
+        self.assertEqual(unresolved, [])
+
+
+class TestNationalityTables(unittest.TestCase):
+    """Test nationality tables use normalized countries."""
+    
+    def test_variants_merge_into_one_row(self):
+        """Test spelling variants and missing countries in occupancy tables."""
+        data = MockDataGenerator(seed=42).generate_all_data()
+        guests = data['guests'].copy()
+        portuguese = guests['Pais'] == 'Portugal'
+        variants = np.resize(['Portugal', 'PT', 'portugal ', 'Portuguesa'], portuguese.sum())
+        guests.loc[portuguese, 'Pais'] = variants
+        guests.loc[guests.index[:5], 'Pais'] = None
+        
+        result = ETLService().run_pipeline(guests, data['reservations'])
+        
+        nationalities = set()
+        for table in result['occupancy']['by_property'].values():
+            nationalities.update(row['nationality'] for row in table)
+        self.assertIn('Portugal', nationalities)
+        self.assertFalse({'PT', 'portugal ', 'Portuguesa'} & nationalities)
+        self.assertIn('Unknown', nationalities)
+
+
+if __name__ == '__main__':
+    unittest.main()
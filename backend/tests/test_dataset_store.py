@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for the Persistent Dataset Store
+===========================================
+Tests that uploads and results survive an application restart.
+"""
+
+import unittest
+import tempfile
+import shutil
+import json
+import io
+import sys
+import os
+import threading
+from concurrent.futures import Future
+from unittest import mock
+
+import pandas as pd
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from services import excel_reader
+from services.dataset_store import PersistentStorage, ARROW_AVAILABLE
+from services.excel_reader import get_dataframe
+from services.lazy_report import LazyReport
+from tests.generate_mock_data import MockDataGenerator
+
+
+BUILDS = []
+
+
+def _general_stats():
+    """Report section builder counting its calls."""
+    BUILDS.append(1)
+    return {'total_guests': 3}
+
+
+class TestPersistentStorage(unittest.TestCase):
+    """Test cases for PersistentStorage."""
+    
+    def setUp(self):
+        """Create a fresh database directory."""
+        self.data_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.data_dir, 'store.db')
+    
+    def tearDown(self):
+        """Remove the database directory."""
+        shutil.rmtree(self.data_dir)
+    
+    def test_values_survive_reopen(self):
+        """Test entries are written through and lazily loaded after reopening."""
+        storage = PersistentStorage(self.path)
+        storage['results'] = {'summary': {'guests_processed': 3}}
+        storage['processing_log'] = [{'level': 'info', 'message': 'done'}]
+        del storage['processing_log']
+        
+        reopened = PersistentStorage(self.path)
+        
+        self.assertIn('results', reopened)
+        self.assertNotIn('processing_log', reopened)
+        self.assertEqual(reopened['results']['summary']['guests_processed'], 3)
+        self.assertEqual(list(reopened), ['results'])
+    
+    def test_pending_parse_persisted_when_done(self):
+        """Test an upload entry is saved again with its DataFrame once parsed."""
+        storage = PersistentStorage(self.path)
+        future = Future()
+        storage['guests'] = {'filename': 'g.xlsx', 'data': b'raw', 'dataframe_future': future, 'row_count': 1}
+        
+        pending = PersistentStorage(self.path)['guests']
+        self.assertEqual(pending['data'], b'raw')
+        self.assertNotIn('dataframe_future', pending)
+        
+        future.set_result(pd.DataFrame({'Nome': ['Ana']}))
+        
+        done = PersistentStorage(self.path)['guests']
+        self.assertNotIn('data', done)
+        self.assertEqual(done['dataframe']['Nome'].tolist(), ['Ana'])
+    
+    def test_parse_in_other_worker_awaited(self):
+        """Test a worker waits for the parse running in another worker instead of failing or repeating it."""
+        worker_a = PersistentStorage(self.path)
+        worker_b = PersistentStorage(self.path)
+        future = Future()
+        worker_a['reservations'] = {
+            'filename': 'a.xlsx, b.xlsx', 'data': [b'not', b'workbooks'], 'sheets': [0, 0],
+            'dataframe_future': future, 'row_count': 1
+        }
+        timer = threading.Timer(0.3, future.set_result, [pd.DataFrame({'Noites': [2]})])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        
+        df = get_dataframe(worker_b['reservations'], reload=lambda: worker_b['reservations'])
+        
+        self.assertEqual(df['Noites'].tolist(), [2])
+    
+    def test_interrupted_parse_repeated(self):
+        """Test an upload whose parsing worker stopped is parsed from its stored workbooks."""
+        storage = PersistentStorage(self.path)
+        workbooks = []
+        for name in ('Ana', 'Rui'):
+            output = io.BytesIO()
+            pd.DataFrame({'Nome': [name]}).to_excel(output, index=False, engine='openpyxl')
+            workbooks.append(output.getvalue())
+        storage['guests'] = {
+            'filename': 'a.xlsx, b.xlsx', 'data': workbooks, 'sheets': [0, 0], 'engine': 'openpyxl',
+            'dataframe_future': Future(), 'row_count': 2
+        }
+        
+        restarted = PersistentStorage(self.path)
+        with mock.patch.object(excel_reader, 'PARSE_WAIT_TIMEOUT', 0):
+            df = get_dataframe(restarted['guests'], reload=lambda: restarted['guests'])
+        
+        self.assertEqual(df['Nome'].tolist(), ['Ana', 'Rui'])
+    
+    def test_failed_parse_reported_to_other_workers(self):
+        """Test other workers see the error of a parse that failed."""
+        storage = PersistentStorage(self.path)
+        future = Future()
+        storage['guests'] = {'filename': 'g.xlsx', 'data': b'raw', 'dataframe_future': future, 'row_count': 1}
+        future.set_exception(ValueError('File is not a zip file'))
+        
+        other = PersistentStorage(self.path)
+        with self.assertRaisesRegex(ValueError, 'not a zip file'):
+            get_dataframe(other['guests'], reload=lambda: other['guests'])
+    
+    def test_lazy_report_sections_shared(self):
+        """Test a lazy report is stored unbuilt and each section is built by one worker only."""
+        BUILDS.clear()
+        worker_a = PersistentStorage(self.path)
+        worker_a['results'] = {'occupancy': LazyReport({'general_stats': _general_stats}), 'summary': {'guests_processed': 3}}
+        self.assertEqual(BUILDS, [])
+        
+        worker_b = PersistentStorage(self.path)
+        self.assertEqual(worker_b['results']['occupancy']['general_stats'], {'total_guests': 3})
+        self.assertEqual(worker_a['results']['occupancy']['general_stats'], {'total_guests': 3})
+        self.assertEqual(PersistentStorage(self.path)['results']['occupancy']['general_stats'], {'total_guests': 3})
+        self.assertEqual(len(BUILDS), 1)
+        
+        # Sections of a replaced result are not served for the new one
+        worker_a['results'] = {'occupancy': LazyReport({'general_stats': _general_stats})}
+        worker_b['results']['occupancy']['general_stats']
+        self.assertEqual(len(BUILDS), 2)
+    
+    @unittest.skipUnless(ARROW_AVAILABLE, 'pyarrow not installed')
+    def test_frames_memory_mapped(self):
+        """Test DataFrames are stored as Arrow files and opened without copying."""
+        df = pd.DataFrame({'Noites': [1, 2, 3], 'Hóspede': ['Ana', 'Rui', None]})
+        storage = PersistentStorage(self.path)
+        storage['reservations'] = {'filename': 'r.xlsx', 'dataframe': df, 'row_count': 3}
+        
+        self.assertEqual(len(os.listdir(storage.frames_dir)), 1)
+        loaded = PersistentStorage(self.path)['reservations']['dataframe']
+        pd.testing.assert_frame_equal(loaded, df)
+        self.assertFalse(loaded['Noites'].to_numpy().flags.writeable)
+    
+    @unittest.skipUnless(ARROW_AVAILABLE, 'pyarrow not installed')
+    def test_replaced_frames_removed(self):
+        """Test frame files of replaced and deleted entries are removed."""
+        storage = PersistentStorage(self.path)
+        storage['guests'] = {'dataframe': pd.DataFrame({'Nome': ['Ana']})}
+        storage['guests'] = {'dataframe': pd.DataFrame({'Nome': ['Rui']})}
+        self.assertEqual(len(os.listdir(storage.frames_dir)), 1)
+        
+        del storage['guests']
+        self.assertEqual(os.listdir(storage.frames_dir), [])
+    
+    def test_writes_from_other_instance_visible(self):
+        """Test a worker reloads an entry another worker has replaced."""
+        worker_a = PersistentStorage(self.path)
+        worker_b = PersistentStorage(self.path)
+        worker_a['results'] = {'summary': 1}
+        self.assertEqual(worker_b['results'], {'summary': 1})
+        
+        worker_a['results'] = {'summary': 2}
+        self.assertEqual(worker_b['results'], {'summary': 2})
+        del worker_a['results']
+        self.assertNotIn('results', worker_b)
+    
+    def test_clear(self):
+        """Test clearing removes all persisted entries."""
+        storage = PersistentStorage(self.path)
+        storage['a'] = 1
+        storage['b'] = 2
+        storage.clear()
+        
+        self.assertEqual(len(PersistentStorage(self.path)), 0)
+
+
+class TestRestartRecovery(unittest.TestCase):
+    """Test the API serves persisted data after a restart."""
+    
+    def setUp(self):
+        """Create a fresh data directory."""
+        self.data_dir = tempfile.mkdtemp()
+        self.mock_data = MockDataGenerator(seed=42).generate_all_data()
+    
+    def tearDown(self):
+        """Remove the data directory."""
+        shutil.rmtree(self.data_dir)
+    
+    def _upload(self, client, file_type):
+        """Upload a mock workbook."""
+        output = io.BytesIO()
+        self.mock_data[file_type].to_excel(output, index=False, engine='openpyxl')
+        output.seek(0)
+        client.post(
+            f'/api/upload/{file_type}',
+            data={'file': (output, f'{file_type}.xlsx')},
+            content_type='multipart/form-data'
+        )
+    
+    def test_results_and_uploads_survive_restart(self):
+        """Test a new app instance sees previous uploads and results."""
+        app = create_app({'TESTING': True, 'DATA_DIR': self.data_dir})
+        client = app.test_client()
+        self._upload(client, 'guests')
+        self._upload(client, 'reservations')
+        get_dataframe(app.config['DATA_STORAGE']['reservations'])
+        client.post('/api/process')
+        # Processing stores the report sections unbuilt
+        self.assertFalse(app.config['DATA_STORAGE']['results']['revenue'].is_built('detailed_calculations'))
+        
+        restarted = create_app({'TESTING': True, 'DATA_DIR': self.data_dir}).test_client()
+        
+        results = json.loads(restarted.get('/api/results/summary').data)
+        self.assertTrue(results['success'])
+        revenue = json.loads(restarted.get('/api/results/revenue').data)
+        self.assertEqual(revenue, json.loads(client.get('/api/results/revenue').data))
+        status = json.loads(restarted.get('/api/upload/status').data)
+        self.assertTrue(status['ready_to_process'])
+        self.assertEqual(restarted.post('/api/process').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Deduplication
+============================
+Tests for composite keys and duplicate row reports.
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import dedup
+from services.dedup import composite_key, drop_duplicate_rows
+
+
+class TestCompositeKey(unittest.TestCase):
+    """Test cases for the int64 composite key."""
+    
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'guest': ['Ana', 'Rui', 'Ana', None, None, 'Ana'],
+            'checkin': pd.to_datetime(['2025-01-01', '2025-01-01', '2025-01-01', '2025-02-01', '2025-02-01', None]),
+            'property': ['Angra I', 'Angra I', 'Angra I', 'Fuzeta 0', 'Fuzeta 0', 'Angra I']
+        })
+        self.columns = ['guest', 'checkin', 'property']
+    
+    def test_matches_drop_duplicates(self):
+        """Test keys mark the same rows as pandas, missing values comparing equal."""
+        key = composite_key(self.df, self.columns)
+        
+        self.assertEqual(key.dtype, np.int64)
+        np.testing.assert_array_equal(
+            pd.Series(key).duplicated().to_numpy(), self.df.duplicated(subset=self.columns).to_numpy()
+        )
+    
+    def test_renumbers_before_overflow(self):
+        """Test keys stay distinct when the column cardinalities overflow int64."""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({f'c{i}': rng.integers(0, 5000, 2000) for i in range(8)})
+        df = pd.concat([df, df.head(10)], ignore_index=True)
+        
+        key = composite_key(df, list(df.columns))
+        
+        self.assertEqual(len(np.unique(key)), len(df.drop_duplicates()))
+    
+    def test_report_lists_dropped_rows(self):
+        """Test the report names each dropped row and the row it repeats."""
+        deduped, report = drop_duplicate_rows(self.df, self.columns)
+        
+        self.assertEqual(deduped.index.tolist(), [0, 1, 3, 5])
+        self.assertEqual(report['dropped'], 2)
+        self.assertEqual(report['rows'][0], {
+            'row': 2,
+            'duplicate_of': 0,
+            'values': {'guest': 'Ana', 'checkin': '2025-01-01T00:00:00', 'property': 'Angra I'}
+        })
+        self.assertEqual(report['rows'][1]['values']['guest'], None)
+        
+        original = dedup.MAX_REPORTED_DUPLICATES
+        dedup.MAX_REPORTED_DUPLICATES = 1
+        try:
+            self.assertEqual(len(drop_duplicate_rows(self.df, self.columns)[1]['rows']), 1)
+        finally:
+            dedup.MAX_REPORTED_DUPLICATES = original
+
+
+if __name__ == '__main__':
+    unittest.main()
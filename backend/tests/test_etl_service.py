@@ -6,6 +6,8 @@ Tests for the ETL service module.
 """
 
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 import pandas as pd
 import sys
 import os
@@ -14,6 +16,9 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from services.etl_service import ETLService, detect_reservations_language, RESERVATIONS_COLUMNS
+from services import worker_pool
+from services.lazy_report import materialize
+from services.analytics_service import cancelled_mask
 from tests.generate_mock_data import MockDataGenerator
 
 
@@ -97,6 +102,50 @@ class TestETLService(unittest.TestCase):
         ].shape[0] if self.etl.combined_df is not None else None
         self.assertEqual(zero_count, 0)
     
+    def test_duplicates_removed_before_merge(self):
+        """Test repeated reservations and guest names are dropped and reported."""
+        guests = self.mock_data['guests']
+        reservations = self.mock_data['reservations']
+        col_value = self.res_cols['reservation_value']
+        repeated = reservations[pd.to_numeric(reservations[col_value], errors='coerce') > 0].head(5)
+        
+        baseline = ETLService()
+        baseline.run_pipeline(guests_df=guests, reservations_df=reservations)
+        result = self.etl.run_pipeline(
+            guests_df=pd.concat([guests, guests.head(3)], ignore_index=True),
+            reservations_df=pd.concat([reservations, repeated], ignore_index=True)
+        )
+        
+        self.assertTrue(result['success'])
+        report = result['data_quality']['deduplication']
+        self.assertGreaterEqual(report['reservations']['dropped'], 5)
+        self.assertEqual(report['guests']['dropped'], 3)
+        dropped = report['reservations']['rows'][-1]
+        self.assertEqual(dropped['row'], len(reservations) + 4)
+        self.assertEqual(dropped['duplicate_of'], repeated.index[4])
+        self.assertEqual(len(self.etl.combined_df), len(baseline.combined_df))
+    
+    def test_duplicate_keeps_paid_row_for_analytics(self):
+        """Test a zero-valued duplicate listed first does not replace the paid row in the analytics base."""
+        reservations = self.mock_data['reservations']
+        col_value = self.res_cols['reservation_value']
+        paid = reservations[pd.to_numeric(reservations[col_value], errors='coerce') > 0].head(3)
+        zero_first = paid.copy()
+        zero_first[col_value] = 0
+        
+        self.etl.run_pipeline(
+            guests_df=self.mock_data['guests'],
+            reservations_df=pd.concat([zero_first, reservations], ignore_index=True)
+        )
+        
+        col_id = self.res_cols['reservation_id']
+        base = self.etl.analytics_base_df
+        for reservation_id in paid[col_id]:
+            rows = base[base[col_id] == reservation_id]
+            self.assertEqual(len(rows), 1)
+            self.assertGreater(rows[col_value].iloc[0], 0)
+        self.assertEqual(len(base[base[col_value] > 0]), len(self.etl.reservations_df))
+    
     def test_booking_commission_applied(self):
         """Test Booking.com commission adjustment."""
         col_channel = self.res_cols['channel']
@@ -176,6 +225,23 @@ class TestETLService(unittest.TestCase):
         self.assertIn('invoices_summary', revenue)
         self.assertIsNotNone(revenue['invoices_summary'])
     
+    def test_lazy_sections_match_eager(self):
+        """Test lazy reports compute sections on access with eager results."""
+        eager = self.etl.run_pipeline(
+            self.mock_data['guests'], self.mock_data['reservations'], self.mock_data['invoices']
+        )
+        lazy_etl = ETLService()
+        lazy = lazy_etl.run_pipeline(
+            self.mock_data['guests'], self.mock_data['reservations'], self.mock_data['invoices'], lazy=True
+        )
+        
+        self.assertFalse(lazy['aggregates'].is_built('revenue'))
+        self.assertFalse(lazy['revenue'].is_built('detailed_calculations'))
+        self.assertEqual(lazy['occupancy']['general_stats'], eager['occupancy']['general_stats'])
+        self.assertFalse(lazy['revenue'].is_built('detailed_calculations'))
+        self.assertEqual(materialize(lazy['revenue']), eager['revenue'])
+        self.assertEqual(materialize(lazy['analytics']), eager['analytics'])
+    
     def test_iva_calculation(self):
         """Test IVA rates are correctly applied."""
         result = self.etl.run_pipeline(
@@ -197,6 +263,159 @@ class TestETLService(unittest.TestCase):
             else:
                 self.assertEqual(calc['iva_rate'], 0.04)
 
+    
+    def test_parallel_occupancy_matches_serial(self):
+        """Test parallel per-property reports match the serial run."""
+        serial = self.etl.run_pipeline(
+            guests_df=self.mock_data['guests'],
+            reservations_df=self.mock_data['reservations']
+        )
+        parallel = ETLService(max_workers=2).run_pipeline(
+            guests_df=self.mock_data['guests'],
+            reservations_df=self.mock_data['reservations']
+        )
+        
+        self.assertTrue(parallel['success'])
+        self.assertEqual(parallel['occupancy'], serial['occupancy'])
+        self.assertEqual(list(parallel['occupancy']['by_property']), list(serial['occupancy']['by_property']))
+
+    def test_parallel_occupancy_from_concurrent_threads(self):
+        """Test concurrent parallel runs in threads each get their own dataset's tables."""
+        datasets = [self.mock_data, MockDataGenerator(seed=7, language=self.language).generate_all_data()]
+        expected = [
+            ETLService().run_pipeline(data['guests'], data['reservations'])['occupancy'] for data in datasets
+        ]
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(
+                lambda data: ETLService(max_workers=2).run_pipeline(data['guests'], data['reservations']),
+                datasets
+            ))
+        
+        for result, occupancy in zip(results, expected):
+            self.assertTrue(result['success'])
+            self.assertEqual(result['occupancy'], occupancy)
+    
+    def test_parallel_runs_share_pool_and_frame_files(self):
+        """Test parallel runs reuse one pool and hand partitions over as Arrow files where available."""
+        with mock.patch.object(worker_pool, 'write_frame', wraps=worker_pool.write_frame) as write_frame:
+            first = ETLService(max_workers=2)
+            first.run_pipeline(self.mock_data['guests'], self.mock_data['reservations'])
+            pool = worker_pool.shared_pool(2)
+            second = ETLService(max_workers=2)
+            second.run_pipeline(self.mock_data['guests'], self.mock_data['reservations'])
+        
+        self.assertIs(worker_pool.shared_pool(2), pool)
+        partitions = len(second.occupancy_data['by_property'])
+        self.assertEqual(write_frame.call_count, 2 * partitions if worker_pool.ARROW_AVAILABLE else 0)
+
+    
+    def test_invoice_reconciliation(self):
+        """Test invoices are linked to reservations and exceptions flagged."""
+        result = self.etl.run_pipeline(
+            guests_df=self.mock_data['guests'],
+            reservations_df=self.mock_data['reservations'],
+            faturacao_df=self.mock_data['invoices']
+        )
+        
+        self.assertTrue(result['success'])
+        reconciliation = result['revenue']['reconciliation']
+        summary = reconciliation['summary']
+        self.assertGreater(summary['matched'], 0)
+        self.assertEqual(
+            sum(summary[key] for key in ['matched', 'amount_mismatch', 'unmatched_reservations']),
+            len(self.etl.combined_df)
+        )
+        for row in reconciliation['exceptions']:
+            self.assertNotEqual(row['status'], 'matched')
+    
+    def test_reconciliation_cancelled_invoice_offsets(self):
+        """Test a cancelled invoice offsets its original during reconciliation."""
+        col_value = self.res_cols['reservation_value']
+        col_checkin = self.res_cols['checkin']
+        reservations = self.mock_data['reservations'].head(3).copy()
+        reservations[col_value] = [100.0, 200.0, 300.0]
+        rows = [0, 1, 1, 2]
+        invoices = pd.DataFrame({
+            'Documento': ['FT1', 'FT2', 'NC2', 'FT9'],
+            'Alojamento': reservations[self.res_cols['property']].iloc[rows].tolist(),
+            'Tipo Item': 'Estadia',
+            'Total Base Incidência': [100.0, 200.0, 200.0, 50.0],
+            'Total Do IVA': 0.0,
+            'Total Documento': [100.0, 200.0, 200.0, 50.0],
+            'Anulado': [False, False, True, False],
+            'Data Documento': reservations[col_checkin].iloc[rows].tolist()
+        })
+        invoices.loc[3, 'Data Documento'] += pd.Timedelta(days=60)
+        
+        self.etl.run_pipeline(self.mock_data['guests'], reservations, invoices)
+        
+        summary = self.etl.revenue_data['reconciliation']['summary']
+        self.assertEqual(summary['matched'], 1)
+        self.assertEqual(summary['amount_mismatch'], 1)
+        self.assertEqual(summary['unmatched_reservations'], 1)
+        self.assertEqual(summary['unmatched_invoices'], 1)
+
+    
+    def test_channel_analytics(self):
+        """Test per-channel analytics are consistent with the reservations."""
+        result = self.etl.run_pipeline(
+            guests_df=self.mock_data['guests'],
+            reservations_df=self.mock_data['reservations']
+        )
+        
+        self.assertTrue(result['success'])
+        analytics = result['analytics']
+        by_channel = analytics['by_channel']
+        
+        self.assertEqual(sum(row['reservations'] for row in by_channel), analytics['overall']['reservations'])
+        self.assertGreater(analytics['overall']['cancelled'], 0)
+        for row in by_channel:
+            if row['room_nights']:
+                self.assertAlmostEqual(row['adr'], row['revenue'] / row['room_nights'], places=2)
+        
+        lead_totals = analytics['lead_time_histogram'][-1]
+        self.assertEqual(lead_totals['channel'], 'TOTAL')
+        self.assertEqual(
+            sum(value for key, value in lead_totals.items() if key != 'channel'),
+            analytics['overall']['reservations'] - analytics['overall']['cancelled']
+        )
+
+
+    def test_pace_against_last_year(self):
+        """Test pace totals on the books and the same month one year earlier."""
+        reservations = self.mock_data['reservations']
+        col_value = self.res_cols['reservation_value']
+        last_year = reservations.copy()
+        for column in ('checkin', 'checkout', 'booked_at'):
+            col = self.res_cols[column]
+            last_year[col] = pd.to_datetime(last_year[col]) - pd.DateOffset(years=1)
+        
+        result = self.etl.run_pipeline(
+            guests_df=self.mock_data['guests'],
+            reservations_df=pd.concat([last_year, reservations], ignore_index=True)
+        )
+        
+        self.assertTrue(result['success'])
+        pace = result['analytics']['pace']
+        months = {}
+        for row in pace['by_stay_month']:
+            months.setdefault(row['stay_month'], []).append(row)
+        earlier, later = sorted(months)[0], sorted(months)[-1]
+        
+        self.assertIsNone(months[earlier][0]['last_year_revenue'])
+        arrival = months[later][-1]
+        self.assertEqual(arrival['days_before_arrival'], 0)
+        self.assertEqual(arrival['room_nights_vs_last_year'], 0)
+        self.assertEqual(sum(row['pickup_room_nights'] for row in months[later]), arrival['room_nights'])
+        
+        active = self.etl.analytics_base_df[
+            ~cancelled_mask(self.etl.analytics_base_df, self.etl.cols)
+            & (pd.to_datetime(self.etl.analytics_base_df[self.res_cols['checkin']]).dt.year == 2025)
+        ]
+        self.assertEqual(arrival['reservations'], len(active))
+        self.assertAlmostEqual(arrival['revenue'], active[col_value].sum(), places=2)
+
 
 class TestETLServiceEnglish(TestETLService):
     """Test cases for ETLService with English reservation data."""
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Excel Reader Engines
+===================================
+Tests for engine selection, fallback and identical output across engines.
+"""
+
+import unittest
+import importlib.util
+import io
+import sys
+import os
+from unittest import mock
+
+import pandas as pd
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import excel_reader
+from tests.generate_mock_data import MockDataGenerator
+
+
+HAS_CALAMINE = importlib.util.find_spec('python_calamine') is not None
+
+
+def _to_xlsx(df):
+    output = io.BytesIO()
+    df.to_excel(output, index=False, engine='openpyxl')
+    return output.getvalue()
+
+
+class TestEngineSelection(unittest.TestCase):
+    """Test cases for choosing the Excel engine."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.content = _to_xlsx(pd.DataFrame({'Nome': ['Ana', 'Rui'], 'Noites': [2, 3]}))
+    
+    def test_auto_prefers_calamine_below_size_limit(self):
+        """Test small workbooks use calamine first and large ones openpyxl."""
+        engines = excel_reader.select_engines(self.content)
+        if HAS_CALAMINE:
+            self.assertEqual(engines, ['calamine', 'openpyxl'])
+        
+        with mock.patch.object(excel_reader, 'CALAMINE_MAX_SIZE', len(self.content) - 1):
+            self.assertEqual(excel_reader.select_engines(self.content)[0], 'openpyxl')
+        self.assertEqual(excel_reader.select_engines(self.content, 'openpyxl')[0], 'openpyxl')
+    
+    def test_calamine_left_out_without_pandas_support(self):
+        """Test pandas older than 2.2 never gets calamine, even when it is installed or asked for."""
+        with mock.patch.object(excel_reader, 'CALAMINE_SUPPORTED', False):
+            self.assertEqual(excel_reader.select_engines(self.content), ['openpyxl'])
+            self.assertEqual(excel_reader.select_engines(self.content, 'calamine'), ['openpyxl'])
+    
+    def test_xls_format_and_unknown_engine(self):
+        """Test legacy .xls files never go to openpyxl and unknown engines are rejected."""
+        legacy = excel_reader.OLE2_SIGNATURE + b'\x00' * 512
+        
+        self.assertEqual(excel_reader.workbook_format(legacy), 'xls')
+        self.assertNotIn('openpyxl', excel_reader.select_engines(legacy, 'openpyxl'))
+        with self.assertRaises(ValueError):
+            excel_reader.select_engines(self.content, 'pyexcel')
+    
+    def test_fallback_when_engine_fails(self):
+        """Test a failing engine falls through to the next installed one."""
+        real_read_excel = pd.read_excel
+        
+        def broken_calamine(*args, engine=None, **kwargs):
+            if engine == 'calamine':
+                raise RuntimeError('corrupt shared strings')
+            return real_read_excel(*args, engine=engine, **kwargs)
+        
+        with mock.patch.object(excel_reader.pd, 'read_excel', side_effect=broken_calamine):
+            df = excel_reader.read_dataframe(self.content, engine='calamine')
+        
+        self.assertEqual(df['Nome'].tolist(), ['Ana', 'Rui'])
+        
+        with mock.patch.object(excel_reader.pd, 'read_excel', side_effect=RuntimeError('bad file')):
+            with self.assertRaises(ValueError):
+                excel_reader.read_dataframe(self.content)
+
+
+@unittest.skipUnless(HAS_CALAMINE, 'python-calamine is not installed')
+class TestEngineOutput(unittest.TestCase):
+    """Test cases for identical frames from every engine."""
+    
+    def test_engines_return_identical_frames(self):
+        """Test calamine and openpyxl parse mock workbooks to equal DataFrames."""
+        data = MockDataGenerator(seed=7).generate_all_data(100, 200, 150)
+        for file_type in ('guests', 'reservations', 'invoices'):
+            content = _to_xlsx(data[file_type])
+            with self.subTest(file_type=file_type):
+                pd.testing.assert_frame_equal(
+                    excel_reader.read_dataframe(content, engine='calamine'),
+                    excel_reader.read_dataframe(content, engine='openpyxl')
+                )
+    
+    def test_whitespace_cells_are_missing(self):
+        """Test whitespace-only text cells become missing values with every engine."""
+        content = _to_xlsx(pd.DataFrame({'Nome': ['Ana', ' ', 'Rui'], 'Notas': ['  ', 'ok', None]}))
+        
+        for engine in ('calamine', 'openpyxl'):
+            df = excel_reader.read_dataframe(content, engine=engine)
+            self.assertEqual(df['Nome'].isna().tolist(), [False, True, False])
+            self.assertEqual(df['Notas'].isna().tolist(), [True, False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Comparison History
+=================================
+Tests for stored monthly aggregates and period-over-period comparisons.
+"""
+
+import unittest
+import tempfile
+import shutil
+import json
+import io
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from services import history
+from services.dataset_store import PersistentStorage
+from services.etl_service import ETLService, RESERVATIONS_COLUMNS
+from tests.generate_mock_data import MockDataGenerator
+
+
+def _shift_year(reservations, years, language='pt'):
+    """Reservations moved by ``years`` years, same guests and values."""
+    shifted = reservations.copy()
+    for column in ('checkin', 'checkout', 'booked_at'):
+        col = RESERVATIONS_COLUMNS[language][column]
+        shifted[col] = pd.to_datetime(shifted[col]) + pd.DateOffset(years=years)
+    return shifted
+
+
+class TestHistory(unittest.TestCase):
+    """Test cases for merging and comparing monthly aggregates."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.data = MockDataGenerator(seed=42).generate_all_data()
+        last_year = _shift_year(cls.data['reservations'], -1)
+        last_year[RESERVATIONS_COLUMNS['pt']['reservation_value']] *= 0.8
+        
+        cls.previous = ETLService().run_pipeline(cls.data['guests'], last_year, lazy=True)
+        cls.etl = ETLService()
+        cls.current = cls.etl.run_pipeline(cls.data['guests'], cls.data['reservations'], lazy=True)
+    
+    def test_rerun_replaces_months(self):
+        """Test processing the same months again replaces their rows instead of adding to them."""
+        stored = history.merge_history(None, self.previous['aggregates'])
+        stored = history.merge_history(stored, self.current['aggregates'])
+        again = history.merge_history(stored, self.current['aggregates'])
+        
+        self.assertEqual(again['latest'], ('2025-01', '2025-01'))
+        for table in ('occupancy', 'revenue', 'guests'):
+            pd.testing.assert_frame_equal(again[table], stored[table])
+        self.assertEqual(set(stored['guests']['month']), {'2024-01', '2025-01'})
+    
+    def test_partial_run_keeps_other_properties(self):
+        """Test a run covering one property replaces only that property's rows, guests included."""
+        stored = history.merge_history(None, self.current['aggregates'])
+        property_name = stored['guests']['property'].iloc[0]
+        partial = {
+            table: frame[frame['property'] == property_name].head(1)
+            for table, frame in self.current['aggregates'].items()
+        }
+        
+        merged = history.merge_history(stored, partial)
+        
+        for table in ('occupancy', 'revenue', 'guests'):
+            others = stored[table][stored[table]['property'] != property_name]
+            kept = merged[table][merged[table]['property'] != property_name]
+            pd.testing.assert_frame_equal(kept.reset_index(drop=True), others.reset_index(drop=True))
+        self.assertEqual((merged['guests']['property'] == property_name).sum(), 1)
+    
+    def test_concurrent_runs_keep_every_update(self):
+        """Test runs recorded at once, per property and per dataset, do not overwrite each other."""
+        guests = self.current['aggregates']['guests']
+        # Occupancy and guests are per property group, revenue per property
+        properties = sorted(set(guests['property']) | set(self.current['aggregates']['revenue']['property']))
+        runs = [
+            {table: frame[frame['property'] == name] for table, frame in self.current['aggregates'].items()}
+            for name in properties
+        ]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        
+        for storage in ({}, PersistentStorage(os.path.join(directory, 'store.db'))):
+            with self.subTest(storage=type(storage).__name__):
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    list(executor.map(lambda run: history.record_run(storage, None, run), runs))
+                history.record_run(storage, 'other', runs[0])
+                
+                stored = storage[history.history_key()]
+                self.assertEqual(stored['guests']['guest'].nunique(), guests['guest'].nunique())
+                self.assertEqual(set(stored['revenue']['property']), set(self.current['aggregates']['revenue']['property']))
+                other = storage[history.history_key('other')]
+                for table in history.TABLE_KEYS:
+                    self.assertEqual(len(other[table]), len(runs[0][table]))
+    
+    def test_year_over_year_matches_reports(self):
+        """Test comparison totals equal each run's own report figures."""
+        stored = history.merge_history(history.merge_history(None, self.previous['aggregates']), self.current['aggregates'])
+        
+        comparison = history.compare_periods(stored, *history.resolve_periods(stored, None, None))
+        
+        self.assertEqual(comparison['against']['start'], '2024-01')
+        general = comparison['general_stats']
+        current_stats = self.current['occupancy']['general_stats']
+        self.assertEqual(general['total_guests']['current'], current_stats['total_guests'])
+        self.assertEqual(general['total_nights']['change'], 0)
+        self.assertAlmostEqual(general['total_gross_value']['change_rate'], 0.25, places=3)
+        
+        by_property = {row['property']: row for row in comparison['reservations_by_property']}
+        for row in self.current['revenue']['reservations_by_property']:
+            self.assertAlmostEqual(by_property[row['property']]['gross_value'], row['gross_value'], places=2)
+            self.assertEqual(by_property[row['property']]['reservation_count_change'], 0)
+        
+        for property_name, records in self.current['occupancy']['by_property'].items():
+            total = comparison['occupancy_by_property'][property_name][-1]
+            self.assertEqual(total['nationality'], 'TOTAL')
+            self.assertEqual(total['total_nights'], records[-1]['total_nights'])
+    
+    def test_guests_over_months_counted_once(self):
+        """Test a guest staying in two months counts once per nationality, as in the run's own report."""
+        # The first guests come back a month later, to the same property
+        returning = self.data['reservations'].head(10).copy()
+        for column in ('checkin', 'checkout', 'booked_at'):
+            col = RESERVATIONS_COLUMNS['pt'][column]
+            returning[col] = returning[col] + pd.DateOffset(months=1)
+        col_reservation_id = RESERVATIONS_COLUMNS['pt']['reservation_id']
+        returning[col_reservation_id] = returning[col_reservation_id] + '-2'
+        run = ETLService().run_pipeline(
+            self.data['guests'], pd.concat([self.data['reservations'], returning], ignore_index=True), lazy=True
+        )
+        stored = history.merge_history(None, run['aggregates'])
+        self.assertEqual(stored['latest'], ('2025-01', '2025-02'))
+        
+        comparison = history.compare_periods(stored, stored['latest'], stored['latest'])
+        
+        for property_name, records in run['occupancy']['by_property'].items():
+            expected = {record['nationality']: record['unique_guests'] for record in records if record.get('nationality')}
+            compared = {record['nationality']: record['unique_guests'] for record in comparison['occupancy_by_property'][property_name]}
+            self.assertEqual(compared, expected)
+        self.assertEqual(comparison['general_stats']['total_guests']['current'], run['occupancy']['general_stats']['total_guests'])
+        self.assertLess(comparison['general_stats']['total_guests']['current'], stored['occupancy']['unique_guests'].sum())
+    
+    def test_periods(self):
+        """Test period parsing, shifting and missing data."""
+        self.assertEqual(history.parse_period('2025-01:2025-03'), ('2025-01', '2025-03'))
+        self.assertEqual(history.resolve_periods(None, '2025-01:2025-03', 'previous')[1], ('2024-10', '2024-12'))
+        with self.assertRaises(ValueError):
+            history.parse_period('2025-13')
+        
+        stored = history.merge_history(None, self.current['aggregates'])
+        with self.assertRaises(LookupError):
+            history.compare_periods(stored, ('2025-01', '2025-01'), ('2024-01', '2024-01'))
+
+
+class TestComparisonEndpoints(unittest.TestCase):
+    """Test cases for /api/results/comparison and /api/download/comparison."""
+    
+    def setUp(self):
+        self.app = create_app({'TESTING': True})
+        self.client = self.app.test_client()
+        self.storage = self.app.config['DATA_STORAGE']
+        self.storage.clear()
+        self.data = MockDataGenerator(seed=42).generate_all_data()
+    
+    def _process(self, reservations):
+        self.storage['guests'] = {'dataframe': self.data['guests']}
+        self.storage['reservations'] = {'dataframe': reservations}
+        response = self.client.post('/api/process')
+        self.assertEqual(response.status_code, 200)
+        # Aggregates are merged into the history once the response is closed
+        response.close()
+    
+    def test_compare_with_last_year(self):
+        """Test comparing against a period processed earlier, kept across clearing uploads."""
+        response = self.client.get('/api/results/comparison')
+        self.assertEqual(response.status_code, 404)
+        
+        self._process(_shift_year(self.data['reservations'], -1))
+        self.client.delete('/api/upload/clear')
+        self._process(self.data['reservations'])
+        
+        response = self.client.get('/api/results/comparison?sections=period,against,general_stats')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(set(data), {'period', 'against', 'general_stats'})
+        self.assertEqual(data['general_stats']['total_reservations']['change_rate'], 0.0)
+        
+        response = self.client.get('/api/download/comparison?period=2025-01&against=2024-01')
+        
+        self.assertEqual(response.status_code, 200)
+        sheets = pd.read_excel(io.BytesIO(response.data), sheet_name=None)
+        self.assertIn('Comparison by Property', sheets)
+        self.assertIn('Gross Value Change %', sheets['Comparison by Property'].columns)
+        
+        self.assertEqual(self.client.get('/api/results/comparison?period=2025-1').status_code, 400)
+        self.assertEqual(self.client.get('/api/results/comparison?dataset=client_b').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
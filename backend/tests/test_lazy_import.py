@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Lazy Imports
+===========================
+Tests that heavy data libraries load on first use, not at startup.
+"""
+
+import unittest
+import subprocess
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.lazy_import import lazy_module, warm_up
+
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+
+class TestLazyImports(unittest.TestCase):
+    """Test cases for deferred imports."""
+    
+    def test_app_starts_without_heavy_modules(self):
+        """Test creating the app and answering health checks imports no data libraries."""
+        script = (
+            "import sys\n"
+            "from app import create_app\n"
+            "client = create_app({'TESTING': True}).test_client()\n"
+            "assert client.get('/api/health/live').status_code == 200\n"
+            "assert client.get('/api/health/ready').status_code == 200\n"
+            "print(','.join(m for m in ('pandas', 'numpy', 'openpyxl', 'pyarrow') if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), '')
+    
+    def test_lazy_module_proxies_attributes(self):
+        """Test the proxy imports the module on first attribute access."""
+        json_module = lazy_module('json')
+        self.assertEqual(json_module.dumps([1]), '[1]')
+        
+        thread = warm_up(['json', 'csv'])
+        thread.join(timeout=5)
+        self.assertIn('csv', sys.modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
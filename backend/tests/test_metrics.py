@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Metrics
+======================
+Tests the metric types, the Prometheus text output and /api/metrics.
+"""
+
+import unittest
+import io
+import re
+import sys
+import os
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from services import metrics
+from tests.generate_mock_data import MockDataGenerator
+
+
+class TestMetricTypes(unittest.TestCase):
+    """Test cases for the metric classes."""
+    
+    def setUp(self):
+        """Register throwaway metrics."""
+        self.registry_size = len(metrics.REGISTRY)
+    
+    def tearDown(self):
+        """Unregister the throwaway metrics."""
+        del metrics.REGISTRY[self.registry_size:]
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count in text format."""
+        histogram = metrics.Histogram('test_duration_seconds', 'Test.', ['stage'], buckets=(1, 5))
+        histogram.observe(0.5, stage='a')
+        histogram.observe(3, stage='a')
+        histogram.observe(7, stage='a')
+        
+        text = histogram.render()
+        
+        self.assertIn('# TYPE test_duration_seconds histogram', text)
+        self.assertIn('test_duration_seconds_bucket{stage="a",le="1"} 1', text)
+        self.assertIn('test_duration_seconds_bucket{stage="a",le="5"} 2', text)
+        self.assertIn('test_duration_seconds_bucket{stage="a",le="+Inf"} 3', text)
+        self.assertIn('test_duration_seconds_sum{stage="a"} 10.5', text)
+        self.assertIn('test_duration_seconds_count{stage="a"} 3', text)
+    
+    def test_gauge_tracks_inprogress(self):
+        """Test gauges go back down after a tracked block."""
+        gauge = metrics.Gauge('test_active', 'Test.', ['job'])
+        with gauge.track_inprogress(job='x'):
+            self.assertEqual(gauge.value(job='x'), 1)
+        self.assertEqual(gauge.value(job='x'), 0)
+    
+    def test_label_values_escaped(self):
+        """Test quotes in label values are escaped."""
+        counter = metrics.Counter('test_total', 'Test.', ['name'])
+        counter.inc(name='a"b')
+        self.assertIn('test_total{name="a\\"b"} 1', counter.render())
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Test the /api/metrics endpoint."""
+    
+    def setUp(self):
+        """Set up test client."""
+        self.app = create_app({'TESTING': True})
+        self.client = self.app.test_client()
+        self.mock_data = MockDataGenerator(seed=42).generate_all_data()
+    
+    def _upload(self, file_type):
+        """Upload a mock workbook."""
+        output = io.BytesIO()
+        self.mock_data[file_type].to_excel(output, index=False, engine='openpyxl')
+        output.seek(0)
+        self.client.post(
+            f'/api/upload/{file_type}',
+            data={'file': (output, f'{file_type}.xlsx')},
+            content_type='multipart/form-data'
+        )
+    
+    def test_metrics_after_processing(self):
+        """Test request, upload, pipeline and storage metrics are exposed."""
+        self._upload('guests')
+        self._upload('reservations')
+        self.client.post('/api/process')
+        self.client.get('/api/results/occupancy')
+        
+        response = self.client.get('/api/metrics')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.data.decode()
+        self.assertIn('talkguest_request_duration_seconds_count{method="POST",route="/api/process",status="200"}', text)
+        self.assertIn('talkguest_upload_size_bytes_count{file_type="guests"}', text)
+        self.assertIn('talkguest_pipeline_stage_duration_seconds_count{stage="occupancy.by_property"}', text)
+        self.assertIn('talkguest_data_storage_bytes{entry="reservations"}', text)
+        self.assertIn('talkguest_active_jobs{job="process"} 0', text)
+    
+    def test_storage_footprint_measured_once(self):
+        """Test lazy results are counted and repeated scrapes reuse the measured sizes."""
+        self._upload('guests')
+        self._upload('reservations')
+        self.client.post('/api/process')
+        self.client.get('/api/results/occupancy')
+        self.client.get('/api/metrics')
+        
+        with mock.patch.object(metrics, 'approximate_size', wraps=metrics.approximate_size) as measure:
+            text = self.client.get('/api/metrics').data.decode()
+        
+        measure.assert_not_called()
+        results_bytes = re.search(r'talkguest_data_storage_bytes\{entry="results"\} (\d+)', text)
+        self.assertGreater(int(results_bytes.group(1)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
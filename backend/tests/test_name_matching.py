@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Name Matching
+============================
+Tests for normalized and fuzzy guest name matching.
+"""
+
+import unittest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import name_matching
+from services.name_matching import blocking_keys, match_names, normalize_name
+from services.etl_service import ETLService
+from tests.generate_mock_data import MockDataGenerator
+
+
+class TestNameMatching(unittest.TestCase):
+    """Test cases for match_names."""
+    
+    def test_normalized_match(self):
+        """Test accent, case and spacing differences match with full confidence."""
+        matches = match_names(['Jose  Silva', 'ANA santos', 'Maria Costa'], ['José Silva', 'Ana Santos', 'Maria Costa'])
+        
+        self.assertEqual(matches['Jose  Silva'], ('José Silva', 1.0, 'normalized'))
+        self.assertEqual(matches['ANA santos'], ('Ana Santos', 1.0, 'normalized'))
+        self.assertEqual(matches['Maria Costa'], ('Maria Costa', 1.0, 'exact'))
+    
+    def test_fuzzy_match_and_cache(self):
+        """Test typos match above the threshold and are cached across calls."""
+        guests = ['Sophie Dupont', 'Hans Mueller', 'John Smith']
+        matches = match_names(['Sophie Dupond', 'Hans Muller', 'Peter Parker'], guests)
+        
+        self.assertEqual(matches['Sophie Dupond'][0], 'Sophie Dupont')
+        self.assertEqual(matches['Sophie Dupond'][2], 'fuzzy')
+        self.assertGreaterEqual(matches['Sophie Dupond'][1], 0.88)
+        self.assertEqual(matches['Hans Muller'][0], 'Hans Mueller')
+        self.assertEqual(matches['Peter Parker'][2], 'unmatched')
+        self.assertIn(normalize_name('Sophie Dupond'), {name for _, name in name_matching._resolved})
+        
+        again = match_names(['Sophie Dupond'], guests)
+        self.assertEqual(again['Sophie Dupond'][0], 'Sophie Dupont')
+    
+    def test_cached_match_does_not_hide_better_guest(self):
+        """Test a match cached for one guest list is not reused when another list has a better guest."""
+        match_names(['Sophie Dupond'], ['Sophie Dupont', 'John Smith'])
+        
+        matches = match_names(['Sophie Dupond'], ['Sophie Dupont', 'Sophie Dupond.'])
+        
+        self.assertEqual(matches['Sophie Dupond'], ('Sophie Dupond.', 1.0, 'normalized'))
+        
+        matches = match_names(['Sophie Dupond'], ['Sophie Dupont', 'Sophie Dupondd'])
+        
+        self.assertEqual(matches['Sophie Dupond'][0], 'Sophie Dupondd')
+    
+    def test_blocking_keys(self):
+        """Test phonetic keys group similar spellings."""
+        self.assertTrue(blocking_keys('sophie dupont') & blocking_keys('sofie dupond'))
+        self.assertFalse(blocking_keys('sophie dupont') & blocking_keys('john smith'))
+
+
+class TestPipelineNameMatching(unittest.TestCase):
+    """Test the optional matching stage in the ETL pipeline."""
+    
+    def test_matching_recovers_countries(self):
+        """Test reservations with altered names still get a country when enabled."""
+        data = MockDataGenerator(seed=42).generate_all_data()
+        reservations = data['reservations'].copy()
+        reservations['Hóspede'] = reservations['Hóspede'].str.upper().str.replace(' ', '  ')
+        
+        config = {**ETLService().config, 'name_matching': {'enabled': True}}
+        etl = ETLService(config=config)
+        result = etl.run_pipeline(data['guests'], reservations)
+        
+        report = result['data_quality']['name_matching']
+        self.assertEqual(report['unmatched'], 0)
+        self.assertGreater(report['normalized'], 0)
+        self.assertEqual(etl.combined_df['Pais'].isna().sum(), 0)
+        
+        disabled = ETLService().run_pipeline(data['guests'], reservations)
+        self.assertIsNone(disabled['data_quality']['name_matching'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Schema Coercion
+==============================
+Tests for the typed column coercion layer.
+"""
+
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.schema import parse_numeric, parse_bool, parse_datetime, coerce_frame, RESERVATIONS_SCHEMA
+from services.etl_service import ETLService, RESERVATIONS_COLUMNS
+from tests.generate_mock_data import MockDataGenerator
+
+
+class TestParsing(unittest.TestCase):
+    """Test cases for column parsers."""
+    
+    def test_parse_numeric_formats(self):
+        """Test European and English number formats with currency symbols."""
+        series = pd.Series(['1.234,56 €', '€1,234.56', '12,5', '  99 ', 7, None, 'n/a'], dtype=object)
+        
+        values, failed = parse_numeric(series)
+        
+        np.testing.assert_allclose(values.iloc[:5], [1234.56, 1234.56, 12.5, 99.0, 7.0])
+        self.assertTrue(np.isnan(values.iloc[5]))
+        self.assertEqual(failed.tolist(), [False] * 6 + [True])
+    
+    def test_parse_numeric_thousands_comma(self):
+        """Test a comma grouping thousands is not read as a decimal comma, unless the export uses decimal commas."""
+        series = pd.Series(['1,234', '12,345,678', '0,500', '1,23'], dtype=object)
+        
+        values, failed = parse_numeric(series)
+        
+        np.testing.assert_allclose(values, [1234.0, 12345678.0, 0.5, 1.23])
+        self.assertFalse(failed.any())
+        np.testing.assert_allclose(parse_numeric(series.head(1), decimal=',')[0], [1.234])
+    
+    def test_parse_numeric_passthrough(self):
+        """Test numeric columns are not reparsed."""
+        values, failed = parse_numeric(pd.Series([1, 2, 3]))
+        
+        self.assertEqual(values.dtype, 'float64')
+        self.assertFalse(failed.any())
+    
+    def test_parse_bool(self):
+        """Test yes/no values in several forms."""
+        values, failed = parse_bool(pd.Series([True, 'Sim', 'não', None, 'maybe'], dtype=object))
+        
+        self.assertEqual(values.tolist(), [True, True, False, False, False])
+        self.assertEqual(failed.tolist(), [False, False, False, False, True])
+    
+    def test_parse_datetime_day_first(self):
+        """Test text dates are read day-first."""
+        values, failed = parse_datetime(pd.Series(['03/02/2025', 'soon']))
+        
+        self.assertEqual(values.iloc[0], pd.Timestamp(2025, 2, 3))
+        self.assertEqual(failed.tolist(), [False, True])
+    
+    def test_parse_datetime_iso_unchanged(self):
+        """Test ISO text dates keep their month and day, alongside day-first and missing values."""
+        series = pd.Series(
+            ['2024-03-05', '2024-03-05 14:00:00', '05/03/2024 10:30', '5.3.2024', None, ''],
+            dtype=object
+        )
+        
+        values, failed = parse_datetime(series)
+        
+        self.assertEqual(values.iloc[:4].tolist(), [
+            pd.Timestamp(2024, 3, 5), pd.Timestamp(2024, 3, 5, 14), pd.Timestamp(2024, 3, 5, 10, 30), pd.Timestamp(2024, 3, 5)
+        ])
+        self.assertTrue(values.iloc[4:].isna().all())
+        self.assertFalse(failed.any())
+
+
+class TestCoerceFrame(unittest.TestCase):
+    """Test cases for frame coercion."""
+    
+    def test_coerce_frame_reports_failures(self):
+        """Test numeric columns are filled and failures reported per column."""
+        cols = RESERVATIONS_COLUMNS['pt']
+        df = pd.DataFrame({
+            cols['reservation_value']: ['100,50', 'abc', None],
+            cols['nights']: ['2', '3', None]
+        })
+        
+        df, report = coerce_frame(df, RESERVATIONS_SCHEMA, cols)
+        
+        self.assertEqual(df[cols['reservation_value']].tolist(), [100.5, 0.0, 0.0])
+        self.assertEqual(df[cols['nights']].tolist(), [2, 3, 0])
+        self.assertEqual(report, {cols['reservation_value']: {'failed': 1, 'examples': ['abc']}})
+    
+    def test_pipeline_accepts_text_amounts(self):
+        """Test the pipeline gives the same totals for text-formatted amounts."""
+        data = MockDataGenerator(seed=42).generate_all_data()
+        cols = RESERVATIONS_COLUMNS['pt']
+        
+        expected = ETLService().run_pipeline(data['guests'], data['reservations'])
+        
+        reservations = data['reservations'].copy()
+        reservations[cols['reservation_value']] = reservations[cols['reservation_value']].map(
+            lambda value: f"{value:,.2f} €".replace(',', ' ').replace('.', ',')
+        )
+        result = ETLService().run_pipeline(data['guests'], reservations)
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['data_quality']['coercion_failures'], {})
+        self.assertEqual(
+            result['revenue']['reservations_summary'],
+            expected['revenue']['reservations_summary']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
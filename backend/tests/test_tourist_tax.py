@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Unit Tests for Tourist Tax
+==========================
+Tests for the municipal tourist tax (TMT) computation.
+"""
+
+import unittest
+import pandas as pd
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.etl_service import ETLService, ColumnMapper, DEFAULT_CONFIG
+from services.tourist_tax import compute_tourist_tax, municipality_for, resolve_tourist_tax, DEFAULT_TOURIST_TAX
+from tests.generate_mock_data import MockDataGenerator
+
+
+class TestTouristTax(unittest.TestCase):
+    """Test cases for tourist tax rates, caps and exemptions."""
+    
+    def setUp(self):
+        self.cols = ColumnMapper('en')
+        self.settings = {
+            'enabled': True,
+            'municipalities': {
+                'angra': {'rate': 1.0, 'max_nights': 7, 'children_exempt': False},
+                'olhao': {'rate': 2.0, 'max_nights': 0, 'children_exempt': True}
+            },
+            'properties': {'fuzeta': 'olhao'},
+            'default_municipality': 'angra'
+        }
+        self.reservations = pd.DataFrame({
+            'Rental': ['Angra I', 'Angra I', 'Fuzeta 0', 'Fuzeta 0'],
+            'Checkin': pd.to_datetime(['2024-01-05', '2024-02-01', '2024-01-10', '2024-01-20']),
+            'Nights': [10, 2, 3, 1],
+            'Adults': [2, 1, 2, 1],
+            'Children subject to TMT': [1, 0, 1, 0],
+            'Children not subject to TMT': [1, 0, 0, 0]
+        })
+    
+    def test_rates_caps_and_exemptions(self):
+        """Test nights are capped, exempt children skipped and rates applied per municipality."""
+        result = compute_tourist_tax(self.reservations, self.cols, self.settings)
+        
+        # Angra: 7 capped nights x 3 people + 2 x 1; Olhão: 3 x 2 + 1 x 1 at 2.0
+        self.assertEqual(result['summary']['total_tax'], 21 + 2 + 14)
+        self.assertEqual(result['summary']['taxable_person_nights'], 21 + 2 + 6 + 1)
+        self.assertEqual(result['summary']['exempt_person_nights'], (40 - 21) + 3)
+        
+        by_municipality = {row['municipality']: row['tax'] for row in result['by_municipality']}
+        self.assertEqual(by_municipality, {'angra': 23.0, 'olhao': 14.0})
+    
+    def test_grouped_by_property_and_month(self):
+        """Test one row per property and check-in month."""
+        result = compute_tourist_tax(self.reservations, self.cols, self.settings)
+        rows = {(row['property'], row['month']): row for row in result['by_property_month']}
+        
+        self.assertEqual(set(rows), {('Angra I', '2024-01'), ('Angra I', '2024-02'), ('Fuzeta 0', '2024-01')})
+        self.assertEqual(rows[('Fuzeta 0', '2024-01')]['reservations'], 2)
+        self.assertEqual(rows[('Fuzeta 0', '2024-01')]['tax'], 14.0)
+        self.assertEqual(rows[('Angra I', '2024-02')]['municipality'], 'angra')
+    
+    def test_property_municipality_lookup(self):
+        """Test properties map by name fragment with a default municipality."""
+        self.assertEqual(municipality_for('Fuzeta 1', DEFAULT_TOURIST_TAX), 'olhao')
+        self.assertEqual(municipality_for('Casa 3', DEFAULT_TOURIST_TAX), 'angra_do_heroismo')
+        self.assertIsNone(municipality_for(None, DEFAULT_TOURIST_TAX))
+    
+    def test_overrides_merged_into_defaults(self):
+        """Test overrides change single parameters and keep the other municipalities."""
+        settings = resolve_tourist_tax({'enabled': True, 'municipalities': {'olhao': {'rate': 2.0}}})
+        
+        self.assertTrue(settings['enabled'])
+        self.assertEqual(settings['municipalities']['olhao'], {'rate': 2.0, 'max_nights': 7, 'children_exempt': False})
+        self.assertIn('angra_do_heroismo', settings['municipalities'])
+        self.assertEqual(settings['default_municipality'], 'angra_do_heroismo')
+        self.assertEqual(DEFAULT_TOURIST_TAX['municipalities']['olhao']['rate'], 1.50)
+        self.assertFalse(resolve_tourist_tax()['enabled'])
+    
+    def test_unknown_municipality_rejected(self):
+        """Test a default or property municipality that is not configured is an error."""
+        with self.assertRaisesRegex(ValueError, 'default municipality'):
+            resolve_tourist_tax({'default_municipality': 'lisboa'})
+        with self.assertRaisesRegex(ValueError, "'faro'"):
+            resolve_tourist_tax({'properties': {'casa': 'faro'}})
+        with self.assertRaisesRegex(ValueError, 'no rate'):
+            resolve_tourist_tax({'municipalities': {'faro': {'max_nights': 7}}})
+        self.assertIsNone(resolve_tourist_tax({'default_municipality': None})['default_municipality'])
+        
+        mock_data = MockDataGenerator(seed=42, language='pt').generate_all_data()
+        etl = ETLService(config={**DEFAULT_CONFIG, 'tourist_tax': {'enabled': True, 'default_municipality': 'lisboa'}})
+        result = etl.run_pipeline(mock_data['guests'], mock_data['reservations'], lazy=True)
+        self.assertFalse(result['success'])
+        self.assertIn('lisboa', result['errors'][0])
+    
+    def test_pipeline_section(self):
+        """Test the revenue report includes tourist tax only when enabled."""
+        mock_data = MockDataGenerator(seed=42, language='pt').generate_all_data()
+        result = ETLService().run_pipeline(mock_data['guests'], mock_data['reservations'])
+        self.assertIsNone(result['revenue']['tourist_tax'])
+        
+        enabled = ETLService(config={**DEFAULT_CONFIG, 'tourist_tax': {'enabled': True}})
+        result = enabled.run_pipeline(mock_data['guests'], mock_data['reservations'])
+        tourist_tax = result['revenue']['tourist_tax']
+        
+        self.assertGreater(tourist_tax['summary']['total_tax'], 0)
+        self.assertAlmostEqual(
+            sum(row['tax'] for row in tourist_tax['by_property_month']),
+            tourist_tax['summary']['total_tax'],
+            places=2
+        )
+        
+        disabled = ETLService(config={'tourist_tax': {'enabled': False}, 'property_groups': {}, 'iva_rates': {}})
+        result = disabled.run_pipeline(mock_data['guests'], mock_data['reservations'])
+        self.assertIsNone(result['revenue']['tourist_tax'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,14 @@ import TabNavigation from './components/TabNavigation';
 import UploadTab from './components/UploadTab';
 import OccupancyTab from './components/OccupancyTab';
 import RevenueTab from './components/RevenueTab';
-import { getUploadStatus, getProcessingStatus, getAllResults } from './utils/api';
+import {
+  getUploadStatus,
+  getProcessingStatus,
+  getAllResults,
+  getOccupancyResults,
+  getRevenueResults,
+  OVERVIEW_SECTIONS
+} from './utils/api';
 import { useLanguage } from './contexts/LanguageContext';
 
 function App() {
@@ -18,6 +25,7 @@ function App() {
   });
   const [processingStatus, setProcessingStatus] = useState('not_started');
   const [results, setResults] = useState(null);
+  const [reports, setReports] = useState({});
   const [error, setError] = useState(null);
   const [loading, setLoading] = useState(false);
 
@@ -53,7 +61,7 @@ function App() {
 
       // Fetch results if processing is completed
       if (processRes.status === 'completed') {
-        const resultsRes = await getAllResults();
+        const resultsRes = await getAllResults(OVERVIEW_SECTIONS);
         if (resultsRes.success) {
           setResults(resultsRes.data);
         }
@@ -67,6 +75,26 @@ function App() {
     fetchStatus();
   }, [fetchStatus]);
 
+  // Full reports are computed on the server on first request, so only
+  // fetch a tab's report when the tab is opened
+  useEffect(() => {
+    setReports({});
+  }, [results]);
+
+  useEffect(() => {
+    const fetchers = { occupancy: getOccupancyResults, revenue: getRevenueResults };
+    if (!results || !fetchers[activeTab] || reports[activeTab]) {
+      return;
+    }
+    fetchers[activeTab]()
+      .then(res => {
+        if (res.success) {
+          setReports(prev => ({ ...prev, [activeTab]: res.data }));
+        }
+      })
+      .catch(err => console.error(`Failed to fetch ${activeTab} results:`, err));
+  }, [activeTab, results, reports]);
+
   const handleUploadComplete = (fileType, fileInfo) => {
     setUploadStatus(prev => {
       const newStatus = {
@@ -151,11 +179,11 @@ function App() {
           )}
           
           {activeTab === 'occupancy' && results && (
-            <OccupancyTab data={results.occupancy} />
+            <OccupancyTab data={reports.occupancy} />
           )}
           
           {activeTab === 'revenue' && results && (
-            <RevenueTab data={results.revenue} />
+            <RevenueTab data={reports.revenue} />
           )}
         </div>
       </main>
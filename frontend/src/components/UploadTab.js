@@ -112,11 +112,11 @@ function UploadTab({
     try {
       const result = await runProcessing();
       if (result.success) {
-        // Fetch full results
-        const { getAllResults } = await import('../utils/api');
-        const fullResults = await getAllResults();
-        if (fullResults.success) {
-          onProcessingComplete(fullResults.data);
+        // Fetch the overview; tabs load their full reports when opened
+        const { getAllResults, OVERVIEW_SECTIONS } = await import('../utils/api');
+        const overview = await getAllResults(OVERVIEW_SECTIONS);
+        if (overview.success) {
+          onProcessingComplete(overview.data);
         }
       } else {
         onProcessingError(result.errors || ['Processing failed']);
@@ -98,8 +98,12 @@ export const getProcessingStatus = async () => {
 };
 
 // Results endpoints
-export const getAllResults = async () => {
-  const response = await api.get('/results');
+// Sections shown in the results summary; the rest is loaded per tab
+export const OVERVIEW_SECTIONS = ['summary', 'occupancy.general_stats', 'revenue.reservations_summary'];
+
+export const getAllResults = async (sections = null) => {
+  const params = sections ? { sections: sections.join(',') } : undefined;
+  const response = await api.get('/results', { params });
   return response.data;
 };
 